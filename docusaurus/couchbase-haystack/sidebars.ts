@@ -29,9 +29,12 @@ const sidebars: SidebarsConfig = {
     collapsed: false,
     items: [
       "reference/couchbase_embedding_retriever",
+      "reference/couchbase_hybrid_retriever",
       "reference/couchbase_document_store",
+      "reference/async_couchbase_document_store",
       "reference/document_filter",
       "reference/cluster_options",
+      "reference/write_options",
       "reference/authentication",
     ],
   }
@@ -1,17 +1,30 @@
-from couchbase_haystack.components.retrievers import CouchbaseEmbeddingRetriever
+from couchbase_haystack.components.retrievers import CouchbaseEmbeddingRetriever, CouchbaseHybridRetriever
 from couchbase_haystack.document_stores import (
+    AsyncCouchbaseDocumentStore,
+    BatchWriteResult,
+    CacheInfo,
     CouchbaseAuthenticator,
     CouchbaseCertificateAuthenticator,
     CouchbaseClusterOptions,
     CouchbaseDocumentStore,
     CouchbasePasswordAuthenticator,
+    CouchbaseWriteOptions,
+    DeleteResult,
+    SearchIndexResult,
 )
 
 __all__ = [
     "CouchbaseEmbeddingRetriever",
+    "CouchbaseHybridRetriever",
     "CouchbaseDocumentStore",
+    "AsyncCouchbaseDocumentStore",
     "CouchbaseAuthenticator",
     "CouchbasePasswordAuthenticator",
     "CouchbaseCertificateAuthenticator",
     "CouchbaseClusterOptions",
+    "CouchbaseWriteOptions",
+    "BatchWriteResult",
+    "DeleteResult",
+    "CacheInfo",
+    "SearchIndexResult",
 ]
@@ -1,3 +1,4 @@
 from .embedding_retriever import CouchbaseEmbeddingRetriever
+from .hybrid_retriever import CouchbaseHybridRetriever
 
-__all__ = ["CouchbaseEmbeddingRetriever"]
+__all__ = ["CouchbaseEmbeddingRetriever", "CouchbaseHybridRetriever"]
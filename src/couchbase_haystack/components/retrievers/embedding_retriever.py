@@ -1,13 +1,18 @@
 # SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
 #
 # SPDX-License-Identifier: Apache-2.0
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from couchbase.search import SearchQuery
 from haystack import component, default_from_dict, default_to_dict
+from haystack.core.serialization import generate_qualified_class_name
 from haystack.dataclasses import Document
+from haystack.document_stores.types import FilterPolicy
+from haystack.document_stores.types.filter_policy import apply_filter_policy
 
-from couchbase_haystack.document_stores import CouchbaseDocumentStore
+from couchbase_haystack.document_stores import AsyncCouchbaseDocumentStore, CouchbaseDocumentStore
+from couchbase_haystack.document_stores.document_store import VECTOR_QUERY_COMBINATIONS
+from couchbase_haystack.document_stores.similarity import _validate_mmr_lambda, _validate_similarity
 
 
 @component
@@ -49,25 +54,86 @@ class CouchbaseEmbeddingRetriever:
         *,
         document_store: CouchbaseDocumentStore,
         top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        filter_policy: Union[str, FilterPolicy] = FilterPolicy.REPLACE,
+        use_search_fields: Optional[bool] = None,
+        return_embedding: bool = True,
+        fields: Optional[List[str]] = None,
+        use_query_cache: bool = True,
+        num_candidates: Optional[int] = None,
+        rerank: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        embedding_field: Optional[str] = None,
+        vector_query_combination: str = "or",
     ):
         """
         Create the CouchbaseDocumentStore component.
 
-        Note: Currently, the filter option is not supported with embedding queries.
-        Instead, you can provide a couchbase search query while running the embedding query.
-        The embedding query and search query are combined using an OR operation.
+        Filters are compiled into a pre-filter of the vector query, so the nearest neighbours are searched among the
+        matching Documents only. A couchbase search query can also be provided while running the embedding query,
+        the embedding query and search query are combined using an OR operation.
 
-        :param document_store: An instance of CouchbaseDocumentStore.
+        :param document_store: An instance of CouchbaseDocumentStore. Use an AsyncCouchbaseDocumentStore to be able
+            to call `run_async`.
         :param top_k: Maximum number of Documents to return.
+        :param filters: Filters applied to the retrieved Documents.
+        :param filter_policy: Policy to determine how runtime filters are combined with the `filters` given at
+            initialization.
+        :param use_search_fields: If True, Documents are rebuilt from the fields stored in the search index instead of
+            being fetched from the key-value service. Defaults to the `use_search_fields` value of the document store.
+        :param return_embedding: Whether to return the embedding of the retrieved Documents.
+        :param fields: Document fields to return, e.g. `["content", "meta.title"]`. Defaults to all fields.
+        :param use_query_cache: Whether to use the query cache of the document store, if it has one.
+        :param num_candidates: Number of nearest neighbours searched by the vector index. Defaults to `top_k`.
+        :param rerank: Similarity used to rescore the `num_candidates` neighbours with their exact embeddings before
+            keeping the `top_k` best ones, one of `cosine`, `dot_product` or `l2_norm`. Lets an approximate index,
+            e.g. one optimized for memory, return the exact ranking of its candidates. Defaults to None, no
+            reranking.
+        :param mmr_lambda: Enables the Maximal Marginal Relevance mode: the `top_k` Documents are picked among the
+            `num_candidates` neighbours by trading relevance to the query (1) for dissimilarity to the Documents
+            already picked (0), which avoids returning near duplicates. Uses the `rerank` similarity, `cosine` by
+            default, and `num_candidates` defaults to 4 times `top_k`. Defaults to None, no diversification.
+        :param embedding_field: Embedding field searched by the vector index, one of the `embedding_fields` of the
+            document store to search a truncated copy of the embeddings, e.g. the first 256 dimensions of a Matryoshka
+            embedding. The query embedding is truncated the same way. Set `rerank` to rescore the candidates with
+            their full embedding. Defaults to `embedding`.
+        :param vector_query_combination: How the hits of the `vector_queries` given at runtime are combined with
+            those of the query embedding, `or` or `and`.
 
-        :raises ValueError: If `document_store` is not an instance of `CouchbaseDocumentStore`.
+        :raises ValueError: If `document_store` is not an instance of `CouchbaseDocumentStore`, `rerank` or
+            `vector_query_combination` is unknown, `mmr_lambda` is not between 0 and 1 or `num_candidates` is lower
+            than 1 or than `top_k`.
         """
         if not isinstance(document_store, CouchbaseDocumentStore):
             msg = "document_store must be an instance of CouchbaseDocumentStore"
             raise ValueError(msg)
+        if rerank is not None:
+            _validate_similarity(rerank)
+        if mmr_lambda is not None:
+            _validate_mmr_lambda(mmr_lambda)
+        _validate_num_candidates(num_candidates, top_k)
+        if vector_query_combination not in VECTOR_QUERY_COMBINATIONS:
+            msg = (
+                f"Unknown vector query combination '{vector_query_combination}'. "
+                f"Supported combinations are: {VECTOR_QUERY_COMBINATIONS}"
+            )
+            raise ValueError(msg)
 
         self.document_store = document_store
         self.top_k = top_k
+        self.filters = filters
+        self.filter_policy = (
+            filter_policy if isinstance(filter_policy, FilterPolicy) else FilterPolicy.from_str(filter_policy)
+        )
+        self.use_search_fields = use_search_fields
+        self.return_embedding = return_embedding
+        self.fields = fields
+        self.use_query_cache = use_query_cache
+        self.num_candidates = num_candidates
+        self.rerank = rerank
+        self.mmr_lambda = mmr_lambda
+        self.embedding_field = embedding_field
+        self.vector_query_combination = vector_query_combination
 
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -79,6 +145,17 @@ class CouchbaseEmbeddingRetriever:
         return default_to_dict(
             self,
             top_k=self.top_k,
+            filters=self.filters,
+            filter_policy=self.filter_policy.value,
+            use_search_fields=self.use_search_fields,
+            return_embedding=self.return_embedding,
+            fields=self.fields,
+            use_query_cache=self.use_query_cache,
+            num_candidates=self.num_candidates,
+            rerank=self.rerank,
+            mmr_lambda=self.mmr_lambda,
+            embedding_field=self.embedding_field,
+            vector_query_combination=self.vector_query_combination,
             document_store=self.document_store.to_dict(),
         )
 
@@ -92,7 +169,14 @@ class CouchbaseEmbeddingRetriever:
         :returns:
               Deserialized component.
         """
-        data["init_parameters"]["document_store"] = CouchbaseDocumentStore.from_dict(data["init_parameters"]["document_store"])
+        document_store = data["init_parameters"]["document_store"]
+        if document_store["type"] == generate_qualified_class_name(AsyncCouchbaseDocumentStore):
+            data["init_parameters"]["document_store"] = AsyncCouchbaseDocumentStore.from_dict(document_store)
+        else:
+            data["init_parameters"]["document_store"] = CouchbaseDocumentStore.from_dict(document_store)
+        filter_policy = data["init_parameters"].get("filter_policy")
+        if filter_policy:
+            data["init_parameters"]["filter_policy"] = FilterPolicy.from_str(filter_policy)
         return default_from_dict(cls, data)
 
     @component.output_types(documents=List[Document])
@@ -102,27 +186,187 @@ class CouchbaseEmbeddingRetriever:
         top_k: Optional[int] = None,
         search_query: Optional[SearchQuery] = None,
         limit: Optional[int] = None,
+        *,
+        filters: Optional[Dict[str, Any]] = None,
+        use_search_fields: Optional[bool] = None,
+        return_embedding: Optional[bool] = None,
+        fields: Optional[List[str]] = None,
+        use_query_cache: Optional[bool] = None,
+        vector_queries: Optional[Dict[str, List[float]]] = None,
     ) -> Dict[str, List[Document]]:
         """
         Retrieve documents from the CouchbaseDocumentStore, based on the provided embedding similarity.
 
         :param query_embedding: Embedding of the query.
-        :param filters: Filters applied to the retrieved Documents. The way runtime filters are applied depends on
-                        the `filter_policy` chosen at document store initialization. See init method docstring for more
-                        details.
         :param top_k: Maximum number of Documents to be returned from vector query. Overrides the value specified at
         initialization.
         :param search: Search filters param which is parsed to the Couchbase search query. The vector
         query and search query are ORed operation.
         :param limit: Maximum number of Documents to be return by the couchbase fts search request.
         Default value is top_k.
+        :param filters: Filters applied to the retrieved Documents. The way runtime filters are applied depends on
+        the `filter_policy` chosen at retriever initialization. See init method docstring for more details.
+        :param use_search_fields: Whether to rebuild Documents from the fields stored in the search index.
+        Overrides the value specified at initialization.
+        :param return_embedding: Whether to return the embedding of the retrieved Documents. Overrides the value
+        specified at initialization.
+        :param fields: Document fields to return. Overrides the value specified at initialization.
+        :param use_query_cache: Whether to use the query cache of the document store. Overrides the value specified
+        at initialization.
+        :param vector_queries: Additional query embeddings keyed by the embedding field they search, e.g.
+        `{"title_embedding": title_embedding}`. They are sent in the same search request as `query_embedding`.
         :returns: A dictionary with the following keys:
             - `documents`: List of Documents most similar to the given `query_embedding`
+        :raises ValueError: If `top_k` is greater than the `num_candidates` given at initialization.
         """
 
         top_k = top_k or self.top_k
+        _validate_num_candidates(self.num_candidates, top_k)
+        filters = apply_filter_policy(self.filter_policy, self.filters, filters)
+        if use_search_fields is None:
+            use_search_fields = self.use_search_fields
+        if return_embedding is None:
+            return_embedding = self.return_embedding
+        fields = fields or self.fields
+
+        if use_query_cache is None:
+            use_query_cache = self.use_query_cache
 
         docs = self.document_store._embedding_retrieval(
-            query_embedding=query_embedding, top_k=top_k, search_query=search_query, limit=limit
+            query_embedding=query_embedding,
+            top_k=top_k,
+            search_query=search_query,
+            limit=limit,
+            filters=filters,
+            use_search_fields=use_search_fields,
+            return_embedding=return_embedding,
+            fields=fields,
+            use_query_cache=use_query_cache,
+            num_candidates=self.num_candidates,
+            rerank=self.rerank,
+            mmr_lambda=self.mmr_lambda,
+            embedding_field=self.embedding_field,
+            vector_queries=vector_queries,
+            vector_query_combination=self.vector_query_combination,
         )
         return {"documents": docs}
+
+    def run_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: Optional[int] = None,
+        search_query: Optional[SearchQuery] = None,
+        limit: Optional[int] = None,
+        *,
+        filters: Optional[Dict[str, Any]] = None,
+        use_search_fields: Optional[bool] = None,
+        return_embedding: Optional[bool] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, List[List[Document]]]:
+        """
+        Retrieve documents for several query embeddings at once.
+
+        The vector searches run concurrently and the hits of all queries are fetched from Couchbase in a single,
+        deduplicated request.
+
+        :param query_embeddings: Embeddings of the queries.
+        Takes the same other parameters as `run`.
+        :returns: A dictionary with the following keys:
+            - `documents`: One list of Documents per query embedding, in the same order as `query_embeddings`.
+        """
+        top_k = top_k or self.top_k
+        _validate_num_candidates(self.num_candidates, top_k)
+        filters = apply_filter_policy(self.filter_policy, self.filters, filters)
+        if use_search_fields is None:
+            use_search_fields = self.use_search_fields
+        if return_embedding is None:
+            return_embedding = self.return_embedding
+        fields = fields or self.fields
+
+        docs = self.document_store._embedding_retrieval_batch(
+            query_embeddings=query_embeddings,
+            top_k=top_k,
+            search_query=search_query,
+            limit=limit,
+            filters=filters,
+            use_search_fields=use_search_fields,
+            return_embedding=return_embedding,
+            fields=fields,
+            num_candidates=self.num_candidates,
+            rerank=self.rerank,
+            mmr_lambda=self.mmr_lambda,
+            embedding_field=self.embedding_field,
+        )
+        return {"documents": docs}
+
+    @component.output_types(documents=List[Document])
+    async def run_async(
+        self,
+        query_embedding: List[float],
+        top_k: Optional[int] = None,
+        search_query: Optional[SearchQuery] = None,
+        limit: Optional[int] = None,
+        *,
+        filters: Optional[Dict[str, Any]] = None,
+        use_search_fields: Optional[bool] = None,
+        return_embedding: Optional[bool] = None,
+        fields: Optional[List[str]] = None,
+        use_query_cache: Optional[bool] = None,
+        vector_queries: Optional[Dict[str, List[float]]] = None,
+    ) -> Dict[str, List[Document]]:
+        """
+        Asynchronously retrieve documents from the AsyncCouchbaseDocumentStore, based on the provided embedding
+        similarity.
+
+        Takes the same parameters as `run`.
+
+        :returns: A dictionary with the following keys:
+            - `documents`: List of Documents most similar to the given `query_embedding`
+        :raises ValueError: If the `document_store` is not an instance of `AsyncCouchbaseDocumentStore`, or `top_k`
+            is greater than the `num_candidates` given at initialization.
+        """
+        if not isinstance(self.document_store, AsyncCouchbaseDocumentStore):
+            msg = "run_async requires the document_store to be an instance of AsyncCouchbaseDocumentStore"
+            raise ValueError(msg)
+
+        top_k = top_k or self.top_k
+        _validate_num_candidates(self.num_candidates, top_k)
+        filters = apply_filter_policy(self.filter_policy, self.filters, filters)
+        if use_search_fields is None:
+            use_search_fields = self.use_search_fields
+        if return_embedding is None:
+            return_embedding = self.return_embedding
+        fields = fields or self.fields
+
+        if use_query_cache is None:
+            use_query_cache = self.use_query_cache
+
+        docs = await self.document_store._embedding_retrieval_async(
+            query_embedding=query_embedding,
+            top_k=top_k,
+            search_query=search_query,
+            limit=limit,
+            filters=filters,
+            use_search_fields=use_search_fields,
+            return_embedding=return_embedding,
+            fields=fields,
+            use_query_cache=use_query_cache,
+            num_candidates=self.num_candidates,
+            rerank=self.rerank,
+            mmr_lambda=self.mmr_lambda,
+            embedding_field=self.embedding_field,
+            vector_queries=vector_queries,
+            vector_query_combination=self.vector_query_combination,
+        )
+        return {"documents": docs}
+
+
+def _validate_num_candidates(num_candidates: Optional[int], top_k: int) -> None:
+    if num_candidates is None:
+        return
+    if num_candidates < 1:
+        msg = "num_candidates must be greater than 0"
+        raise ValueError(msg)
+    if num_candidates < top_k:
+        msg = f"num_candidates ({num_candidates}) must be greater than or equal to top_k ({top_k})"
+        raise ValueError(msg)
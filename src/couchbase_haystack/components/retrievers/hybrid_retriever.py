@@ -0,0 +1,190 @@
+# SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
+#
+# SPDX-License-Identifier: Apache-2.0
+from typing import Any, Dict, List, Optional, Union
+
+from haystack import component, default_from_dict, default_to_dict
+from haystack.core.serialization import generate_qualified_class_name
+from haystack.dataclasses import Document
+from haystack.document_stores.types import FilterPolicy
+from haystack.document_stores.types.filter_policy import apply_filter_policy
+
+from couchbase_haystack.document_stores import AsyncCouchbaseDocumentStore, CouchbaseDocumentStore
+from couchbase_haystack.document_stores.fusion import FUSION_METHODS
+
+
+@component
+class CouchbaseHybridRetriever:
+    """
+    Retrieves documents from the CouchbaseDocumentStore by combining a full-text search and a vector search.
+
+    Both searches run concurrently against the vector_search_index of the CouchbaseDocumentStore, their rankings
+    are fused with Reciprocal Rank Fusion (the default) or a weighted sum of min-max normalized scores, and only the
+    fused `top_k` Documents are fetched from Couchbase. The text field must be indexed by the search index.
+
+    Usage example:
+    ```python
+    from couchbase_haystack import CouchbaseDocumentStore, CouchbaseHybridRetriever, CouchbasePasswordAuthenticator
+
+    store = CouchbaseDocumentStore(cluster_connection_string=Secret.from_env_var("CB_CONNECTION_STRING"),
+        authenticator=CouchbasePasswordAuthenticator(
+            username=Secret.from_env_var("CB_USERNAME"),
+            password=Secret.from_env_var("CB_PASSWORD")
+        ),
+        bucket="haystack_test_bucket",
+        scope="scope_name",
+        collection="collection_name",
+        vector_search_index="vector_index")
+    retriever = CouchbaseHybridRetriever(document_store=store, fusion="weighted", weights=[0.3, 0.7])
+
+    results = retriever.run(query="What is Couchbase?", query_embedding=embedding)
+    print(results["documents"])
+    ```
+    """
+
+    def __init__(
+        self,
+        *,
+        document_store: CouchbaseDocumentStore,
+        top_k: int = 10,
+        text_top_k: Optional[int] = None,
+        vector_top_k: Optional[int] = None,
+        text_field: str = "content",
+        fusion: str = "reciprocal_rank_fusion",
+        weights: Optional[List[float]] = None,
+        rrf_k: int = 60,
+        filters: Optional[Dict[str, Any]] = None,
+        filter_policy: Union[str, FilterPolicy] = FilterPolicy.REPLACE,
+        return_embedding: bool = True,
+        fields: Optional[List[str]] = None,
+    ):
+        """
+        Create the CouchbaseHybridRetriever component.
+
+        :param document_store: An instance of CouchbaseDocumentStore.
+        :param top_k: Maximum number of Documents to return after fusion.
+        :param text_top_k: Number of candidates returned by the full-text search. Defaults to `top_k`.
+        :param vector_top_k: Number of candidates returned by the vector search. Defaults to `top_k`.
+        :param text_field: Field of the search index the text query is matched against.
+        :param fusion: How the rankings are fused, either `reciprocal_rank_fusion` or `weighted`.
+        :param weights: Weights of the text and vector rankings, in this order. Defaults to equal weights.
+        :param rrf_k: Rank constant of the reciprocal rank fusion.
+        :param filters: Filters applied to both searches.
+        :param filter_policy: Policy to determine how runtime filters are combined with the `filters` given at
+            initialization.
+        :param return_embedding: Whether to return the embedding of the retrieved Documents.
+        :param fields: Document fields to return, e.g. `["content", "meta.title"]`. Defaults to all fields.
+
+        :raises ValueError: If `document_store` is not an instance of `CouchbaseDocumentStore`, `fusion` is unknown or
+            `weights` does not contain exactly two values.
+        """
+        if not isinstance(document_store, CouchbaseDocumentStore):
+            msg = "document_store must be an instance of CouchbaseDocumentStore"
+            raise ValueError(msg)
+        if fusion not in FUSION_METHODS:
+            msg = f"Unknown fusion method '{fusion}'. Supported methods are: {list(FUSION_METHODS.keys())}"
+            raise ValueError(msg)
+        if weights is not None and len(weights) != 2:  # noqa: PLR2004
+            msg = "weights must contain exactly two values, the text weight and the vector weight"
+            raise ValueError(msg)
+
+        self.document_store = document_store
+        self.top_k = top_k
+        self.text_top_k = text_top_k
+        self.vector_top_k = vector_top_k
+        self.text_field = text_field
+        self.fusion = fusion
+        self.weights = weights
+        self.rrf_k = rrf_k
+        self.filters = filters
+        self.filter_policy = (
+            filter_policy if isinstance(filter_policy, FilterPolicy) else FilterPolicy.from_str(filter_policy)
+        )
+        self.return_embedding = return_embedding
+        self.fields = fields
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serializes the component to a dictionary.
+
+        :returns:
+            Dictionary with serialized data.
+        """
+        return default_to_dict(
+            self,
+            top_k=self.top_k,
+            text_top_k=self.text_top_k,
+            vector_top_k=self.vector_top_k,
+            text_field=self.text_field,
+            fusion=self.fusion,
+            weights=self.weights,
+            rrf_k=self.rrf_k,
+            filters=self.filters,
+            filter_policy=self.filter_policy.value,
+            return_embedding=self.return_embedding,
+            fields=self.fields,
+            document_store=self.document_store.to_dict(),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CouchbaseHybridRetriever":
+        """
+        Deserializes the component from a dictionary.
+
+        :param data:
+            Dictionary to deserialize from.
+        :returns:
+              Deserialized component.
+        """
+        document_store = data["init_parameters"]["document_store"]
+        if document_store["type"] == generate_qualified_class_name(AsyncCouchbaseDocumentStore):
+            data["init_parameters"]["document_store"] = AsyncCouchbaseDocumentStore.from_dict(document_store)
+        else:
+            data["init_parameters"]["document_store"] = CouchbaseDocumentStore.from_dict(document_store)
+        filter_policy = data["init_parameters"].get("filter_policy")
+        if filter_policy:
+            data["init_parameters"]["filter_policy"] = FilterPolicy.from_str(filter_policy)
+        return default_from_dict(cls, data)
+
+    @component.output_types(documents=List[Document])
+    def run(
+        self,
+        query: str,
+        query_embedding: List[float],
+        top_k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        fusion: Optional[str] = None,
+        weights: Optional[List[float]] = None,
+    ) -> Dict[str, List[Document]]:
+        """
+        Retrieve documents from the CouchbaseDocumentStore matching both the text query and the query embedding.
+
+        :param query: Text of the query.
+        :param query_embedding: Embedding of the query.
+        :param top_k: Maximum number of Documents to return. Overrides the value specified at initialization.
+        :param filters: Filters applied to both searches. The way runtime filters are applied depends on
+        the `filter_policy` chosen at retriever initialization.
+        :param fusion: Fusion method. Overrides the value specified at initialization.
+        :param weights: Weights of the text and vector rankings. Overrides the value specified at initialization.
+        :returns: A dictionary with the following keys:
+            - `documents`: List of Documents ordered by fused score, the `score` of each Document is its fused score.
+        """
+        top_k = top_k or self.top_k
+        filters = apply_filter_policy(self.filter_policy, self.filters, filters)
+
+        docs = self.document_store._hybrid_retrieval(
+            query=query,
+            query_embedding=query_embedding,
+            top_k=top_k,
+            text_top_k=self.text_top_k,
+            vector_top_k=self.vector_top_k,
+            text_field=self.text_field,
+            filters=filters,
+            fusion=fusion or self.fusion,
+            weights=weights or self.weights,
+            rrf_k=self.rrf_k,
+            return_embedding=self.return_embedding,
+            fields=self.fields,
+        )
+        return {"documents": docs}
@@ -1,14 +1,25 @@
 # SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
 #
 # SPDX-License-Identifier: Apache-2.0
+from .async_document_store import AsyncCouchbaseDocumentStore
 from .auth import CouchbaseAuthenticator, CouchbaseCertificateAuthenticator, CouchbasePasswordAuthenticator
+from .bulk import BatchWriteResult, DeleteResult
+from .cache import CacheInfo
 from .cluster_options import CouchbaseClusterOptions
 from .document_store import CouchbaseDocumentStore
+from .search_index import SearchIndexResult
+from .write_options import CouchbaseWriteOptions
 
 __all__ = [
     "CouchbaseDocumentStore",
+    "AsyncCouchbaseDocumentStore",
     "CouchbaseAuthenticator",
     "CouchbasePasswordAuthenticator",
     "CouchbaseCertificateAuthenticator",
     "CouchbaseClusterOptions",
+    "CouchbaseWriteOptions",
+    "BatchWriteResult",
+    "DeleteResult",
+    "CacheInfo",
+    "SearchIndexResult",
 ]
@@ -0,0 +1,561 @@
+# SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
+#
+# SPDX-License-Identifier: Apache-2.0
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from acouchbase.cluster import AsyncCluster
+from acouchbase.collection import AsyncCollection
+from acouchbase.scope import AsyncScope
+from couchbase import subdocument
+from couchbase.exceptions import DocumentExistsException, DocumentNotFoundException
+from couchbase.result import SearchResult
+from couchbase.search import SearchQuery
+from haystack.dataclasses.document import Document
+from haystack.document_stores.errors import DocumentStoreError, DuplicateDocumentError
+from haystack.document_stores.types import DuplicatePolicy
+
+from .bulk import _TRANSIENT_ERRORS, DeleteResult, _backoff_delay, _batched, _is_retryable
+from .document_store import (
+    CouchbaseDocumentStore,
+    _candidate_count,
+    _copy_documents,
+    _document_from_search_fields,
+    _gsi_indexed_fields,
+    _merge_values,
+    _mutation_count,
+    _projection,
+    _query_cache_key,
+    _raw,
+    _rerank,
+    _rerank_projection,
+    _search_fields,
+    _unflatten,
+    _unstored_paths,
+    _validate_delete_by_filter,
+    _validate_rerank,
+)
+from .filters import compile_filters
+from .search_index import _stored_paths
+from .sql_filters import _is_sargable
+from .write_options import CouchbaseWriteOptions
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCouchbaseDocumentStore(CouchbaseDocumentStore):
+    """
+    AsyncCouchbaseDocumentStore extends CouchbaseDocumentStore with a native asyncio API built on the
+    [acouchbase](https://docs.couchbase.com/python-sdk/current/howtos/concurrent-async-apis.html) SDK.
+
+    Every `*_async` method runs on the event loop without blocking a worker thread, so a single loop can keep
+    many vector searches and key-value operations in flight. The synchronous API inherited from
+    CouchbaseDocumentStore remains available and uses its own, separate cluster connection.
+    """
+
+    def __init__(self, **kwargs: Any):
+        """
+        Creates a new AsyncCouchbaseDocumentStore instance.
+
+        Accepts the same parameters as CouchbaseDocumentStore. The async cluster connection is opened lazily,
+        on the first awaited call.
+
+        :raises ValueError: If the collection name contains invalid characters.
+        """
+        super().__init__(**kwargs)
+        self._async_connection: Optional[AsyncCluster] = None
+        self._async_scope: Optional[AsyncScope] = None
+        self._async_collection: Optional[AsyncCollection] = None
+        self._async_lock: Optional[asyncio.Lock] = None
+
+    async def _get_async_connection(self) -> AsyncCluster:
+        if self._async_connection is None:
+            cluster_options = self.cluster_options.get_cluster_options(self.authenticator.get_cb_auth())
+            if self.cluster_options.get("profile") is not None:
+                cluster_options.apply_profile(self.cluster_options["profile"])
+            connection = await AsyncCluster.connect(
+                self.cluster_connection_string.resolve_value(),
+                cluster_options,
+                **self._kwargs,
+            )
+            await connection.wait_until_ready(timeout=timedelta(seconds=60))
+            self._async_connection = connection
+        return self._async_connection
+
+    async def _get_async_scope(self) -> AsyncScope:
+        if self._async_scope is None:
+            if self._async_lock is None:
+                self._async_lock = asyncio.Lock()
+            async with self._async_lock:
+                if self._async_scope is None:
+                    connection = await self._get_async_connection()
+                    bucket = connection.bucket(self.bucket)
+                    await bucket.on_connect()
+                    scopes_specs = await bucket.collections().get_all_scopes()
+                    scope_spec = next((spec for spec in scopes_specs if spec.name == self.scope_name), None)
+                    if scope_spec is None:
+                        msg = f"Scope '{self.scope_name}' does not exist in bucket '{self.bucket}'."
+                        raise ValueError(msg)
+                    if not any(col_spec.name == self.collection_name for col_spec in scope_spec.collections):
+                        msg = f"Collection '{self.collection_name}' does not exist in scope '{self.scope_name}'."
+                        raise ValueError(msg)
+                    self._async_scope = bucket.scope(self.scope_name)
+        return self._async_scope
+
+    async def _get_async_collection(self) -> AsyncCollection:
+        if self._async_collection is None:
+            scope = await self._get_async_scope()
+            self._async_collection = scope.collection(self.collection_name)
+        return self._async_collection
+
+    async def close_async(self) -> None:
+        """
+        Closes the async cluster connection, if it was opened.
+        """
+        if self._async_connection is not None:
+            await self._async_connection.close()
+        self._async_connection = None
+        self._async_scope = None
+        self._async_collection = None
+        # the lock is bound to the event loop it was first used on, a new connection may run on another one
+        self._async_lock = None
+
+    async def count_documents_async(self) -> int:
+        """
+        Asynchronously returns how many documents are present in the document store.
+
+        :returns: The number of documents in the document store.
+        """
+        scope = await self._get_async_scope()
+        return await scope.search_indexes().get_indexed_documents_count(self.vector_search_index)
+
+    async def filter_documents_async(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        return_embedding: bool = True,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        page_size: int = 1000,
+    ) -> List[Document]:
+        """
+        Asynchronously returns the documents that match the filters provided.
+
+        For a detailed specification of the filters,
+        refer to the Haystack [documentation](https://docs.haystack.deepset.ai/v2.0/docs/metadata-filtering).
+
+        :param filters: The filters to apply. It returns only the documents that match the filters.
+        :param return_embedding: Whether to return the embedding of the Documents.
+        :param fields: Document fields to return, e.g. `["content", "meta.title"]`. Defaults to all fields.
+        :param limit: Maximum number of Documents to return. Defaults to all matching Documents.
+        :param page_size: Number of Documents requested from the search index and the key-value service at a time.
+        :returns: A list of Documents that match the given filters.
+        :raises ValueError: If `page_size` is lower than 1.
+        """
+        iterator = self.filter_documents_iter_async(
+            filters, return_embedding=return_embedding, fields=fields, limit=limit, page_size=page_size
+        )
+        return [doc async for doc in iterator]
+
+    async def filter_documents_iter_async(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        return_embedding: bool = True,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        page_size: int = 1000,
+    ) -> AsyncIterator[Document]:
+        """
+        Asynchronously and lazily iterates over the documents that match the filters provided.
+
+        Like `CouchbaseDocumentStore.filter_documents_iter`, the Documents are decoded and yielded a page at a time,
+        so memory use is bounded by `page_size` with both filter backends.
+
+        :param filters: The filters to apply. It returns only the documents that match the filters.
+        :param return_embedding: Whether to return the embedding of the Documents.
+        :param fields: Document fields to return, e.g. `["content", "meta.title"]`. Defaults to all fields.
+        :param limit: Maximum number of Documents to return. Defaults to all matching Documents.
+        :param page_size: Number of Documents requested from the search index and the key-value service at a time.
+        :returns: An async iterator over the Documents that match the given filters.
+        :raises ValueError: If `page_size` is lower than 1.
+        """
+        if page_size < 1:
+            msg = "page_size must be greater than 0"
+            raise ValueError(msg)
+        projection = _projection(fields, return_embedding=return_embedding)
+        scope = await self._get_async_scope()
+        if await self._use_sql_filters_async(filters):
+            statement, options = self._filter_query(filters, projection, limit)
+            ids: List[str] = []
+            values: Dict[str, Dict[str, Any]] = {}
+            async for row in scope.query(statement, options).rows():
+                doc_id = row.pop("__id")
+                ids.append(doc_id)
+                values[doc_id] = _unflatten(row)
+                if len(ids) == page_size:
+                    for doc in self._documents_from_kv_values(ids, [None] * len(ids), values):  # type: ignore[list-item]
+                        yield doc
+                    ids, values = [], {}
+            for doc in self._documents_from_kv_values(ids, [None] * len(ids), values):  # type: ignore[list-item]
+                yield doc
+            return
+        returned = 0
+        search_after: Optional[str] = None
+        while limit is None or returned < limit:
+            size = page_size if limit is None else min(page_size, limit - returned)
+            request, options = self._filter_search_request(filters, size, search_after)
+            response = scope.search(self.vector_search_index, request, options)
+            # like the sync path, scans don't go through the document cache, which is meant for retrieval hits
+            page = await self._get_doc_from_kv_async(response, projection=projection, use_document_cache=False)
+            for doc in page:
+                yield doc
+            returned += len(page)
+            if len(page) < size:
+                break
+            search_after = page[-1].id
+
+    async def write_documents_async(
+        self,
+        documents: List[Document],
+        policy: DuplicatePolicy = DuplicatePolicy.NONE,
+        max_concurrency: int = 64,
+        write_options: Optional[CouchbaseWriteOptions] = None,
+    ) -> int:
+        """
+        Asynchronously writes documents into the couchbase collection.
+
+        :param documents: A list of Documents to write to the document store.
+        :param policy: The duplicate policy to use when writing documents.
+        :param max_concurrency: Maximum number of key-value mutations in flight at once.
+            Mutations failing with a transient error are retried as configured by `max_write_retries`.
+        :param write_options: Key-value options of this call, merged over the `write_options` of the store.
+        :raises DuplicateDocumentError: If a document with the same ID already exists in the document store
+             and the policy is set to DuplicatePolicy.FAIL (or not specified).
+        :raises ValueError: If the documents are not of type Document.
+        :returns: The number of documents written to the document store.
+        """
+        if len(documents) > 0:
+            if not isinstance(documents[0], Document):
+                msg = "param 'documents' must contain a list of objects of type Document"
+                raise ValueError(msg)
+
+        if policy == DuplicatePolicy.NONE:
+            policy = DuplicatePolicy.FAIL
+
+        collection = await self._get_async_collection()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        options = self.write_options.merge(write_options).get_options(policy)
+        expiries = self._document_expiries(documents)
+
+        async def write(doc: Document) -> Any:
+            cb_document = self._to_cb_document(doc)
+            doc_options = {**options, "expiry": expiries[doc.id]} if doc.id in expiries else options
+            for attempt in range(self.max_write_retries + 1):
+                if attempt > 0:
+                    await asyncio.sleep(_backoff_delay(attempt, self.write_retry_backoff))
+                try:
+                    async with semaphore:
+                        if policy == DuplicatePolicy.FAIL:
+                            return await collection.insert(doc.id, cb_document, **doc_options)
+                        return await collection.upsert(doc.id, cb_document, **doc_options)
+                except _TRANSIENT_ERRORS as e:
+                    # an insert that may have been applied would fail as a duplicate if sent again
+                    if attempt == self.max_write_retries or not _is_retryable(e, idempotent=policy != DuplicatePolicy.FAIL):
+                        raise
+
+        results = await asyncio.gather(*(write(doc) for doc in documents), return_exceptions=True)
+        self._invalidate_caches(doc.id for doc in documents)
+        duplicate_ids = []
+        other_errors = []
+        for doc, result in zip(documents, results):
+            if isinstance(result, DocumentExistsException):
+                duplicate_ids.append(doc.id)
+            elif isinstance(result, Exception):
+                other_errors.append({"id": doc.id, "exception": result})
+        if len(duplicate_ids) > 0:
+            msg = f"IDs '{', '.join(duplicate_ids)}' already exist in the document store."
+            raise DuplicateDocumentError(msg)
+        if len(other_errors) > 0:
+            msg = f"Failed to write documents to couchbase. Errors:\n{other_errors}"
+            raise DocumentStoreError(msg)
+        return len(documents)
+
+    async def _use_sql_filters_async(self, filters: Optional[Dict[str, Any]]) -> bool:
+        if self.filter_backend == "auto" and filters and _is_sargable(filters) and self._indexed_fields is None:
+            collection = await self._get_async_collection()
+            self._indexed_fields = _gsi_indexed_fields(await collection.query_indexes().get_all_indexes())
+        return self._use_sql_filters(filters)
+
+    async def delete_documents_async(
+        self, document_ids: List[str], batch_size: int = 1000, max_concurrency: int = 64
+    ) -> None:
+        """
+        Asynchronously deletes all documents with a matching document_ids from the document store.
+
+        IDs that do not exist are ignored.
+
+        :param document_ids: the document ids to delete
+        :param batch_size: Maximum number of documents removed before the next ones are sent.
+        :param max_concurrency: Maximum number of key-value mutations in flight at once.
+        :raises DocumentStoreError: If some documents could not be deleted.
+        """
+        if not document_ids:
+            return
+        collection = await self._get_async_collection()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        result = DeleteResult()
+        for batch in _batched(document_ids, batch_size):
+            result.update(await self._remove_async(collection, batch, semaphore))
+        if not result.all_ok:
+            failures = [{"id": id, "exception": result.errors[id]} for id in result.failed_ids]
+            msg = (
+                f"Failed to delete documents from couchbase, {result.deleted} of {len(document_ids)} documents were "
+                f"deleted. Errors:\n{failures}"
+            )
+            raise DocumentStoreError(msg)
+
+    async def _remove_async(
+        self, collection: AsyncCollection, document_ids: List[str], semaphore: asyncio.Semaphore
+    ) -> DeleteResult:
+        """
+        Removes the given documents concurrently, with at most as many mutations in flight as `semaphore` allows.
+        """
+
+        async def remove(document_id: str) -> Any:
+            async with semaphore:
+                return await collection.remove(document_id)
+
+        outcomes = await asyncio.gather(*(remove(id) for id in document_ids), return_exceptions=True)
+        self._invalidate_caches(document_ids)
+        result = DeleteResult()
+        for id, outcome in zip(document_ids, outcomes):
+            if isinstance(outcome, DocumentNotFoundException):
+                result.not_found += 1
+            elif isinstance(outcome, Exception):
+                result.failed_ids.append(id)
+                result.errors[id] = outcome
+            else:
+                result.deleted += 1
+        return result
+
+    async def delete_by_filter_async(
+        self,
+        filters: Dict[str, Any],
+        batch_size: int = 1000,
+        max_concurrency: int = 64,
+        *,
+        use_sql: bool = False,
+    ) -> DeleteResult:
+        """
+        Asynchronously deletes all the documents that match the filters provided.
+
+        The matching IDs are paged through from the search index and the documents of each page are removed with
+        at most `max_concurrency` key-value mutations in flight. With `use_sql`, they are instead deleted by a single
+        SQL++ `DELETE` statement, see `CouchbaseDocumentStore.delete_by_filter`.
+
+        :param filters: The filters the documents to delete match.
+        :param batch_size: Number of IDs requested from the search index at a time.
+        :param max_concurrency: Maximum number of key-value mutations in flight at once.
+        :param use_sql: Whether to delete the documents with a SQL++ query instead of the search index.
+        :returns: The number of deleted documents and the documents that could not be deleted.
+        :raises ValueError: If `filters` is empty or `batch_size` is invalid.
+        """
+        _validate_delete_by_filter(filters, batch_size)
+        scope = await self._get_async_scope()
+        if use_sql:
+            statement, options = self._delete_query(filters)
+            try:
+                response = scope.query(statement, options)
+                await response.execute()
+            finally:
+                self._invalidate_caches()
+            return DeleteResult(deleted=_mutation_count(response))
+
+        collection = await self._get_async_collection()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        result = DeleteResult()
+        search_after: Optional[str] = None
+        while True:
+            request, options = self._filter_search_request(filters, batch_size, search_after)
+            ids = [row.id async for row in scope.search(self.vector_search_index, request, options).rows()]
+            if not ids:
+                break
+            result.update(await self._remove_async(collection, ids, semaphore))
+            if len(ids) < batch_size:
+                break
+            search_after = ids[-1]
+        return result
+
+    async def _embedding_retrieval_async(
+        self,
+        query_embedding: List[float],
+        top_k: int = 10,
+        search_query: SearchQuery = None,
+        limit: Optional[int] = None,
+        *,
+        filters: Optional[Dict[str, Any]] = None,
+        use_search_fields: Optional[bool] = None,
+        return_embedding: bool = True,
+        fields: Optional[List[str]] = None,
+        use_query_cache: bool = True,
+        num_candidates: Optional[int] = None,
+        rerank: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        embedding_field: Optional[str] = None,
+        vector_queries: Optional[Dict[str, List[float]]] = None,
+        vector_query_combination: str = "or",
+    ) -> List[Document]:
+        """
+        Asynchronously finds the documents that are most similar to the provided `query_embedding`.
+
+        See `CouchbaseDocumentStore._embedding_retrieval` for a description of the parameters.
+
+        :returns: A list of Documents that are most similar to the given `query_embedding`
+        :raises ValueError: If `query_embedding` is empty, `num_candidates` is not positive, `rerank` is unknown,
+            `mmr_lambda` is not between 0 and 1, `embedding_field` or a field of `vector_queries` is not an embedding
+            field of the store or `vector_query_combination` is unknown.
+        :raises DocumentStoreError: If the retrieval of documents from Couchbase fails.
+        """
+        if not query_embedding:
+            msg = "Query embedding must not be empty"
+            raise ValueError(msg)
+        _validate_rerank(num_candidates, rerank, mmr_lambda)
+        search_embedding = self._search_embedding(query_embedding, embedding_field)
+        search_vectors = self._search_vectors(vector_queries, vector_query_combination)
+        if use_search_fields is None:
+            use_search_fields = self.use_search_fields
+
+        cache = self._query_cache if use_query_cache else None
+        if cache is not None:
+            key = _query_cache_key(
+                query_embedding,
+                top_k,
+                search_query=search_query,
+                limit=limit,
+                filters=filters,
+                use_search_fields=use_search_fields,
+                return_embedding=return_embedding,
+                fields=fields,
+                num_candidates=num_candidates,
+                rerank=rerank,
+                mmr_lambda=mmr_lambda,
+                embedding_field=embedding_field,
+                vector_queries=search_vectors,
+                vector_query_combination=vector_query_combination,
+            )
+            generation = cache.generation
+            cached = cache.get(key)
+            if cached is not None:
+                return _copy_documents(cached)
+
+        prefilter = compile_filters(filters) if filters else None
+        projection = _projection(fields, return_embedding=return_embedding)
+        scope = await self._get_async_scope()
+        if rerank is not None or mmr_lambda is not None:
+            request, options = self._vector_search_request(
+                search_embedding,
+                _candidate_count(top_k, num_candidates, mmr_lambda),
+                search_query,
+                limit,
+                prefilter=prefilter,
+                field_name=embedding_field,
+                vector_queries=search_vectors,
+                vector_query_combination=vector_query_combination,
+            )
+            response = scope.search(self.vector_search_index, request, options)
+            candidates = await self._get_doc_from_kv_async(response, projection=_rerank_projection(projection))
+            documents = _rerank(query_embedding, candidates, top_k, rerank, projection, mmr_lambda=mmr_lambda)
+        else:
+            request, options = self._vector_search_request(
+                search_embedding,
+                top_k,
+                search_query,
+                limit,
+                search_fields=_search_fields(fields, use_search_fields=use_search_fields),
+                prefilter=prefilter,
+                num_candidates=num_candidates,
+                field_name=embedding_field,
+                vector_queries=search_vectors,
+                vector_query_combination=vector_query_combination,
+            )
+            response = scope.search(self.vector_search_index, request, options)
+            documents = await self._get_doc_from_kv_async(response, use_search_fields=use_search_fields, projection=projection)
+        if cache is not None:
+            cache.put(key, _copy_documents(documents), generation)
+        return documents
+
+    async def _get_doc_from_kv_async(
+        self,
+        response: SearchResult,
+        *,
+        use_search_fields: bool = False,
+        projection: Optional[List[str]] = None,
+        use_document_cache: bool = True,
+    ) -> List[Document]:
+        ids: List[str] = []
+        scores: List[float] = []
+        values: Dict[str, Dict[str, Any]] = {}
+        async for row in response.rows():
+            ids.append(row.id)
+            scores.append(row.score)
+            if use_search_fields:
+                value = _document_from_search_fields(row.fields, projection)
+                if value is not None:
+                    values[row.id] = value
+        if values:
+            await self._complete_search_values_async(values, projection)
+        missing_ids = [id for id in dict.fromkeys(ids) if id not in values]
+        generation = self._document_cache.generation if self._document_cache is not None else None
+        cached = self._cached_documents(missing_ids, projection) if use_document_cache else {}
+        missing_ids = [id for id in missing_ids if id not in cached]
+        exceptions: Dict[str, Exception] = {}
+        if missing_ids:
+            collection = await self._get_async_collection()
+            if projection is not None:
+                specs = [subdocument.get(path) for path in projection]
+                results = await asyncio.gather(*(collection.lookup_in(id, specs) for id in missing_ids), return_exceptions=True)
+            else:
+                results = await asyncio.gather(*(collection.get(id) for id in missing_ids), return_exceptions=True)
+        else:
+            results = []
+        for id, result in zip(missing_ids, results):
+            if isinstance(result, Exception):
+                exceptions[id] = result
+            elif projection is not None:
+                values[id] = _unflatten(
+                    {path: result.content_as[_raw](i) for i, path in enumerate(projection) if result.exists(i)}
+                )
+            else:
+                values[id] = result.value
+        documents = self._documents_from_kv_values(ids, scores, values, exceptions, cached)
+        if projection is None and use_document_cache:
+            fetched_ids = set(missing_ids)
+            self._cache_documents((doc for doc in documents if doc.id in fetched_ids), generation)
+        return documents
+
+    async def _complete_search_values_async(self, values: Dict[str, Dict[str, Any]], projection: Optional[List[str]]) -> None:
+        """
+        Fetches in place the paths of the documents rebuilt from search fields that the index does not store.
+
+        Documents that cannot be looked up are removed from `values`, they are fetched again whole.
+        """
+        if self._index_stored_paths is None:
+            scope = await self._get_async_scope()
+            index = await scope.search_indexes().get_index(self.vector_search_index)
+            self._index_stored_paths = _stored_paths(index.params, f"{self.scope_name}.{self.collection_name}")
+        unstored = _unstored_paths(self._index_stored_paths, projection, self.meta_embedding_fields)
+        if not unstored:
+            return
+        collection = await self._get_async_collection()
+        specs = [subdocument.get(path) for path in unstored]
+        ids = list(values)
+        results = await asyncio.gather(*(collection.lookup_in(id, specs) for id in ids), return_exceptions=True)
+        for id, result in zip(ids, results):
+            if isinstance(result, Exception):
+                del values[id]
+                continue
+            fetched = _unflatten({path: result.content_as[_raw](i) for i, path in enumerate(unstored) if result.exists(i)})
+            values[id] = _merge_values(values[id], fetched)
@@ -0,0 +1,154 @@
+# SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
+#
+# SPDX-License-Identifier: Apache-2.0
+import random
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Set, TypeVar
+
+from couchbase.exceptions import (
+    AmbiguousTimeoutException,
+    DocumentLockedException,
+    DurabilitySyncWriteAmbiguousException,
+    RequestCanceledException,
+    ServiceUnavailableException,
+    TemporaryFailException,
+    TimeoutException,
+    UnAmbiguousTimeoutException,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# errors that may succeed when the same mutation is sent again, e.g. during a rebalance
+_TRANSIENT_ERRORS = (
+    AmbiguousTimeoutException,
+    DocumentLockedException,
+    DurabilitySyncWriteAmbiguousException,
+    RequestCanceledException,
+    ServiceUnavailableException,
+    TemporaryFailException,
+    TimeoutException,
+    UnAmbiguousTimeoutException,
+)
+# errors after which the mutation may have been applied, an insert sent again would then fail as a duplicate.
+# A timed out or canceled request may have reached the server whatever the SDK reports, so all of them count.
+_AMBIGUOUS_ERRORS = (
+    AmbiguousTimeoutException,
+    DurabilitySyncWriteAmbiguousException,
+    RequestCanceledException,
+    TimeoutException,
+    UnAmbiguousTimeoutException,
+)
+_MAX_RETRY_BACKOFF = 10.0
+
+
+@dataclass
+class BatchWriteResult:
+    """
+    Outcome of writing a single batch of documents to Couchbase.
+
+    :param batch_index: Position of the batch in the input, starting at 0.
+    :param written: Number of documents successfully written.
+    :param written_ids: IDs of the documents successfully written, including the ones written by a retry.
+    :param duplicate_ids: IDs rejected because they already exist in the collection.
+    :param failed_ids: IDs that could not be written for any other reason, after all retries.
+    :param ambiguous_ids: The failed IDs whose write may have been applied anyway, after a timeout or a canceled
+        request. Inserts that failed this way are not retried, they would fail as duplicates if they were applied.
+    :param errors: The exception raised for each failed or duplicate ID.
+    :param retries: Number of times the transiently failed documents of the batch were sent again.
+    """
+
+    batch_index: int
+    written: int = 0
+    written_ids: List[str] = field(default_factory=list)
+    duplicate_ids: List[str] = field(default_factory=list)
+    failed_ids: List[str] = field(default_factory=list)
+    ambiguous_ids: List[str] = field(default_factory=list)
+    errors: Dict[str, Exception] = field(default_factory=dict)
+    retries: int = 0
+
+    @property
+    def all_ok(self) -> bool:
+        return not self.duplicate_ids and not self.failed_ids
+
+
+@dataclass
+class DeleteResult:
+    """
+    Outcome of deleting documents from Couchbase.
+
+    :param deleted: Number of documents deleted.
+    :param not_found: Number of documents that no longer existed, e.g. because they expired or were deleted by
+        another client in the meantime.
+    :param failed_ids: IDs that could not be deleted.
+    :param errors: The exception raised for each failed ID.
+    """
+
+    deleted: int = 0
+    not_found: int = 0
+    failed_ids: List[str] = field(default_factory=list)
+    errors: Dict[str, Exception] = field(default_factory=dict)
+
+    @property
+    def all_ok(self) -> bool:
+        return not self.failed_ids
+
+    def update(self, other: "DeleteResult") -> None:
+        """
+        Adds the counts and failures of `other` to this result.
+        """
+        self.deleted += other.deleted
+        self.not_found += other.not_found
+        self.failed_ids.extend(other.failed_ids)
+        self.errors.update(other.errors)
+
+
+def _is_retryable(error: BaseException, *, idempotent: bool) -> bool:
+    """
+    Returns whether a mutation that failed with `error` can be sent again, ambiguous errors only if it is idempotent.
+    """
+    return isinstance(error, _TRANSIENT_ERRORS) and (idempotent or not isinstance(error, _AMBIGUOUS_ERRORS))
+
+
+def _backoff_delay(attempt: int, base: float) -> float:
+    """
+    Returns the delay before the `attempt`-th retry, exponential backoff with full jitter.
+    """
+    return random.uniform(0, min(_MAX_RETRY_BACKOFF, base * 2 ** (attempt - 1)))  # noqa: S311
+
+
+def _batched(items: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    """
+    Splits `items` into lists of at most `batch_size` elements, consuming the iterable lazily.
+    """
+    if batch_size < 1:
+        msg = "batch_size must be greater than 0"
+        raise ValueError(msg)
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _concurrent_map(fn: Callable[..., R], arguments: Iterable[Sequence[Any]], max_concurrency: int) -> Iterator[R]:
+    """
+    Calls `fn` with each tuple of `arguments` in a thread pool, yielding the results as they complete.
+
+    `arguments` is consumed lazily and at most `max_concurrency` calls are in flight at any time.
+    """
+    if max_concurrency < 1:
+        msg = "max_concurrency must be greater than 0"
+        raise ValueError(msg)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        in_flight: Set[Future] = set()
+        for args in arguments:
+            if len(in_flight) >= max_concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from (f.result() for f in done)
+            in_flight.add(executor.submit(fn, *args))
+        for f in as_completed(in_flight):
+            yield f.result()
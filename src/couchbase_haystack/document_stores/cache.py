@@ -0,0 +1,91 @@
+# SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
+#
+# SPDX-License-Identifier: Apache-2.0
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Generic, Hashable, Iterable, NamedTuple, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class CacheInfo(NamedTuple):
+    """
+    Statistics of a document store cache.
+
+    :param hits: Number of lookups answered from the cache.
+    :param misses: Number of lookups that were not in the cache, or had expired.
+    :param maxsize: Maximum number of entries kept in the cache.
+    :param currsize: Number of entries currently in the cache.
+    """
+
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class _LRUCache(Generic[V]):
+    """
+    A thread safe, size bounded LRU cache whose entries expire `ttl` seconds after being stored.
+
+    Every `clear` or `discard` starts a new generation. Values computed before an invalidation can be stored with the
+    generation read before computing them, `put` then drops them instead of caching results that may predate a write.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        if maxsize < 1:
+            msg = "maxsize must be greater than 0"
+            raise ValueError(msg)
+        if ttl is not None and ttl <= 0:
+            msg = "ttl must be greater than 0"
+            raise ValueError(msg)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._generation = 0
+        self._entries: OrderedDict[Hashable, Tuple[float, V]] = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: V, generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, keys: Iterable[Hashable]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
@@ -1,22 +1,32 @@
 # SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
 #
 # SPDX-License-Identifier: Apache-2.0
+import copy
+import hashlib
+import json
 import logging
 import re
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from datetime import timedelta
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
-from couchbase import search
+import numpy as np
+from couchbase import search, subdocument
 from couchbase.cluster import Cluster
 from couchbase.collection import Collection
-from couchbase.exceptions import DocumentExistsException
+from couchbase.exceptions import DocumentExistsException, DocumentNotFoundException, SearchIndexNotFoundException
+from couchbase.management.queries import QueryIndex
+from couchbase.management.search import SearchIndex
 
 # needed for options -- cluster, timeout, SQL++ (N1QL) query, etc.
-from couchbase.options import SearchOptions
-from couchbase.result import MultiMutationResult, SearchResult
+from couchbase.options import InsertOptions, QueryOptions, SearchOptions, UpsertOptions, VectorSearchOptions
+from couchbase.result import MultiMutationResult, QueryResult, SearchResult
 from couchbase.scope import Scope
 from couchbase.search import SearchQuery
-from couchbase.vector_search import VectorQuery, VectorSearch
+from couchbase.vector_search import VectorQuery, VectorQueryCombination, VectorSearch
 from haystack import default_from_dict, default_to_dict
 from haystack.core.serialization import generate_qualified_class_name
 from haystack.dataclasses.document import Document
@@ -25,11 +35,52 @@ from haystack.document_stores.types import DuplicatePolicy
 from haystack.utils.auth import Secret, deserialize_secrets_inplace
 
 from .auth import CouchbaseCertificateAuthenticator, CouchbasePasswordAuthenticator
+from .bulk import (
+    _AMBIGUOUS_ERRORS,
+    BatchWriteResult,
+    DeleteResult,
+    _backoff_delay,
+    _batched,
+    _concurrent_map,
+    _is_retryable,
+)
+from .cache import CacheInfo, _LRUCache
 from .cluster_options import CouchbaseClusterOptions
-from .filters import _normalize_filters
+from .encoding import (
+    _decode_embedding,
+    _encode_embedding,
+    _encode_embeddings,
+    _truncate_embedding,
+    _truncate_embeddings,
+    _validate_embedding_format,
+)
+from .filters import compile_filters
+from .fusion import FUSION_METHODS, Ranking, _fuse
+from .search_index import (
+    SearchIndexResult,
+    _definition_changes,
+    _merge_index_definition,
+    _stored_paths,
+    _vector_index_definition,
+)
+from .similarity import _mmr_documents, _rerank_documents, _validate_mmr_lambda, _validate_similarity
+from .sql_filters import _field_path, _filter_fields, _indexed_fields, _is_sargable, _normalize_filters_sql
+from .write_options import CouchbaseWriteOptions, _expiry_from_meta
 
 logger = logging.getLogger(__name__)
 
+# top level fields of a serialized Document, see `CouchbaseDocumentStore._to_cb_document`
+_DOCUMENT_FIELDS = ["content", "dataframe", "blob", "meta", "embedding"]
+# services `filter_documents` can run on, `auto` picks SQL++ when GSI indexes cover the filtered fields
+FILTER_BACKENDS = ["fts", "sql", "auto"]
+# how the hits of several vector queries of a single search request are combined
+VECTOR_QUERY_COMBINATIONS = ["or", "and"]
+# the key-value service accepts at most 16 paths in a single sub-document lookup
+_MAX_LOOKUP_SPECS = 16
+_MAX_LOOKUP_CONCURRENCY = 16
+# candidates fetched per returned Document when diversifying with Maximal Marginal Relevance
+_MMR_CANDIDATES_FACTOR = 4
+
 
 class CouchbaseDocumentStore:
     """
@@ -47,17 +98,93 @@ class CouchbaseDocumentStore:
         scope: str,
         collection: str,
         vector_search_index: str,
+        use_search_fields: bool = False,
+        query_cache_size: int = 0,
+        query_cache_ttl: Optional[float] = 300.0,
+        document_cache_size: int = 0,
+        document_cache_ttl: Optional[float] = 300.0,
+        embedding_format: str = "float",
+        max_write_retries: int = 3,
+        write_retry_backoff: float = 0.1,
+        write_options: CouchbaseWriteOptions = CouchbaseWriteOptions(),
+        expiry_meta_field: Optional[str] = None,
+        filter_backend: str = "fts",
+        embedding_fields: Optional[Dict[str, int]] = None,
+        meta_embedding_fields: Optional[List[str]] = None,
         **kwargs: Dict[str, Any],
     ):
         """
         Creates a new CouchbaseDocumentStore instance.
 
+        :param use_search_fields: If True, retrieval rebuilds Documents from the fields stored in the search index
+            instead of fetching every hit from the key-value service. The stored fields are read once from the index
+            definition. Requested fields the index does not store, such as the `embedding` by default, are fetched
+            with sub-document lookups, and stored fields missing from a hit are left empty. Whole Documents only hold
+            the fields the index maps, so `blob` is left out unless it is mapped. Hits that have none of `content`,
+            `dataframe` or `blob` stored in the index are fetched whole from the key-value service.
+        :param query_cache_size: Maximum number of embedding retrieval results kept in an in-process LRU cache.
+            Repeated queries with the same embedding and parameters are answered from the cache without contacting
+            Couchbase. The cache is cleared whenever documents are written or deleted through this store. Defaults to
+            0, which disables the cache.
+        :param query_cache_ttl: Number of seconds a cached result stays valid, `None` keeps results until they are
+            evicted. Changes made to the collection by other clients are only seen once cached results expire.
+        :param document_cache_size: Maximum number of Documents kept in an in-process LRU cache by ID. Retrieval
+            only fetches the hits missing from the cache from the key-value service. Documents written or deleted
+            through this store are removed from the cache. The cache holds copies, so modifying the returned Documents
+            doesn't alter it. Defaults to 0, which disables the cache.
+        :param document_cache_ttl: Number of seconds a cached Document stays valid, `None` keeps Documents until
+            they are evicted.
+        :param embedding_format: How embeddings are stored in the `embedding` field. `float` stores a JSON array of
+            numbers. `base64_float32` stores the base64 encoded little-endian float32 bytes, about 3 to 4 times
+            smaller and much cheaper to encode and decode, the field must be mapped as `vector_base64` in the search
+            index. `base64_float16` halves the size again, at the cost of precision, but can't be indexed by the
+            Couchbase vector search, its payloads are tagged with a `float16:` prefix. Every embedding is decoded
+            with the format it was written in, so a store can read Documents written before its format changed.
+        :param max_write_retries: How many times documents that failed to be written with a transient error, such as
+            a timeout or a temporary failure during a rebalance, are sent again. Only the failed documents are
+            retried. With `DuplicatePolicy.FAIL`, inserts that timed out or were canceled are not retried, since they
+            may have been applied, they are reported as failed and ambiguous instead.
+        :param write_retry_backoff: Base delay in seconds of the jittered exponential backoff between retries.
+        :param write_options: Default key-value options of every write, such as the durability level, expiry and
+            timeout. They can be overridden per call.
+        :param expiry_meta_field: Meta field holding the expiry of each Document, a number of seconds to live, or a
+            `datetime` or ISO 8601 string at which Couchbase removes the Document. Documents without the field
+            use the `expiry` of the write options, if any. Defaults to `None`, which ignores the meta.
+        :param filter_backend: Service `filter_documents` runs on. `fts` pages through the search index and fetches
+            the Documents from the key-value service. `sql` runs a single SQL++ query returning the Documents, which
+            needs GSI indexes on the filtered fields, or a primary index, and has no limit on the number of hits.
+            `auto` uses SQL++ when every filtered field is the key of an online GSI index of the collection and every
+            comparison can be served by an index scan, that is without `!=`, `not in`, `NOT`, `None` values or lists
+            compared with `==`, and the search index otherwise. The GSI indexes are listed once per store instance.
+            The backends can return different Documents: the search index matches `==` on strings against the analyzed
+            terms of the field, while SQL++ compares the whole strings, and SQL++ compares ISO dates as strings, so they
+            must share a time zone.
+        :param embedding_fields: Additional embedding fields written with every Document that has an embedding,
+            mapping their name to the number of leading dimensions of the embedding they keep, e.g.
+            `{"embedding_256": 256}` for a Matryoshka embedding model. The truncated copies are rescaled to unit length
+            and stored in `embedding_format`, so a search index can map them as smaller vector fields. Retrieval can
+            search them with `embedding_field`, they are not part of the returned Documents.
+        :param meta_embedding_fields: Meta fields holding additional named embeddings of the Documents, e.g.
+            `["title_embedding"]`. They are written out of `meta` into top-level fields of the same name, in
+            `embedding_format`, so the search index can map them as vector fields, and are put back into `meta` when
+            Documents are read with their embedding. Retrieval can search them with `embedding_field` or
+            `vector_queries`.
 
-        :raises ValueError: If the collection name contains invalid characters.
+        :raises ValueError: If the collection name contains invalid characters, the cache settings are invalid,
+            `embedding_format` or `filter_backend` is unknown, `max_write_retries` is negative or `embedding_fields`
+            or `meta_embedding_fields` are invalid.
         """
         if collection and not bool(re.match(r"^[a-zA-Z0-9\-_]+$", collection)):
             msg = f'Invalid collection name: "{collection}". It can only contain letters, numbers, -, or _.'
             raise ValueError(msg)
+        _validate_embedding_format(embedding_format)
+        if max_write_retries < 0:
+            msg = "max_write_retries must not be negative"
+            raise ValueError(msg)
+        if filter_backend not in FILTER_BACKENDS:
+            msg = f"Unknown filter backend '{filter_backend}'. Supported backends are: {FILTER_BACKENDS}"
+            raise ValueError(msg)
+        _validate_embedding_fields(embedding_fields, meta_embedding_fields)
 
         self.cluster_connection_string = cluster_connection_string
         self.authenticator = authenticator
@@ -66,6 +193,27 @@ class CouchbaseDocumentStore:
         self.scope_name = scope
         self.collection_name = collection
         self.vector_search_index = vector_search_index
+        self.use_search_fields = use_search_fields
+        self.query_cache_size = query_cache_size
+        self.query_cache_ttl = query_cache_ttl
+        self._query_cache: Optional[_LRUCache[List[Document]]] = (
+            _LRUCache(query_cache_size, query_cache_ttl) if query_cache_size > 0 else None
+        )
+        self.document_cache_size = document_cache_size
+        self.document_cache_ttl = document_cache_ttl
+        self._document_cache: Optional[_LRUCache[Document]] = (
+            _LRUCache(document_cache_size, document_cache_ttl) if document_cache_size > 0 else None
+        )
+        self.embedding_format = embedding_format
+        self.max_write_retries = max_write_retries
+        self.write_retry_backoff = write_retry_backoff
+        self.write_options = write_options
+        self.expiry_meta_field = expiry_meta_field
+        self.filter_backend = filter_backend
+        self.embedding_fields = embedding_fields
+        self.meta_embedding_fields = meta_embedding_fields
+        self._indexed_fields: Optional[Set[str]] = None
+        self._index_stored_paths: Optional[Dict[str, bool]] = None
         self._connection: Optional[Cluster] = None
         self._scope: Optional[Scope] = None
         self._collection: Optional[Collection] = None
@@ -129,6 +277,19 @@ class CouchbaseDocumentStore:
             scope=self.scope_name,
             collection=self.collection_name,
             vector_search_index=self.vector_search_index,
+            use_search_fields=self.use_search_fields,
+            query_cache_size=self.query_cache_size,
+            query_cache_ttl=self.query_cache_ttl,
+            document_cache_size=self.document_cache_size,
+            document_cache_ttl=self.document_cache_ttl,
+            embedding_format=self.embedding_format,
+            max_write_retries=self.max_write_retries,
+            write_retry_backoff=self.write_retry_backoff,
+            write_options=self.write_options.to_dict(),
+            expiry_meta_field=self.expiry_meta_field,
+            filter_backend=self.filter_backend,
+            embedding_fields=self.embedding_fields,
+            meta_embedding_fields=self.meta_embedding_fields,
             **self._kwargs,
         )
 
@@ -151,9 +312,56 @@ class CouchbaseDocumentStore:
                 data["init_parameters"]["authenticator"]
             )
         data["init_parameters"]["cluster_options"] = CouchbaseClusterOptions.from_dict(data["init_parameters"]["cluster_options"])
+        write_options = data["init_parameters"].get("write_options")
+        if write_options:
+            data["init_parameters"]["write_options"] = CouchbaseWriteOptions.from_dict(write_options)
         deserialize_secrets_inplace(data["init_parameters"], keys=["cluster_connection_string"])
         return default_from_dict(cls, data)
 
+    def query_cache_info(self) -> Optional[CacheInfo]:
+        """
+        Returns the hit and miss counters and the size of the query cache.
+
+        :returns: The statistics of the query cache, or `None` if the cache is disabled.
+        """
+        return self._query_cache.info() if self._query_cache is not None else None
+
+    def clear_query_cache(self) -> None:
+        """
+        Removes all the results from the query cache.
+
+        Use it after the collection was modified by another client, to avoid waiting for `query_cache_ttl`.
+        """
+        if self._query_cache is not None:
+            self._query_cache.clear()
+
+    def document_cache_info(self) -> Optional[CacheInfo]:
+        """
+        Returns the hit and miss counters and the size of the document cache.
+
+        :returns: The statistics of the document cache, or `None` if the cache is disabled.
+        """
+        return self._document_cache.info() if self._document_cache is not None else None
+
+    def clear_document_cache(self) -> None:
+        """
+        Removes all the Documents from the document cache.
+        """
+        if self._document_cache is not None:
+            self._document_cache.clear()
+
+    def _invalidate_caches(self, document_ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Clears the query cache and removes `document_ids` from the document cache, or all Documents if not given.
+        """
+        if self._query_cache is not None:
+            self._query_cache.clear()
+        if self._document_cache is not None:
+            if document_ids is None:
+                self._document_cache.clear()
+            else:
+                self._document_cache.discard(document_ids)
+
     def count_documents(self) -> int:
         """
         Returns how many documents are present in the document store.
@@ -162,7 +370,113 @@ class CouchbaseDocumentStore:
         """
         return self.scope.search_indexes().get_indexed_documents_count(self.vector_search_index)
 
-    def filter_documents(self, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+    def create_or_update_vector_index(
+        self,
+        dims: int,
+        *,
+        similarity: str = "dot_product",
+        vector_index_optimized_for: str = "recall",
+        partitions: int = 1,
+        replicas: int = 0,
+        meta_fields: Optional[Dict[str, str]] = None,
+        stored_fields: Optional[List[str]] = None,
+        docvalues_fields: Optional[List[str]] = None,
+        dry_run: bool = False,
+    ) -> SearchIndexResult:
+        """
+        Creates the `vector_search_index` of the store, or updates it if its definition differs from the requested one.
+
+        The index maps the Documents of the collection: `content` and `dataframe` as text, `embedding`, the
+        `embedding_fields` and the `meta_embedding_fields` as vector fields, in the `embedding_format` of the store,
+        and the `meta_fields`. Calling it again with the same settings leaves the index untouched, so it can run on
+        every deployment. Only these settings are replaced on an existing index, other type mappings and settings are
+        kept. Changing the mapping or the number of partitions makes the search service rebuild the index.
+
+        :param dims: Number of dimensions of the embeddings, also used for the `meta_embedding_fields`.
+        :param similarity: Similarity metric of the vector fields, one of `cosine`, `dot_product` or `l2_norm`.
+        :param vector_index_optimized_for: `recall`, `latency` or `memory-efficient`, the trade-off the search
+            service makes when building the vector indexes.
+        :param partitions: Number of index partitions. More partitions spread indexing and queries over more nodes
+            and cores, at the cost of a scatter-gather over all partitions for each query.
+        :param replicas: Number of replicas of each partition, between 0 and 3.
+        :param meta_fields: Meta fields to index with their type, one of `text`, `keyword`, `number`, `boolean` or
+            `datetime`, e.g. `{"year": "number", "author.name": "keyword"}`. Filters on strings need `keyword`
+            fields. Defaults to None, the meta is mapped dynamically.
+        :param stored_fields: Fields whose value is stored in the index, e.g. `["content", "meta.title"]`, so
+            retrieval with `use_search_fields` can rebuild the Documents without the key-value service. Storing fewer
+            fields makes the index smaller. Defaults to `content`, `dataframe` and all the meta fields.
+        :param docvalues_fields: Fields with doc values, needed to sort or facet on them. Defaults to None.
+        :param dry_run: If True, the changes are computed but not applied.
+        :returns: Whether the index was created, updated or unchanged, and the changed paths of its definition.
+        :raises ValueError: If a setting is out of range or unknown, a stored or docvalued field is not mapped, or
+            the embeddings are stored as `base64_float16`, which can't be indexed.
+        :raises DocumentStoreError: If the index can't be created or updated.
+        """
+        if self.embedding_format == "base64_float16":
+            msg = "Embeddings stored as base64_float16 can't be indexed by the vector search"
+            raise ValueError(msg)
+        type_name = f"{self.scope_name}.{self.collection_name}"
+        params, plan_params = _vector_index_definition(
+            type_name=type_name,
+            vector_type="vector_base64" if self.embedding_format == "base64_float32" else "vector",
+            dims=dims,
+            similarity=similarity,
+            vector_index_optimized_for=vector_index_optimized_for,
+            partitions=partitions,
+            replicas=replicas,
+            meta_fields=meta_fields,
+            stored_fields=stored_fields,
+            docvalues_fields=docvalues_fields,
+            embedding_fields=self.embedding_fields,
+            meta_embedding_fields=self.meta_embedding_fields,
+        )
+        manager = self.scope.search_indexes()
+        try:
+            existing: Optional[SearchIndex] = manager.get_index(self.vector_search_index)
+        except SearchIndexNotFoundException:
+            existing = None
+
+        if existing is None:
+            action, changes = "created", []
+            index = SearchIndex(
+                name=self.vector_search_index,
+                source_type="gocbcore",
+                source_name=self.bucket,
+                params=params,
+                plan_params=plan_params,
+            )
+        else:
+            merged_params, merged_plan = _merge_index_definition(
+                existing.params, existing.plan_params, params, plan_params
+            )
+            changes = _definition_changes(
+                {"params": existing.params, "planParams": existing.plan_params},
+                {"params": merged_params, "planParams": merged_plan},
+            )
+            if not changes:
+                self._index_stored_paths = _stored_paths(existing.params, type_name)
+                return SearchIndexResult(name=self.vector_search_index, action="unchanged")
+            # the uuid of the existing definition makes the upsert an update
+            action, index = "updated", replace(existing, params=merged_params, plan_params=merged_plan)
+
+        if not dry_run:
+            try:
+                manager.upsert_index(index)
+            except Exception as e:
+                msg = f"Failed to upsert the search index '{self.vector_search_index}': {e}"
+                raise DocumentStoreError(msg) from e
+            self._index_stored_paths = _stored_paths(index.params, type_name)
+        return SearchIndexResult(name=self.vector_search_index, action=action, changes=changes, applied=not dry_run)
+
+    def filter_documents(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        return_embedding: bool = True,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        page_size: int = 1000,
+    ) -> List[Document]:
         """
         Returns the documents that match the filters provided.
 
@@ -170,29 +484,156 @@ class CouchbaseDocumentStore:
         refer to the Haystack [documentation](https://docs.haystack.deepset.ai/v2.0/docs/metadata-filtering).
 
         :param filters: The filters to apply. It returns only the documents that match the filters.
+        :param return_embedding: Whether to return the embedding of the Documents.
+        :param fields: Document fields to return, e.g. `["content", "meta.title"]`. Defaults to all fields.
+        :param limit: Maximum number of Documents to return. Defaults to all matching Documents.
+        :param page_size: Number of Documents requested from the search index and the key-value service at a time.
         :returns: A list of Documents that match the given filters.
         """
+        return list(
+            self.filter_documents_iter(
+                filters, return_embedding=return_embedding, fields=fields, limit=limit, page_size=page_size
+            )
+        )
+
+    def filter_documents_iter(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        return_embedding: bool = True,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        page_size: int = 1000,
+    ) -> Iterator[Document]:
+        """
+        Lazily iterates over the documents that match the filters provided.
+
+        With the search index, the IDs are paged through in document ID order, and the bodies of each page are
+        fetched from the key-value service only when the page is reached, so memory use is bounded by `page_size`.
+        With SQL++, see `filter_backend`, the Documents are streamed from a single query in no particular order.
+
+        :param filters: The filters to apply. It returns only the documents that match the filters.
+        :param return_embedding: Whether to return the embedding of the Documents.
+        :param fields: Document fields to return, e.g. `["content", "meta.title"]`. Defaults to all fields.
+        :param limit: Maximum number of Documents to return. Defaults to all matching Documents.
+        :param page_size: Number of Documents requested from the search index and the key-value service at a time.
+        :returns: An iterator over the Documents that match the given filters.
+        :raises ValueError: If `page_size` is lower than 1.
+        """
+        if page_size < 1:
+            msg = "page_size must be greater than 0"
+            raise ValueError(msg)
+        projection = _projection(fields, return_embedding=return_embedding)
+        if self._use_sql_filters(filters):
+            statement, options = self._filter_query(filters, projection, limit)
+            yield from self._documents_from_query_rows(self.scope.query(statement, options).rows(), page_size)
+            return
+        for ids, scores in self._filter_pages(filters, limit, page_size):
+            values, exceptions = self._fetch_values(ids, projection)
+            yield from self._documents_from_kv_values(ids, scores, values, exceptions)
+
+    def _use_sql_filters(self, filters: Optional[Dict[str, Any]]) -> bool:
+        if self.filter_backend != "auto":
+            return self.filter_backend == "sql"
+        if not filters or not _is_sargable(filters):
+            return False
+        if self._indexed_fields is None:
+            self._indexed_fields = _gsi_indexed_fields(self.collection.query_indexes().get_all_indexes())
+        return _filter_fields(filters) <= self._indexed_fields
+
+    def _filter_query(
+        self, filters: Optional[Dict[str, Any]], projection: Optional[List[str]], limit: Optional[int]
+    ) -> Tuple[str, QueryOptions]:
+        """
+        Builds the SQL++ query returning the documents matching `filters`, with their ID in the `__id` field.
+
+        Projected paths are selected under their dotted path, e.g. `meta.title`, to be unflattened.
+        """
+        parameters: Dict[str, Any] = {}
+        statement = "SELECT META(d).id AS `__id`, "
+        if projection is None:
+            statement += "d.*"
+        else:
+            statement += ", ".join(f"{_field_path(path, 'd')} AS `{path}`" for path in projection)
+        statement += f" FROM `{self.collection_name}` AS d"
+        if filters:
+            where, parameters = _normalize_filters_sql(filters)
+            statement += f" WHERE {where}"
+        if limit is not None:
+            statement += " LIMIT $limit"
+            parameters["limit"] = limit
+        logger.debug(statement)
+        # prepared statements are reused by the queries with the same filter shape
+        return statement, QueryOptions(named_parameters=parameters, adhoc=False)
+
+    def _documents_from_query_rows(self, rows: Iterable[Dict[str, Any]], page_size: int) -> Iterator[Document]:
+        ids: List[str] = []
+        values: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            id = row.pop("__id")
+            ids.append(id)
+            values[id] = _unflatten(row)
+            if len(ids) == page_size:
+                yield from self._documents_from_kv_values(ids, [None] * len(ids), values)  # type: ignore[list-item]
+                ids, values = [], {}
+        yield from self._documents_from_kv_values(ids, [None] * len(ids), values)  # type: ignore[list-item]
+
+    def _filter_pages(
+        self, filters: Optional[Dict[str, Any]], limit: Optional[int], page_size: int
+    ) -> Iterator[Tuple[List[str], List[float]]]:
+        """
+        Pages through the IDs and scores of the documents matching `filters`, using `search_after` on the ID.
+        """
+        search_after: Optional[str] = None
+        returned = 0
+        while limit is None or returned < limit:
+            size = page_size if limit is None else min(page_size, limit - returned)
+            request, options = self._filter_search_request(filters, size, search_after)
+            response = self.scope.search(self.vector_search_index, request, options)
+            ids, scores, _ = self._read_rows(response)
+            if not ids:
+                return
+            yield ids, scores
+            returned += len(ids)
+            if len(ids) < size:
+                return
+            search_after = ids[-1]
+
+    def _filter_search_request(
+        self, filters: Optional[Dict[str, Any]], limit: int = 1000, search_after: Optional[str] = None
+    ) -> Tuple[search.SearchRequest, SearchOptions]:
         search_filters: SearchQuery
-        # sort:str
         if filters:
-            search_filters = _normalize_filters(filters)
+            search_filters = compile_filters(filters)
         else:
             search_filters = search.MatchAllQuery()
         logger.debug(search_filters.encodable)
         request = search.SearchRequest(search_filters)
-        options = SearchOptions(fields=["*"], limit=10000)
-        response = self.scope.search(self.vector_search_index, request, options)
-        return self.__get_doc_from_kv(response)
+        # sorting on the document ID gives a stable order to page through with `search_after`
+        raw = {"search_after": [search_after]} if search_after is not None else None
+        options = SearchOptions(limit=limit, sort=["_id"], raw=raw)
+        return request, options
 
-    def write_documents(self, documents: List[Document], policy: DuplicatePolicy = DuplicatePolicy.NONE) -> int:
+    def write_documents(
+        self,
+        documents: List[Document],
+        policy: DuplicatePolicy = DuplicatePolicy.NONE,
+        embeddings: Optional[np.ndarray] = None,
+        write_options: Optional[CouchbaseWriteOptions] = None,
+    ) -> int:
         """
         Writes documents into the couchbase collection.
 
         :param documents: A list of Documents to write to the document store.
         :param policy: The duplicate policy to use when writing documents.
+        :param embeddings: Optional 2-D array with the embedding of each Document, one row per Document in the same
+            order. When given, it replaces the `embedding` field of the Documents, which can be left empty to avoid
+            converting the output of an embedding model to Python lists.
+        :param write_options: Key-value options of this call, merged over the `write_options` of the store.
         :raises DuplicateDocumentError: If a document with the same ID already exists in the document store
              and the policy is set to DuplicatePolicy.FAIL (or not specified).
-        :raises ValueError: If the documents are not of type Document.
+        :raises ValueError: If the documents are not of type Document, `embeddings` does not have one row per
+            Document or the expiry of a Document is invalid.
         :returns: The number of documents written to the document store.
         """
 
@@ -204,59 +645,377 @@ class CouchbaseDocumentStore:
         if policy == DuplicatePolicy.NONE:
             policy = DuplicatePolicy.FAIL
 
-        cb_documents = []
-        for doc in documents:
-            doc_dict = doc.to_dict(flatten=False)
-            doc_dict = {k: v for k, v in doc_dict.items() if v is not None}
-            if "sparse_embedding" in doc_dict:
-                sparse_embedding = doc_dict.pop("sparse_embedding", None)
-                if sparse_embedding:
-                    logger.warning(
-                        "Document %s has the `sparse_embedding` field set,"
-                        "but storing sparse embeddings in Couchbase is not currently supported."
-                        "The `sparse_embedding` field will be ignored.",
-                        doc.id,
-                    )
-            cb_documents.append(doc_dict)
-        written_docs = len(documents)
-
-        operations = {doc["id"]: doc for doc in cb_documents}
-        try:
-            result: MultiMutationResult
-            if policy == DuplicatePolicy.FAIL:
-                result = self.collection.insert_multi(operations)
-            else:
-                result = self.collection.upsert_multi(operations)
-        except Exception as e:
-            logger.error("write error {e}")
-            msg = f"Failed to write documents to Couchbase. Error: {e}"
-            raise DocumentStoreError(msg) from e
-        if not result.all_ok and result.exceptions:
-            duplicate_ids = []
-            other_errors = []
-            for id, ex in result.exceptions.items():
-                if isinstance(ex, DocumentExistsException):
-                    duplicate_ids.append(id)
-                else:
-                    other_errors.append({"id": id, "exception": ex})
-            if len(duplicate_ids) > 0:
-                msg = f"IDs '{', '.join(duplicate_ids)}' already exist in the document store."
-                raise DuplicateDocumentError(msg)
-            if len(other_errors) > 0:
-                msg = f"Failed to write documents to couchbase. Errors:\n{other_errors}"
-                raise DocumentStoreError(msg)
+        result = self._write_batch(0, documents, policy, self.write_options.merge(write_options), embeddings)
+        if len(result.duplicate_ids) > 0:
+            msg = (
+                f"IDs '{', '.join(result.duplicate_ids)}' already exist in the document store. "
+                f"{result.written} of {len(documents)} documents were written."
+            )
+            raise DuplicateDocumentError(msg)
+        if len(result.failed_ids) > 0:
+            other_errors = [{"id": id, "exception": result.errors[id]} for id in result.failed_ids]
+            msg = (
+                f"Failed to write documents to couchbase, {result.written} of {len(documents)} documents were "
+                f"written. Errors:\n{other_errors}"
+            )
+            raise DocumentStoreError(msg)
         logger.debug("date written")
+        return result.written
+
+    def write_documents_in_batches(
+        self,
+        documents: List[Document],
+        policy: DuplicatePolicy = DuplicatePolicy.NONE,
+        batch_size: int = 1000,
+        max_concurrency: int = 4,
+        write_options: Optional[CouchbaseWriteOptions] = None,
+    ) -> List[BatchWriteResult]:
+        """
+        Writes documents into the couchbase collection in fixed size batches.
+
+        Documents are serialized batch by batch and at most `max_concurrency` batches are in flight at any time,
+        so the memory held by serialized payloads is bounded by `batch_size * max_concurrency` documents.
+        Unlike `write_documents`, a failing batch does not abort the others: duplicates and failures are
+        reported in the returned results instead of being raised.
+
+        :param documents: A list of Documents to write to the document store.
+        :param policy: The duplicate policy to use when writing documents.
+        :param batch_size: Maximum number of documents sent in a single multi mutation.
+        :param max_concurrency: Maximum number of batches written concurrently.
+        :param write_options: Key-value options of this call, merged over the `write_options` of the store.
+        :raises ValueError: If the documents are not of type Document or `batch_size`/`max_concurrency` are invalid.
+        :returns: One `BatchWriteResult` per batch, in input order.
+        """
+        if policy == DuplicatePolicy.NONE:
+            policy = DuplicatePolicy.FAIL
+
+        options = self.write_options.merge(write_options)
+        results = list(self._write_batches(_batched(documents, batch_size), policy, options, max_concurrency))
+        results.sort(key=lambda r: r.batch_index)
+        return results
+
+    def write_documents_iter(
+        self,
+        documents: Iterable[Document],
+        policy: DuplicatePolicy = DuplicatePolicy.NONE,
+        batch_size: int = 1000,
+        max_concurrency: int = 4,
+        *,
+        progress_callback: Optional[Callable[[BatchWriteResult], None]] = None,
+        write_options: Optional[CouchbaseWriteOptions] = None,
+    ) -> int:
+        """
+        Writes documents from any iterable or generator into the couchbase collection.
+
+        The iterable is consumed lazily in windows of `batch_size` documents. A window is written while the next
+        one is being produced, and no more than `max_concurrency` windows are in flight, so the input never needs
+        to be fully materialized.
+
+        :param documents: An iterable of Documents to write to the document store.
+        :param policy: The duplicate policy to use when writing documents.
+        :param batch_size: Number of documents read from `documents` and written per batch.
+        :param max_concurrency: Maximum number of batches written concurrently.
+        :param progress_callback: Called with the `BatchWriteResult` of every batch as soon as it completes.
+            Batches may complete out of order, use `BatchWriteResult.batch_index` to tell them apart.
+        :param write_options: Key-value options of this call, merged over the `write_options` of the store.
+        :raises ValueError: If the documents are not of type Document or `batch_size`/`max_concurrency` are invalid.
+        :returns: The number of documents written to the document store.
+        """
+        if policy == DuplicatePolicy.NONE:
+            policy = DuplicatePolicy.FAIL
+
+        written_docs = 0
+        options = self.write_options.merge(write_options)
+        for result in self._write_batches(_batched(documents, batch_size), policy, options, max_concurrency):
+            written_docs += result.written
+            if progress_callback is not None:
+                progress_callback(result)
         return written_docs
 
-    def delete_documents(self, document_ids: List[str]) -> None:
+    def _write_batches(
+        self,
+        batches: Iterable[List[Document]],
+        policy: DuplicatePolicy,
+        options: CouchbaseWriteOptions,
+        max_concurrency: int,
+    ) -> Iterator[BatchWriteResult]:
+        """
+        Writes `batches` with at most `max_concurrency` batches in flight, yielding results as they complete.
+        """
+        if max_concurrency < 1:
+            msg = "max_concurrency must be greater than 0"
+            raise ValueError(msg)
+
+        # open the connection before fanning out so worker threads share a single cluster instance
+        _ = self.collection
+        arguments = (
+            (batch_index, _validate_documents(batch), policy, options) for batch_index, batch in enumerate(batches)
+        )
+        yield from _concurrent_map(self._write_batch, arguments, max_concurrency)
+
+    def _write_batch(
+        self,
+        batch_index: int,
+        documents: List[Document],
+        policy: DuplicatePolicy,
+        options: CouchbaseWriteOptions,
+        embeddings: Optional[np.ndarray] = None,
+    ) -> BatchWriteResult:
+        """
+        Writes a batch of documents, sending the documents that failed with a transient error again.
+
+        Only the documents that failed with a transient error, such as a timeout or a temporary failure during a
+        rebalance, are retried, up to `max_write_retries` times with jittered exponential backoff. Inserts that failed
+        with an ambiguous error may have been applied and are reported in `ambiguous_ids` instead.
+        """
+        batch_result = BatchWriteResult(batch_index=batch_index)
+        pending = self._to_cb_operations(documents, embeddings)
+        expiries = self._document_expiries(documents)
+        for attempt in range(self.max_write_retries + 1):
+            if attempt > 0:
+                time.sleep(_backoff_delay(attempt, self.write_retry_backoff))
+                batch_result.retries += 1
+            try:
+                exceptions = self._write_operations(pending, policy, options, expiries).exceptions or {}
+            except Exception as e:
+                logger.error("Failed to write batch %s to Couchbase. Error: %s", batch_index, e)
+                exceptions = dict.fromkeys(pending, e)
+            batch_result.written_ids.extend(doc_id for doc_id in pending if doc_id not in exceptions)
+            retry_ids = []
+            for doc_id, ex in exceptions.items():
+                if attempt < self.max_write_retries and _is_retryable(ex, idempotent=policy != DuplicatePolicy.FAIL):
+                    retry_ids.append(doc_id)
+                    continue
+                if isinstance(ex, DocumentExistsException):
+                    batch_result.duplicate_ids.append(doc_id)
+                else:
+                    batch_result.failed_ids.append(doc_id)
+                    if isinstance(ex, _AMBIGUOUS_ERRORS):
+                        batch_result.ambiguous_ids.append(doc_id)
+                batch_result.errors[doc_id] = ex
+            if not retry_ids:
+                break
+            pending = {doc_id: pending[doc_id] for doc_id in retry_ids}
+        batch_result.written = len(batch_result.written_ids)
+        return batch_result
+
+    def _write_operations(
+        self,
+        operations: Dict[str, Dict[str, Any]],
+        policy: DuplicatePolicy,
+        options: CouchbaseWriteOptions,
+        expiries: Optional[Dict[str, timedelta]] = None,
+    ) -> MultiMutationResult:
+        multi_options = options.get_multi_options(policy)
+        if expiries:
+            # per key options are applied over the options of the whole batch
+            key_options = InsertOptions if policy == DuplicatePolicy.FAIL else UpsertOptions
+            per_key_options = {id: key_options(expiry=expiries[id]) for id in operations if id in expiries}
+            if per_key_options:
+                multi_options["per_key_options"] = per_key_options
+        try:
+            if policy == DuplicatePolicy.FAIL:
+                return self.collection.insert_multi(operations, **multi_options)
+            return self.collection.upsert_multi(operations, **multi_options)
+        finally:
+            self._invalidate_caches(operations.keys())
+
+    def _document_expiries(self, documents: Iterable[Document]) -> Dict[str, timedelta]:
+        """
+        Returns the expiry of the Documents whose `expiry_meta_field` is set, keyed by document ID.
+
+        :raises ValueError: If an expiry is invalid.
+        """
+        if self.expiry_meta_field is None:
+            return {}
+        return {
+            doc.id: _expiry_from_meta(doc.meta[self.expiry_meta_field])
+            for doc in documents
+            if doc.meta.get(self.expiry_meta_field) is not None
+        }
+
+    def _to_cb_operations(
+        self, documents: List[Document], embeddings: Optional[np.ndarray] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Builds the key-value payloads of `documents`, keyed by document ID.
+
+        The embeddings of all the Documents, or the rows of `embeddings` if given, their truncated copies and the
+        embeddings of each of the `meta_embedding_fields` are encoded in a single pass.
+        """
+        if embeddings is not None and len(embeddings) != len(documents):
+            msg = f"Expected {len(documents)} embeddings, one per document, got {len(embeddings)}"
+            raise ValueError(msg)
+        if embeddings is None:
+            embeddings = [doc.embedding for doc in documents]  # type: ignore[assignment]
+        encoded = _encode_embeddings(embeddings, self.embedding_format)  # type: ignore[arg-type]
+        named_embeddings: List[Dict[str, Any]] = [{} for _ in documents]
+        field_embeddings = [
+            (field, _truncate_embeddings(embeddings, dimensions))  # type: ignore[arg-type]
+            for field, dimensions in (self.embedding_fields or {}).items()
+        ]
+        field_embeddings.extend(
+            (field, [doc.meta.get(field) for doc in documents]) for field in self.meta_embedding_fields or []
+        )
+        for field, field_embedding in field_embeddings:
+            for i, encoded_embedding in enumerate(_encode_embeddings(field_embedding, self.embedding_format)):
+                if encoded_embedding is not None:
+                    named_embeddings[i][field] = encoded_embedding
+        return {
+            doc.id: self._to_cb_document(doc, embedding, document_embeddings)
+            for doc, embedding, document_embeddings in zip(documents, encoded, named_embeddings)
+        }
+
+    def _to_cb_document(
+        self, doc: Document, encoded_embedding: Any = None, named_embeddings: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Builds the key-value payload of a Document, the equivalent of `doc.to_dict(flatten=False)` without `None`
+        values and `sparse_embedding`, plus the `embedding_fields` and `meta_embedding_fields` of the store as
+        top-level fields.
+
+        The fields are read directly instead of going through `dataclasses.asdict`, which deep copies `meta` and the
+        embedding of every Document. `encoded_embedding` is the already encoded embedding, if any, and
+        `named_embeddings` the already encoded `embedding_fields` and `meta_embedding_fields`.
+        """
+        cb_document: Dict[str, Any] = {"id": doc.id}
+        if doc.content is not None:
+            cb_document["content"] = doc.content
+        if doc.dataframe is not None:
+            cb_document["dataframe"] = doc.dataframe.to_json()
+        if doc.blob is not None:
+            cb_document["blob"] = {"data": list(doc.blob.data), "mime_type": doc.blob.mime_type}
+        cb_document["meta"] = doc.meta
+        if self.meta_embedding_fields and any(field in doc.meta for field in self.meta_embedding_fields):
+            cb_document["meta"] = {k: v for k, v in doc.meta.items() if k not in self.meta_embedding_fields}
+        if doc.score is not None:
+            cb_document["score"] = doc.score
+        if encoded_embedding is None and doc.embedding is not None:
+            encoded_embedding = _encode_embedding(doc.embedding, self.embedding_format)
+        if encoded_embedding is not None:
+            cb_document["embedding"] = encoded_embedding
+        if named_embeddings is None:
+            named_embeddings = {
+                field: _encode_embedding(doc.meta[field], self.embedding_format)
+                for field in self.meta_embedding_fields or []
+                if doc.meta.get(field) is not None
+            }
+            if doc.embedding is not None:
+                for field, dimensions in (self.embedding_fields or {}).items():
+                    truncated = _truncate_embedding(doc.embedding, dimensions)
+                    named_embeddings[field] = _encode_embedding(truncated, self.embedding_format)
+        cb_document.update(named_embeddings)
+        if doc.sparse_embedding:
+            logger.warning(
+                "Document %s has the `sparse_embedding` field set,"
+                "but storing sparse embeddings in Couchbase is not currently supported."
+                "The `sparse_embedding` field will be ignored.",
+                doc.id,
+            )
+        return cb_document
+
+    def delete_documents(self, document_ids: List[str], batch_size: int = 1000, max_concurrency: int = 4) -> None:
         """
         Deletes all documents with a matching document_ids from the document store.
 
+        IDs that do not exist are ignored.
+
         :param document_ids: the document ids to delete
+        :param batch_size: Maximum number of documents removed in a single multi mutation.
+        :param max_concurrency: Maximum number of batches removed concurrently.
+        :raises DocumentStoreError: If some documents could not be deleted.
         """
         if not document_ids:
             return
-        self.collection.remove_multi(keys=document_ids)
+        result = self._delete_batches(_batched(document_ids, batch_size), max_concurrency)
+        if not result.all_ok:
+            failures = [{"id": id, "exception": result.errors[id]} for id in result.failed_ids]
+            msg = (
+                f"Failed to delete documents from couchbase, {result.deleted} of {len(document_ids)} documents were "
+                f"deleted. Errors:\n{failures}"
+            )
+            raise DocumentStoreError(msg)
+
+    def delete_by_filter(
+        self,
+        filters: Dict[str, Any],
+        batch_size: int = 1000,
+        max_concurrency: int = 4,
+        *,
+        use_sql: bool = False,
+    ) -> DeleteResult:
+        """
+        Deletes all the documents that match the filters provided.
+
+        The matching IDs are paged through from the search index, and each page is removed from the key-value
+        service as a batch while the next page is searched, with at most `max_concurrency` batches in flight.
+        Documents written while the deletion runs may or may not be deleted.
+
+        With `use_sql`, the documents are instead deleted by a single SQL++ `DELETE` statement run by the query
+        service, which is faster for large purges but needs a GSI index on the filtered fields, or a primary index,
+        on the collection.
+
+        :param filters: The filters the documents to delete match, see `filter_documents`.
+        :param batch_size: Number of IDs requested from the search index and removed at a time.
+        :param max_concurrency: Maximum number of batches removed concurrently.
+        :param use_sql: Whether to delete the documents with a SQL++ query instead of the search index.
+        :returns: The number of deleted documents and the documents that could not be deleted. With `use_sql`,
+            documents that can't be deleted fail the whole query.
+        :raises ValueError: If `filters` is empty or `batch_size`/`max_concurrency` are invalid.
+        """
+        _validate_delete_by_filter(filters, batch_size)
+        if use_sql:
+            return self._delete_by_sql(filters)
+        pages = (ids for ids, _ in self._filter_pages(filters, None, batch_size))
+        return self._delete_batches(pages, max_concurrency)
+
+    def _delete_by_sql(self, filters: Dict[str, Any]) -> DeleteResult:
+        statement, options = self._delete_query(filters)
+        try:
+            response = self.scope.query(statement, options)
+            response.execute()
+        finally:
+            # the deleted IDs are not returned, so every cached Document may be stale
+            self._invalidate_caches()
+        return DeleteResult(deleted=_mutation_count(response))
+
+    def _delete_query(self, filters: Dict[str, Any]) -> Tuple[str, QueryOptions]:
+        where, parameters = _normalize_filters_sql(filters)
+        statement = f"DELETE FROM `{self.collection_name}` AS d WHERE {where}"  # noqa: S608
+        logger.debug(statement)
+        return statement, QueryOptions(named_parameters=parameters, metrics=True)
+
+    def _delete_batches(self, batches: Iterable[List[str]], max_concurrency: int) -> DeleteResult:
+        if max_concurrency < 1:
+            msg = "max_concurrency must be greater than 0"
+            raise ValueError(msg)
+
+        # open the connection before fanning out so worker threads share a single cluster instance
+        _ = self.collection
+        result = DeleteResult()
+        for batch_result in _concurrent_map(self._delete_batch, ((batch,) for batch in batches), max_concurrency):
+            result.update(batch_result)
+        return result
+
+    def _delete_batch(self, document_ids: List[str]) -> DeleteResult:
+        result = DeleteResult()
+        try:
+            exceptions = self.collection.remove_multi(document_ids, return_exceptions=True).exceptions or {}
+        except Exception as e:
+            logger.error("Failed to delete documents from Couchbase. Error: %s", e)
+            exceptions = dict.fromkeys(document_ids, e)
+        finally:
+            self._invalidate_caches(document_ids)
+        for id in document_ids:
+            ex = exceptions.get(id)
+            if ex is None:
+                result.deleted += 1
+            elif isinstance(ex, DocumentNotFoundException):
+                result.not_found += 1
+            else:
+                result.failed_ids.append(id)
+                result.errors[id] = ex
+        return result
 
     def _embedding_retrieval(
         self,
@@ -264,6 +1023,18 @@ class CouchbaseDocumentStore:
         top_k: int = 10,
         search_query: SearchQuery = None,
         limit: Optional[int] = None,
+        *,
+        filters: Optional[Dict[str, Any]] = None,
+        use_search_fields: Optional[bool] = None,
+        return_embedding: bool = True,
+        fields: Optional[List[str]] = None,
+        use_query_cache: bool = True,
+        num_candidates: Optional[int] = None,
+        rerank: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        embedding_field: Optional[str] = None,
+        vector_queries: Optional[Dict[str, List[float]]] = None,
+        vector_query_combination: str = "or",
     ) -> List[Document]:
         """
         Find the documents that are most similar to the provided `query_embedding` by using a vector similarity metric.
@@ -273,47 +1044,797 @@ class CouchbaseDocumentStore:
         :param search: Search filters param which is parsed to the Couchbase search query. The vector query and
         search query are ORed operation.
         :param limit: Maximum number of Documents to be return by the couchbase fts search request. Default value is top_k.
+        :param filters: Haystack filters applied as a pre-filter of the vector query, so the `top_k` nearest neighbours
+            are searched among the matching Documents only.
+        :param use_search_fields: Whether to rebuild Documents from the fields stored in the search index.
+            Defaults to the value set at initialization.
+        :param return_embedding: Whether to return the embedding of the Documents.
+        :param fields: Document fields to return, e.g. `["content", "meta.title"]`. Defaults to all fields.
+        :param use_query_cache: Whether to look the results up in, and store them into, the query cache of the store.
+            Has no effect if the store was created with `query_cache_size=0`.
+        :param num_candidates: How many nearest neighbours the vector index searches for. Defaults to `top_k`, a
+            larger value improves the recall of approximate indexes.
+        :param rerank: Similarity used to rescore the `num_candidates` neighbours with their exact embeddings, one of
+            `cosine`, `dot_product` or `l2_norm`. The `top_k` best candidates are returned with their exact
+            similarity as `score`. The embeddings are read from the key-value service, `use_search_fields` is
+            ignored. Defaults to None, the ranking and scores of the vector index are kept.
+        :param mmr_lambda: If set, the `top_k` Documents are selected among the candidates with Maximal Marginal
+            Relevance, trading relevance (1) for diversity (0), using the `rerank` similarity or `cosine`.
+            `num_candidates` then defaults to 4 times `top_k`. Defaults to None, no diversification.
+        :param embedding_field: Embedding field searched by the vector index, `embedding` or one of the
+            `embedding_fields` of the store. A truncated field is searched with the same truncation of
+            `query_embedding`, while `rerank` and `mmr_lambda` compare the full embeddings, so the candidates found on
+            a small field can be rescored with the full one. Defaults to `embedding`.
+        :param vector_queries: Additional query embeddings keyed by the embedding field they search, e.g. a title
+            embedding for a `meta_embedding_fields` field. They are sent in the same search request as
+            `query_embedding`, as vector queries with the same number of candidates and pre-filter. Embedding
+            fields of `embedding_fields` are searched with a truncated copy of their query embedding.
+        :param vector_query_combination: How the hits of the vector queries are combined, `or` returns the Documents
+            found by any of them, `and` only those found by all of them. Their scores are summed.
         :returns: A list of Documents that are most similar to the given `query_embedding`
-        :raises ValueError: If `query_embedding` is empty.
+        :raises ValueError: If `query_embedding` is empty, `num_candidates` is not positive, `rerank` is unknown,
+            `mmr_lambda` is not between 0 and 1, `embedding_field` or a field of `vector_queries` is not an embedding
+            field of the store or `vector_query_combination` is unknown.
         :raises Document StoreError: If the retrieval of documents from Couchbase  fails.
         """
         if not query_embedding:
             msg = "Query embedding must not be empty"
             raise ValueError(msg)
+        _validate_rerank(num_candidates, rerank, mmr_lambda)
+        search_embedding = self._search_embedding(query_embedding, embedding_field)
+        search_vectors = self._search_vectors(vector_queries, vector_query_combination)
+        if use_search_fields is None:
+            use_search_fields = self.use_search_fields
 
-        vector_search = VectorSearch.from_vector_query(
-            VectorQuery(field_name="embedding", vector=query_embedding, num_candidates=top_k)
+        cache = self._query_cache if use_query_cache else None
+        if cache is not None:
+            key = _query_cache_key(
+                query_embedding,
+                top_k,
+                search_query=search_query,
+                limit=limit,
+                filters=filters,
+                use_search_fields=use_search_fields,
+                return_embedding=return_embedding,
+                fields=fields,
+                num_candidates=num_candidates,
+                rerank=rerank,
+                mmr_lambda=mmr_lambda,
+                embedding_field=embedding_field,
+                vector_queries=search_vectors,
+                vector_query_combination=vector_query_combination,
+            )
+            generation = cache.generation
+            cached = cache.get(key)
+            if cached is not None:
+                return _copy_documents(cached)
+
+        prefilter = compile_filters(filters) if filters else None
+        projection = _projection(fields, return_embedding=return_embedding)
+        if rerank is not None or mmr_lambda is not None:
+            request, options = self._vector_search_request(
+                search_embedding,
+                _candidate_count(top_k, num_candidates, mmr_lambda),
+                search_query,
+                limit,
+                prefilter=prefilter,
+                field_name=embedding_field,
+                vector_queries=search_vectors,
+                vector_query_combination=vector_query_combination,
+            )
+            response = self.scope.search(self.vector_search_index, request, options)
+            candidates = self.__get_doc_from_kv(response, projection=_rerank_projection(projection))
+            documents = _rerank(query_embedding, candidates, top_k, rerank, projection, mmr_lambda=mmr_lambda)
+        else:
+            request, options = self._vector_search_request(
+                search_embedding,
+                top_k,
+                search_query,
+                limit,
+                search_fields=_search_fields(fields, use_search_fields=use_search_fields),
+                prefilter=prefilter,
+                num_candidates=num_candidates,
+                field_name=embedding_field,
+                vector_queries=search_vectors,
+                vector_query_combination=vector_query_combination,
+            )
+            response = self.scope.search(self.vector_search_index, request, options)
+            documents = self.__get_doc_from_kv(response, use_search_fields=use_search_fields, projection=projection)
+        if cache is not None:
+            cache.put(key, _copy_documents(documents), generation)
+        return documents
+
+    def _embedding_retrieval_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 10,
+        search_query: SearchQuery = None,
+        limit: Optional[int] = None,
+        *,
+        filters: Optional[Dict[str, Any]] = None,
+        use_search_fields: Optional[bool] = None,
+        return_embedding: bool = True,
+        fields: Optional[List[str]] = None,
+        max_concurrency: int = 8,
+        num_candidates: Optional[int] = None,
+        rerank: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        embedding_field: Optional[str] = None,
+    ) -> List[List[Document]]:
+        """
+        Find the documents that are most similar to each of the provided `query_embeddings`.
+
+        The vector searches run concurrently, then the hits of all queries are fetched from the key-value service
+        in a single, deduplicated request.
+
+        :param query_embeddings: Embeddings of the queries.
+        :param max_concurrency: Maximum number of vector searches in flight at once.
+        See `_embedding_retrieval` for the other parameters.
+        :returns: One list of Documents per query embedding, in the same order as `query_embeddings`.
+        :raises ValueError: If one of the `query_embeddings` is empty.
+        :raises DocumentStoreError: If the retrieval of documents from Couchbase fails.
+        """
+        if any(not query_embedding for query_embedding in query_embeddings):
+            msg = "Query embedding must not be empty"
+            raise ValueError(msg)
+        _validate_rerank(num_candidates, rerank, mmr_lambda)
+        search_embeddings = [self._search_embedding(e, embedding_field) for e in query_embeddings]
+        if not query_embeddings:
+            return []
+        if use_search_fields is None:
+            use_search_fields = self.use_search_fields
+        reranked = rerank is not None or mmr_lambda is not None
+        if reranked:
+            use_search_fields = False
+
+        projection = _projection(fields, return_embedding=return_embedding)
+        fetch_projection = _rerank_projection(projection) if reranked else projection
+        search_fields = _search_fields(fields, use_search_fields=use_search_fields)
+        search_top_k = _candidate_count(top_k, num_candidates, mmr_lambda) if reranked else top_k
+        prefilter = compile_filters(filters) if filters else None
+        # open the connection before fanning out so worker threads share a single cluster instance
+        scope = self.scope
+
+        def run_search(search_embedding: List[float]) -> Tuple[List[str], List[float], Dict[str, Dict[str, Any]]]:
+            request, options = self._vector_search_request(
+                search_embedding,
+                search_top_k,
+                search_query,
+                limit,
+                search_fields=search_fields,
+                prefilter=prefilter,
+                num_candidates=num_candidates,
+                field_name=embedding_field,
+            )
+            response = scope.search(self.vector_search_index, request, options)
+            return self._read_rows(response, use_search_fields=use_search_fields, projection=fetch_projection)
+
+        with ThreadPoolExecutor(max_workers=min(len(query_embeddings), max_concurrency)) as executor:
+            hits = list(executor.map(run_search, search_embeddings))
+
+        values: Dict[str, Dict[str, Any]] = {}
+        for _, _, stored_values in hits:
+            values.update(stored_values)
+        values = self._complete_search_values(values, fetch_projection)
+        results = self._load_documents_batch([(ids, scores) for ids, scores, _ in hits], values, fetch_projection)
+        if not reranked:
+            return results
+        return [
+            _rerank(query_embedding, candidates, top_k, rerank, projection, mmr_lambda=mmr_lambda)
+            for query_embedding, candidates in zip(query_embeddings, results)
+        ]
+
+    def _hybrid_retrieval(
+        self,
+        query: str,
+        query_embedding: List[float],
+        top_k: int = 10,
+        *,
+        text_top_k: Optional[int] = None,
+        vector_top_k: Optional[int] = None,
+        text_field: str = "content",
+        filters: Optional[Dict[str, Any]] = None,
+        fusion: str = "reciprocal_rank_fusion",
+        weights: Optional[List[float]] = None,
+        rrf_k: int = 60,
+        return_embedding: bool = True,
+        fields: Optional[List[str]] = None,
+    ) -> List[Document]:
+        """
+        Find the documents that best match both a text query and a query embedding.
+
+        A full-text search and a vector search run concurrently, their rankings are fused client side and only the
+        fused `top_k` Documents are fetched from the key-value service.
+
+        :param query: Text of the query, matched against `text_field`.
+        :param query_embedding: Embedding of the query.
+        :param top_k: How many documents to return after fusion.
+        :param text_top_k: How many candidates the text search returns. Defaults to `top_k`.
+        :param vector_top_k: How many candidates the vector search returns. Defaults to `top_k`.
+        :param text_field: Field of the search index the text query is matched against.
+        :param filters: Haystack filters applied to both searches.
+        :param fusion: How the two rankings are fused, either `reciprocal_rank_fusion` or `weighted`, a weighted sum of
+            min-max normalized scores.
+        :param weights: Weights of the text and vector rankings, in this order. Defaults to equal weights.
+        :param rrf_k: Rank constant of the reciprocal rank fusion.
+        :param return_embedding: Whether to return the embedding of the Documents.
+        :param fields: Document fields to return, e.g. `["content", "meta.title"]`. Defaults to all fields.
+        :returns: The fused list of Documents, the `score` of each Document is its fused score.
+        :raises ValueError: If `query` or `query_embedding` is empty, or `fusion` is unknown.
+        :raises DocumentStoreError: If the retrieval of documents from Couchbase fails.
+        """
+        if not query:
+            msg = "Query must not be empty"
+            raise ValueError(msg)
+        if not query_embedding:
+            msg = "Query embedding must not be empty"
+            raise ValueError(msg)
+        if fusion not in FUSION_METHODS:
+            msg = f"Unknown fusion method '{fusion}'. Supported methods are: {list(FUSION_METHODS.keys())}"
+            raise ValueError(msg)
+
+        prefilter = compile_filters(filters) if filters else None
+        text_query: SearchQuery = search.MatchQuery(query, field=text_field)
+        if prefilter is not None:
+            text_query = search.ConjunctionQuery(text_query, prefilter)
+        text_request = search.SearchRequest(text_query)
+        text_options = SearchOptions(limit=text_top_k or top_k)
+        vector_request, vector_options = self._vector_search_request(
+            query_embedding, vector_top_k or top_k, None, None, prefilter=prefilter
         )
+        # open the connection before fanning out so worker threads share a single cluster instance
+        scope = self.scope
+
+        def run_search(request: search.SearchRequest, options: SearchOptions) -> Ranking:
+            response = scope.search(self.vector_search_index, request, options)
+            ids, scores, _ = self._read_rows(response)
+            return list(zip(ids, scores))
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            text_future = executor.submit(run_search, text_request, text_options)
+            vector_future = executor.submit(run_search, vector_request, vector_options)
+            rankings = [text_future.result(), vector_future.result()]
+
+        fused = _fuse(rankings, fusion, weights, rrf_k)[:top_k]
+        return self._load_documents(
+            [id for id, _ in fused], [score for _, score in fused], {}, _projection(fields, return_embedding=return_embedding)
+        )
+
+    def _vector_search_request(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        search_query: Optional[SearchQuery],
+        limit: Optional[int],
+        *,
+        search_fields: Optional[List[str]] = None,
+        prefilter: Optional[SearchQuery] = None,
+        num_candidates: Optional[int] = None,
+        field_name: Optional[str] = None,
+        vector_queries: Optional[Dict[str, List[float]]] = None,
+        vector_query_combination: str = "or",
+    ) -> Tuple[search.SearchRequest, SearchOptions]:
+        vectors = [(field_name or "embedding", query_embedding), *(vector_queries or {}).items()]
+        queries = [
+            VectorQuery(
+                field_name=field,
+                vector=vector,
+                num_candidates=max(top_k, num_candidates or top_k),
+                prefilter=prefilter,
+            )
+            for field, vector in vectors
+        ]
+        vector_search_options = None
+        if len(queries) > 1:
+            vector_search_options = VectorSearchOptions(
+                vector_query_combination=VectorQueryCombination(vector_query_combination)
+            )
+        vector_search = VectorSearch(queries, vector_search_options)
         request = search.SearchRequest.create(vector_search)
         if search_query:
             request.with_search_query(search_query)
 
         if limit is None:
             limit = top_k
-        options = SearchOptions(fields=["*"], limit=limit)
-        response = self.scope.search(self.vector_search_index, request, options)
-        return self.__get_doc_from_kv(response)
+        options = SearchOptions(fields=search_fields, limit=limit)
+        return request, options
 
-    def __get_doc_from_kv(self, response: SearchResult) -> List[Document]:
-        documents: List[Document] = []
+    def _search_embedding(self, query_embedding: List[float], embedding_field: Optional[str]) -> List[float]:
+        """
+        Returns the vector searched on `embedding_field`, the truncation of `query_embedding` for `embedding_fields`.
+
+        :raises ValueError: If `embedding_field` is not an embedding field of the store.
+        """
+        embedding_fields = self.embedding_fields or {}
+        meta_embedding_fields = self.meta_embedding_fields or []
+        if embedding_field is None or embedding_field == "embedding" or embedding_field in meta_embedding_fields:
+            return query_embedding
+        if embedding_field not in embedding_fields:
+            msg = (
+                f"Unknown embedding field '{embedding_field}'. "
+                f"Supported fields are: {['embedding', *embedding_fields.keys(), *meta_embedding_fields]}"
+            )
+            raise ValueError(msg)
+        return _truncate_embedding(query_embedding, embedding_fields[embedding_field])
+
+    def _search_vectors(
+        self, vector_queries: Optional[Dict[str, List[float]]], vector_query_combination: str
+    ) -> Optional[Dict[str, List[float]]]:
+        """
+        Returns the vectors searched by the additional `vector_queries`, keyed by embedding field.
+
+        :raises ValueError: If a field is not an embedding field of the store or the combination is unknown.
+        """
+        if vector_query_combination not in VECTOR_QUERY_COMBINATIONS:
+            msg = (
+                f"Unknown vector query combination '{vector_query_combination}'. "
+                f"Supported combinations are: {VECTOR_QUERY_COMBINATIONS}"
+            )
+            raise ValueError(msg)
+        if not vector_queries:
+            return None
+        if any(not embedding for embedding in vector_queries.values()):
+            msg = "Query embedding must not be empty"
+            raise ValueError(msg)
+        return {field: self._search_embedding(embedding, field) for field, embedding in vector_queries.items()}
+
+    def __get_doc_from_kv(
+        self, response: SearchResult, *, use_search_fields: bool = False, projection: Optional[List[str]] = None
+    ) -> List[Document]:
+        ids, scores, values = self._read_rows(response, use_search_fields=use_search_fields, projection=projection)
+        values = self._complete_search_values(values, projection)
+        return self._load_documents(ids, scores, values, projection)
+
+    def _complete_search_values(
+        self, values: Dict[str, Dict[str, Any]], projection: Optional[List[str]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetches the paths of the documents rebuilt from search fields that the index does not store, see
+        `_unstored_paths`, using sub-document lookups. Documents that cannot be looked up are fetched again whole.
+        """
+        if not values:
+            return values
+        if self._index_stored_paths is None:
+            index = self.scope.search_indexes().get_index(self.vector_search_index)
+            self._index_stored_paths = _stored_paths(index.params, f"{self.scope_name}.{self.collection_name}")
+        unstored = _unstored_paths(self._index_stored_paths, projection, self.meta_embedding_fields)
+        if not unstored:
+            return values
+        fetched_values, exceptions = self._lookup_projection(list(values), unstored)
+        return {id: _merge_values(value, fetched_values[id]) for id, value in values.items() if id not in exceptions}
+
+    def _load_documents(
+        self, ids: List[str], scores: List[float], values: Dict[str, Dict[str, Any]], projection: Optional[List[str]]
+    ) -> List[Document]:
+        """
+        Builds the Documents of the search hits `ids`, see `_load_documents_batch`.
+        """
+        return self._load_documents_batch([(ids, scores)], values, projection)[0]
+
+    def _load_documents_batch(
+        self,
+        hits: List[Tuple[List[str], List[float]]],
+        values: Dict[str, Dict[str, Any]],
+        projection: Optional[List[str]],
+    ) -> List[List[Document]]:
+        """
+        Builds the Documents of several lists of search hits.
+
+        Hits whose value is not in `values` are served from the document cache, the others are fetched from the
+        key-value service once, even if they appear in several lists.
+        """
+        missing_ids = list(dict.fromkeys(id for ids, _ in hits for id in ids if id not in values))
+        generation = self._document_cache.generation if self._document_cache is not None else None
+        cached = self._cached_documents(missing_ids, projection)
+        fetched_values, exceptions = self._fetch_values([id for id in missing_ids if id not in cached], projection)
+        values = {**values, **fetched_values}
+        results = [self._documents_from_kv_values(ids, scores, values, exceptions, cached) for ids, scores in hits]
+        if projection is None:
+            self._cache_documents((doc for docs in results for doc in docs if doc.id in fetched_values), generation)
+        return results
+
+    def _cached_documents(self, ids: List[str], projection: Optional[List[str]]) -> Dict[str, Document]:
+        """
+        Returns the Documents of `ids` found in the document cache, restricted to `projection`.
+
+        Only whole Documents are cached, so projections on nested paths such as `meta.title` bypass the cache.
+        """
+        if self._document_cache is None or not ids:
+            return {}
+        if projection is not None and not set(projection).issubset(_DOCUMENT_FIELDS):
+            return {}
+        cached: Dict[str, Document] = {}
+        for id in ids:
+            doc = self._document_cache.get(id)
+            if doc is not None:
+                cached[id] = _project_document(doc, projection, self.meta_embedding_fields)
+        return cached
+
+    def _cache_documents(self, documents: Iterable[Document], generation: Optional[int]) -> None:
+        if self._document_cache is None:
+            return
+        for doc in documents:
+            # deep copies, the embedding and meta of the returned Documents may be modified by the caller
+            self._document_cache.put(doc.id, copy.deepcopy(replace(doc, score=None)), generation)
+
+    @staticmethod
+    def _read_rows(
+        response: SearchResult, *, use_search_fields: bool = False, projection: Optional[List[str]] = None
+    ) -> Tuple[List[str], List[float], Dict[str, Dict[str, Any]]]:
         ids: List[str] = []
         scores: List[float] = []
+        values: Dict[str, Dict[str, Any]] = {}
         for doc in response.rows():
             ids.append(doc.id)
             scores.append(doc.score)
+            if use_search_fields:
+                value = _document_from_search_fields(doc.fields, projection)
+                if value is not None:
+                    values[doc.id] = value
+        return ids, scores, values
+
+    def _fetch_values(
+        self, ids: List[str], projection: Optional[List[str]]
+    ) -> Tuple[Dict[str, Dict[str, Any]], Optional[Dict[str, Exception]]]:
+        """
+        Fetches the given documents from the key-value service, or only their `projection` paths if set.
+        """
+        if not ids:
+            return {}, None
+        if projection is not None:
+            return self._lookup_projection(ids, projection)
         kv_response = self.collection.get_multi(keys=ids)
-        if not kv_response.all_ok and kv_response.exceptions:
+        values = {id: result.value for id, result in kv_response.results.items() if result is not None and result.success}
+        exceptions = kv_response.exceptions if not kv_response.all_ok else None
+        return values, exceptions
+
+    def _lookup_projection(
+        self, ids: List[str], projection: List[str]
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]:
+        """
+        Fetches only the `projection` paths of the given documents using sub-document lookups.
+        """
+        specs = [subdocument.get(path) for path in projection]
+
+        def lookup(key: str) -> Any:
+            try:
+                return self.collection.lookup_in(key, specs)
+            except Exception as e:
+                return e
+
+        # sub-document lookups have no multi variant in the sync API, run them concurrently instead
+        with ThreadPoolExecutor(max_workers=min(len(ids), _MAX_LOOKUP_CONCURRENCY)) as executor:
+            results = list(executor.map(lookup, ids))
+
+        values: Dict[str, Dict[str, Any]] = {}
+        exceptions: Dict[str, Exception] = {}
+        for id, result in zip(ids, results):
+            if isinstance(result, Exception):
+                exceptions[id] = result
+                continue
+            values[id] = _unflatten(
+                {path: result.content_as[_raw](i) for i, path in enumerate(projection) if result.exists(i)}
+            )
+        return values, exceptions
+
+    def _documents_from_kv_values(
+        self,
+        ids: List[str],
+        scores: List[float],
+        values: Dict[str, Dict[str, Any]],
+        exceptions: Optional[Dict[str, Exception]] = None,
+        cached: Optional[Dict[str, Document]] = None,
+    ) -> List[Document]:
+        if exceptions:
             errors = []
-            for id, ex in kv_response.exceptions.items():
-                errors.append({"id": id, "exception": ex})
+            for doc_id, ex in exceptions.items():
+                errors.append({"id": doc_id, "exception": ex})
             if len(errors) > 0:
-                msg = f"Failed to write documents to couchbase. Errors:\n{errors}"
+                msg = f"Failed to read documents from couchbase. Errors:\n{errors}"
                 raise DocumentStoreError(msg)
-        for i, id in enumerate(ids):
-            get_result = kv_response.results.get(id)
-            if get_result is not None and get_result.success:
-                value = get_result.value
-                value["id"] = id
-                value["score"] = scores[i]
+        documents: List[Document] = []
+        for i, doc_id in enumerate(ids):
+            if cached and doc_id in cached:
+                documents.append(replace(copy.deepcopy(cached[doc_id]), score=scores[i]))
+                continue
+            value = values.get(doc_id)
+            if value is None:
+                continue
+            # copy, the same value can be shared by the results of several queries
+            value = {**value, "id": doc_id, "score": scores[i]}
+            for field in self.embedding_fields or {}:
+                value.pop(field, None)
+            for field in self.meta_embedding_fields or []:
+                named_embedding = value.pop(field, None)
+                if named_embedding is not None:
+                    meta = value["meta"] = dict(value.get("meta") or {})
+                    meta[field] = _decode_embedding(named_embedding)
+            if isinstance(value.get("meta"), dict):
+                value["meta"] = dict(value["meta"])
+            if value.get("embedding") is not None:
+                value["embedding"] = _decode_embedding(value["embedding"])
             documents.append(Document.from_dict(value))
         return documents
+
+
+def _gsi_indexed_fields(indexes: Iterable[QueryIndex]) -> Set[str]:
+    """
+    Returns the document paths that are keys of the online GSI indexes without a partial index condition.
+    """
+    return _indexed_fields(
+        key
+        for index in indexes
+        if not index.is_primary and index.state == "online" and not index.condition
+        for key in index.index_key
+    )
+
+
+def _mutation_count(response: QueryResult) -> int:
+    metrics = response.metadata().metrics()
+    return metrics.mutation_count().value if metrics is not None else 0
+
+
+def _validate_delete_by_filter(filters: Dict[str, Any], batch_size: int) -> None:
+    if not filters:
+        msg = "filters must not be empty, use delete_documents to delete documents by ID"
+        raise ValueError(msg)
+    if batch_size < 1:
+        msg = "batch_size must be greater than 0"
+        raise ValueError(msg)
+
+
+def _validate_documents(documents: List[Any]) -> List[Document]:
+    if not all(isinstance(doc, Document) for doc in documents):
+        msg = "param 'documents' must contain a list of objects of type Document"
+        raise ValueError(msg)
+    return documents
+
+
+def _document_from_search_fields(
+    fields: Optional[Dict[str, Any]], projection: Optional[List[str]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Rebuilds a document dictionary from the fields stored in the search index.
+
+    Stored fields are returned by the search service with dotted paths, e.g. `meta.year`, they are nested back
+    into dictionaries. Returns None if no document payload (`content`, `dataframe` or `blob`) is stored.
+    """
+    if not fields:
+        return None
+    if projection is not None:
+        fields = {path: v for path, v in fields.items() if any(_is_in_path(path, p) for p in projection)}
+    value = _unflatten(fields)
+    if projection is None and not any(key in value for key in ("content", "dataframe", "blob")):
+        return None
+    return value
+
+
+def _unstored_paths(
+    stored_paths: Dict[str, bool], projection: Optional[List[str]], meta_embedding_fields: Optional[List[str]]
+) -> List[str]:
+    """
+    Returns the paths of `projection`, or of whole documents, whose value the search index does not store.
+
+    `stored_paths` are the paths mapped by the index, see `_stored_paths`. Whole documents are made of the top
+    level fields the index maps, the other ones are not looked up.
+    """
+    if projection is None:
+        projection = [
+            path
+            for path in [*_DOCUMENT_FIELDS, *(meta_embedding_fields or [])]
+            if path in stored_paths or "" in stored_paths
+        ]
+    return [path for path in projection if not _is_stored_path(stored_paths, path)]
+
+
+def _is_stored_path(stored_paths: Dict[str, bool], path: str) -> bool:
+    """
+    Checks whether the index stores the whole value of a dotted `path`, or of one of its parents.
+    """
+    keys = path.split(".")
+    return any(stored_paths.get(".".join(keys[:i])) for i in range(len(keys) + 1))
+
+
+def _merge_values(stored: Dict[str, Any], fetched: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merges the paths fetched from the key-value service into a document rebuilt from search fields.
+    """
+    merged = dict(stored)
+    for key, fetched_value in fetched.items():
+        stored_value = merged.get(key)
+        if isinstance(stored_value, dict) and isinstance(fetched_value, dict):
+            merged[key] = _merge_values(stored_value, fetched_value)
+        else:
+            merged[key] = fetched_value
+    return merged
+
+
+def _unflatten(fields: Dict[str, Any]) -> Dict[str, Any]:
+    value: Dict[str, Any] = {}
+    for path, field_value in fields.items():
+        *parents, leaf = path.split(".")
+        node = value
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = field_value
+    return value
+
+
+def _is_in_path(path: str, prefix: str) -> bool:
+    return path == prefix or path.startswith(prefix + ".")
+
+
+def _projection(fields: Optional[List[str]], *, return_embedding: bool) -> Optional[List[str]]:
+    """
+    Returns the document paths to fetch, or None if whole documents should be fetched.
+    """
+    if fields is None and return_embedding:
+        return None
+    projection = list(fields) if fields is not None else list(_DOCUMENT_FIELDS)
+    if not return_embedding:
+        projection = [path for path in projection if not _is_in_path(path, "embedding")]
+    if len(projection) > _MAX_LOOKUP_SPECS:
+        msg = f"At most {_MAX_LOOKUP_SPECS} fields can be projected, got {len(projection)}."
+        raise ValueError(msg)
+    return projection
+
+
+def _search_fields(fields: Optional[List[str]], *, use_search_fields: bool) -> Optional[List[str]]:
+    """
+    Returns the stored fields to request from the search service.
+    """
+    if not use_search_fields:
+        return None
+    return list(fields) if fields is not None else ["*"]
+
+
+def _query_cache_key(
+    query_embedding: List[float],
+    top_k: int,
+    *,
+    search_query: Optional[SearchQuery],
+    limit: Optional[int],
+    filters: Optional[Dict[str, Any]],
+    use_search_fields: bool,
+    return_embedding: bool,
+    fields: Optional[List[str]],
+    num_candidates: Optional[int] = None,
+    rerank: Optional[str] = None,
+    mmr_lambda: Optional[float] = None,
+    embedding_field: Optional[str] = None,
+    vector_queries: Optional[Dict[str, List[float]]] = None,
+    vector_query_combination: str = "or",
+) -> Tuple[Any, ...]:
+    """
+    Builds the query cache key of an embedding retrieval.
+
+    The embedding is quantized to float32 before being hashed, so embeddings that only differ by float64 rounding
+    noise share a cache entry.
+    """
+    vector_queries_key = (
+        tuple(sorted((field, _embedding_hash(embedding)) for field, embedding in vector_queries.items()))
+        if vector_queries
+        else None
+    )
+    search_query_key = json.dumps(search_query.encodable, sort_keys=True, default=str) if search_query else None
+    filters_key = json.dumps(filters, sort_keys=True, default=str) if filters else None
+    fields_key = tuple(fields) if fields else None
+    return (
+        _embedding_hash(query_embedding),
+        top_k,
+        limit,
+        search_query_key,
+        filters_key,
+        use_search_fields,
+        return_embedding,
+        fields_key,
+        num_candidates,
+        rerank,
+        mmr_lambda,
+        embedding_field,
+        vector_queries_key,
+        vector_query_combination if vector_queries else None,
+    )
+
+
+def _embedding_hash(embedding: List[float]) -> bytes:
+    return hashlib.blake2b(struct.pack(f"<{len(embedding)}f", *embedding), digest_size=16).digest()
+
+
+def _validate_rerank(num_candidates: Optional[int], rerank: Optional[str], mmr_lambda: Optional[float] = None) -> None:
+    if num_candidates is not None and num_candidates < 1:
+        msg = "num_candidates must be greater than 0"
+        raise ValueError(msg)
+    if rerank is not None:
+        _validate_similarity(rerank)
+    if mmr_lambda is not None:
+        _validate_mmr_lambda(mmr_lambda)
+
+
+def _candidate_count(top_k: int, num_candidates: Optional[int], mmr_lambda: Optional[float]) -> int:
+    """
+    Returns how many candidates a reranked vector search fetches, diversifying needs more candidates than `top_k`.
+    """
+    if num_candidates is None:
+        num_candidates = top_k * _MMR_CANDIDATES_FACTOR if mmr_lambda is not None else top_k
+    return max(top_k, num_candidates)
+
+
+def _rerank_projection(projection: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    Returns `projection` extended with the embedding, which reranking needs even if it isn't returned.
+    """
+    if projection is None or "embedding" in projection:
+        return projection
+    return [*projection, "embedding"]
+
+
+def _rerank(
+    query_embedding: List[float],
+    candidates: List[Document],
+    top_k: int,
+    similarity: Optional[str],
+    projection: Optional[List[str]],
+    *,
+    mmr_lambda: Optional[float] = None,
+) -> List[Document]:
+    """
+    Reranks, or diversifies if `mmr_lambda` is set, the candidates of a vector search, then drops their embedding if
+    `projection` doesn't include it.
+    """
+    if mmr_lambda is not None:
+        documents = _mmr_documents(query_embedding, candidates, top_k, mmr_lambda, similarity or "cosine")
+    else:
+        documents = _rerank_documents(query_embedding, candidates, top_k, similarity or "cosine")
+    if projection is not None and "embedding" not in projection:
+        documents = [replace(doc, embedding=None) for doc in documents]
+    return documents
+
+
+def _validate_embedding_fields(
+    embedding_fields: Optional[Dict[str, int]], meta_embedding_fields: Optional[List[str]] = None
+) -> None:
+    fields = [*(embedding_fields or {}).keys(), *(meta_embedding_fields or [])]
+    for field in fields:
+        if field in (*_DOCUMENT_FIELDS, "id", "score"):
+            msg = f"'{field}' is a field of the Documents, it can't be used as an embedding field"
+            raise ValueError(msg)
+        if not re.match(r"^[a-zA-Z0-9_]+$", field):
+            msg = f"Invalid embedding field name '{field}'. It can only contain letters, numbers or _."
+            raise ValueError(msg)
+    if len(set(fields)) != len(fields):
+        msg = "embedding_fields and meta_embedding_fields must not contain the same field twice"
+        raise ValueError(msg)
+    for field, dimensions in (embedding_fields or {}).items():
+        if dimensions < 1:
+            msg = f"The embedding field '{field}' must keep at least one dimension"
+            raise ValueError(msg)
+
+
+def _project_document(
+    doc: Document, projection: Optional[List[str]], meta_embedding_fields: Optional[List[str]] = None
+) -> Document:
+    """
+    Restricts a whole Document to the top level fields in `projection`, as if only those had been fetched.
+
+    The `meta_embedding_fields` are top level fields of the stored documents, they are kept in the meta only if
+    projected.
+    """
+    if projection is None:
+        return doc
+    unprojected = [field for field in meta_embedding_fields or [] if field not in projection]
+    meta = {key: value for key, value in doc.meta.items() if key not in unprojected} if "meta" in projection else {}
+    dropped = {field: None for field in _DOCUMENT_FIELDS if field not in projection and field != "meta"}
+    return replace(doc, meta=meta, **dropped)
+
+
+def _copy_documents(documents: List[Document]) -> List[Document]:
+    """
+    Copies cached Documents, so callers that modify the returned Documents, their embedding or meta don't alter the
+    cache.
+    """
+    return [copy.deepcopy(doc) for doc in documents]
+
+
+def _raw(content: Any) -> Any:
+    return content
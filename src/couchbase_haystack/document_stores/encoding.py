@@ -0,0 +1,124 @@
+# SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
+#
+# SPDX-License-Identifier: Apache-2.0
+import base64
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+# storage formats of the `embedding` field, mapped to the little-endian dtype of their base64 payload
+EMBEDDING_FORMATS: Dict[str, Optional[np.dtype]] = {
+    "float": None,
+    "base64_float32": np.dtype("<f4"),
+    "base64_float16": np.dtype("<f2"),
+}
+
+# prefix of the base64 payloads of each format, so every payload is decoded with the dtype it was written with.
+# float32 payloads are left untagged, a vector_base64 field of the search index must hold plain base64
+_BASE64_PREFIXES = {"base64_float32": "", "base64_float16": "float16:"}
+_FLOAT16_PREFIX = _BASE64_PREFIXES["base64_float16"]
+
+
+def _validate_embedding_format(embedding_format: str) -> None:
+    if embedding_format not in EMBEDDING_FORMATS:
+        msg = f"Unknown embedding format '{embedding_format}'. Supported formats are: {list(EMBEDDING_FORMATS.keys())}"
+        raise ValueError(msg)
+
+
+def _encode_embedding(embedding: Sequence[float], embedding_format: str) -> Any:
+    """
+    Encodes an embedding for storage, as a JSON array of floats or as a base64 string of little-endian floats.
+
+    float16 payloads are prefixed with `float16:`, see `_decode_embedding`.
+    """
+    dtype = EMBEDDING_FORMATS[embedding_format]
+    if dtype is None:
+        return embedding
+    encoded = base64.b64encode(np.asarray(embedding, dtype=dtype).tobytes()).decode("ascii")
+    return _BASE64_PREFIXES[embedding_format] + encoded
+
+
+def _encode_embeddings(
+    embeddings: Union[np.ndarray, Sequence[Optional[Sequence[float]]]], embedding_format: str
+) -> List[Any]:
+    """
+    Encodes the embeddings of a batch of documents at once, `None` entries stay `None`.
+
+    `embeddings` is either a 2-D array with one row per document or a sequence of embeddings. For base64 formats,
+    embeddings of equal dimension are converted to a single contiguous matrix and each row is encoded from a view on
+    its buffer, without an intermediate array per document.
+    """
+    dtype = EMBEDDING_FORMATS[embedding_format]
+    if isinstance(embeddings, np.ndarray):
+        if embeddings.ndim != 2:  # noqa: PLR2004
+            msg = f"embeddings must be a 2-D array, got {embeddings.ndim} dimensions"
+            raise ValueError(msg)
+        if dtype is None:
+            return embeddings.tolist()
+        rows = list(range(len(embeddings)))
+        matrix = np.ascontiguousarray(embeddings, dtype=dtype)
+    else:
+        if dtype is None:
+            return list(embeddings)
+        rows = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+        if len({len(embeddings[i]) for i in rows}) != 1:  # type: ignore[arg-type]
+            # no embeddings, or embeddings of different dimensions
+            return [_encode_embedding(e, embedding_format) if e is not None else None for e in embeddings]
+        matrix = np.asarray([embeddings[i] for i in rows], dtype=dtype)
+
+    buffer = memoryview(matrix).cast("B")
+    row_size = matrix.shape[1] * matrix.itemsize
+    prefix = _BASE64_PREFIXES[embedding_format]
+    encoded: List[Any] = [None] * len(embeddings)
+    for j, i in enumerate(rows):
+        encoded[i] = prefix + base64.b64encode(buffer[j * row_size : (j + 1) * row_size]).decode("ascii")
+    return encoded
+
+
+def _decode_embedding(embedding: Any) -> Any:
+    """
+    Decodes a stored embedding back to a list of floats, whatever the format of the store that wrote it.
+
+    Base64 strings are float16 if they start with `float16:` and float32 otherwise. They are viewed in place as an
+    array of that dtype and converted to Python floats in a single pass. Lists are returned unchanged.
+    """
+    if not isinstance(embedding, str):
+        return embedding
+    if embedding.startswith(_FLOAT16_PREFIX):
+        payload, dtype = embedding[len(_FLOAT16_PREFIX) :], EMBEDDING_FORMATS["base64_float16"]
+    else:
+        payload, dtype = embedding, EMBEDDING_FORMATS["base64_float32"]
+    return np.frombuffer(base64.b64decode(payload), dtype=dtype).tolist()
+
+
+def _truncate_embedding(embedding: Sequence[float], dimensions: int) -> List[float]:
+    """
+    Keeps the first `dimensions` values of an embedding, rescaled to unit length.
+
+    Matryoshka embedding models concentrate the information in the leading dimensions, a normalized prefix can be
+    compared with the cosine or dot product similarity like a full embedding.
+    """
+    return _truncate_embeddings([embedding], dimensions)[0]  # type: ignore[return-value]
+
+
+def _truncate_embeddings(
+    embeddings: Union[np.ndarray, Sequence[Optional[Sequence[float]]]], dimensions: int
+) -> List[Optional[List[float]]]:
+    """
+    Truncates the embeddings of a batch of documents at once, see `_truncate_embedding`. `None` entries stay `None`.
+
+    :raises ValueError: If an embedding has fewer than `dimensions` values.
+    """
+    rows = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+    truncated: List[Optional[List[float]]] = [None] * len(embeddings)
+    if not rows:
+        return truncated
+    if any(len(embeddings[i]) < dimensions for i in rows):  # type: ignore[arg-type]
+        msg = f"Embeddings must have at least {dimensions} dimensions to be truncated to {dimensions}"
+        raise ValueError(msg)
+    matrix = np.asarray([embeddings[i][:dimensions] for i in rows], dtype=np.float64)  # type: ignore[index]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+    for i, row in zip(rows, matrix.tolist()):
+        truncated[i] = row
+    return truncated
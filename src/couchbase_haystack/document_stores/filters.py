@@ -1,8 +1,11 @@
 # SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
 #
 # SPDX-License-Identifier: Apache-2.0
+import json
+import re
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from backports.datetime_fromisoformat import MonkeyPatch
 from couchbase import search
@@ -12,6 +15,19 @@ from pandas import DataFrame
 
 MonkeyPatch.patch_fromisoformat()
 
+# shape of the ISO 8601 dates and date times, so most strings are told apart from dates without parsing them
+_ISO_DATE = re.compile(
+    r"^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}(?::\d{2}(?::\d{2}(?:[.,]\d+)?)?)?(?:Z|[+-]\d{2}(?::?\d{2}(?::?\d{2})?)?)?)?$"
+)
+_COMPILED_FILTERS_CACHE_SIZE = 1024
+# operators whose queries may be ranges, which are merged when they act on the same field of a conjunction
+_RANGE_OPERATORS = ("==", ">", ">=", "<", "<=")
+# bound, inclusivity flag and the search service default of the flag, of the lower and upper bounds of each range
+_RANGE_BOUNDS = {
+    "numeric": (("min", "inclusive_min", True), ("max", "inclusive_max", False)),
+    "date": (("start", "inclusive_start", True), ("end", "inclusive_end", False)),
+}
+
 
 class DateRangeQuery(search.DateRangeQuery):
     @property
@@ -57,6 +73,173 @@ class NumericRangeQuery(search.NumericRangeQuery):
         self.set_prop("inclusive_max", value)
 
 
+# builds the query of a filter shape from the values of its conditions, in the order of the shape
+_FilterTemplate = Callable[[List[Any]], SearchQuery]
+
+
+def compile_filters(filters: Dict[str, Any]) -> SearchQuery:
+    """
+    Converts Haystack filters in Couchbase compatible filters, memoized on the shape of the filters.
+
+    The shape of filters is the nesting of their logical operators and the field and operator of each comparison,
+    without the values. Filters of the same shape share a compiled template, so filters reused with different values
+    only pay for building their query. The shape is simplified once, when its template is compiled, like
+    `_simplify_filters` does, and the templates only compare values where the shape allows duplicate conditions or
+    mergeable ranges. Filters that are not well formed are converted without the cache, to report their errors.
+    """
+    if not isinstance(filters, dict):
+        msg = "Filters must be a dictionary"
+        raise FilterError(msg)
+    values: List[Any] = []
+    shape = _filter_shape(filters, values)
+    if shape is None:
+        return _normalize_filters(filters)
+    return _compile_filter_shape(shape)(values)
+
+
+def _filter_shape(condition: Any, values: List[Any]) -> Optional[Tuple[Any, ...]]:
+    """
+    Returns the shape of `condition` and appends the values of its comparisons to `values`, in the order of the shape.
+
+    Comparisons are shaped as `("field", field, operator)` and logical conditions as
+    `("logic", operator, conditions)`. Returns None if the condition is not well formed.
+    """
+    if not isinstance(condition, dict) or not isinstance(condition.get("operator"), str):
+        return None
+    if "field" in condition:
+        if not isinstance(condition["field"], str) or "value" not in condition:
+            return None
+        value = condition["value"]
+        # DataFrames are compared on their JSON serialization, see `_parse_comparison_condition`
+        values.append(value.to_json() if isinstance(value, DataFrame) else value)
+        return ("field", condition["field"], condition["operator"])
+    conditions = condition.get("conditions")
+    if not isinstance(conditions, list):
+        return None
+    shapes = []
+    for child in conditions:
+        shape = _filter_shape(child, values)
+        if shape is None:
+            return None
+        shapes.append(shape)
+    return ("logic", condition["operator"], tuple(shapes))
+
+
+@lru_cache(maxsize=_COMPILED_FILTERS_CACHE_SIZE)
+def _compile_filter_shape(shape: Tuple[Any, ...]) -> _FilterTemplate:
+    template, _ = _shape_template(_simplify_shape(shape), 0)
+    return template
+
+
+def _simplify_shape(shape: Tuple[Any, ...]) -> Tuple[Any, ...]:
+    """
+    Flattens and unwraps the logical conditions of a shape like `_simplify_filters`, without looking at the values.
+
+    The comparisons keep their order, so the simplified shape reads the values in the same order.
+    """
+    if shape[0] == "field" or shape[1] not in ("AND", "OR", "NOT"):
+        return shape
+    _, operator, children = shape
+    # NOT negates the conjunction of its conditions
+    absorbed = "OR" if operator == "OR" else "AND"
+    simplified: List[Tuple[Any, ...]] = []
+    for child in map(_simplify_shape, children):
+        if child[0] == "logic" and child[1] == absorbed and child[2]:
+            simplified.extend(child[2])
+        else:
+            simplified.append(child)
+    if operator != "NOT" and len(simplified) == 1:
+        return simplified[0]
+    return ("logic", operator, tuple(simplified))
+
+
+def _shape_template(shape: Tuple[Any, ...], index: int) -> Tuple[_FilterTemplate, int]:
+    """
+    Builds the template of `shape`, whose values start at `index`. Returns it with the index of the next value.
+    """
+    if shape[0] == "field":
+        _, field, operator = shape
+        convert = _comparison_operator(operator)
+        if operator in ("in", "not in"):
+            return (lambda values: convert(field, _unique_values(values[index]))), index + 1
+        return (lambda values: convert(field, values[index])), index + 1
+
+    _, operator, children = shape
+    if operator not in ("AND", "OR", "NOT"):
+        msg = f"Unknown logical operator '{operator}'"
+        raise FilterError(msg)
+    templates = []
+    spans = []
+    for child in children:
+        template, end = _shape_template(child, index)
+        templates.append(template)
+        spans.append((index, end))
+        index = end
+    # only conditions of the same shape can be duplicates, only ranges on the same field can be merged
+    same_shapes = [[j for j in range(i) if children[j] == child] for i, child in enumerate(children)]
+    dedupe = any(same_shapes)
+    range_fields = [child[1] for child in children if child[0] == "field" and child[2] in _RANGE_OPERATORS]
+    merge_ranges = operator in ("AND", "NOT") and len(set(range_fields)) < len(range_fields)
+
+    def build(values: List[Any]) -> SearchQuery:
+        if dedupe:
+            kept = [
+                template
+                for i, template in enumerate(templates)
+                if not any(_equal_values(values, spans[i], spans[j]) for j in same_shapes[i])
+            ]
+            if len(kept) == 1 and operator != "NOT":
+                return kept[0](values)
+        else:
+            kept = templates
+        conditions = [template(values) for template in kept]
+        if merge_ranges:
+            conditions = _normalize_ranges(conditions)
+        return _logical_query(operator, conditions)
+
+    return build, index
+
+
+def _equal_values(values: List[Any], span: Tuple[int, int], other: Tuple[int, int]) -> bool:
+    first, second = values[span[0] : span[1]], values[other[0] : other[1]]
+    # 1, 1.0 and True are equal in Python but not in a query
+    return first == second and all(type(a) is type(b) for a, b in zip(first, second))
+
+
+def _unique_values(values: Any) -> Any:
+    """
+    Removes the duplicates of the values of an `in` or `not in` condition, keeping the first occurrences.
+    """
+    if not isinstance(values, list):
+        return values
+    try:
+        unique = list(dict.fromkeys((type(value), value) for value in values))
+    except TypeError:
+        return values
+    return [value for _, value in unique] if len(unique) < len(values) else values
+
+
+def _canonical_value(value: Any) -> Any:
+    if isinstance(value, DataFrame):
+        # DataFrames are compared on their JSON serialization, see `_parse_comparison_condition`
+        return value.to_json()
+    msg = f"Object of type {type(value).__name__} is not JSON serializable"
+    raise TypeError(msg)
+
+
+def _is_iso_date(value: Any) -> bool:
+    """
+    Returns whether `value` is an ISO formatted date, only parsing the strings that look like one.
+    """
+    if not isinstance(value, str) or _ISO_DATE.match(value) is None:
+        return False
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
 def _normalize_filters(filters: Dict[str, Any]) -> SearchQuery:
     """
     Converts Haystack filters in Couchbase compatible filters.
@@ -65,11 +248,66 @@ def _normalize_filters(filters: Dict[str, Any]) -> SearchQuery:
         msg = "Filters must be a dictionary"
         raise FilterError(msg)
 
+    filters = _simplify_filters(filters)
     if "field" in filters:
         return _parse_comparison_condition(filters)
     return _parse_logical_condition(filters)
 
 
+def _simplify_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Simplifies Haystack filters without changing the documents they match.
+
+    Conditions nested in a condition they can be merged into are flattened, `AND` and `NOT` absorb the conditions
+    of their `AND` children and `OR` those of its `OR` children. Duplicate conditions and duplicate `in` and
+    `not in` values are removed, and `AND` or `OR` with a single condition are replaced by that condition.
+    Malformed filters are returned as they are, to be reported by the conversion.
+    """
+    if "field" in filters:
+        value = filters.get("value")
+        if filters.get("operator") in ("in", "not in") and isinstance(value, list):
+            values = _unique(value)
+            if len(values) < len(value):
+                return {**filters, "value": values}
+        return filters
+
+    operator = filters.get("operator")
+    conditions = filters.get("conditions")
+    if operator not in ("AND", "OR", "NOT") or not isinstance(conditions, list):
+        return filters
+    # NOT negates the conjunction of its conditions
+    absorbed = "OR" if operator == "OR" else "AND"
+    simplified: List[Any] = []
+    for condition in conditions:
+        child = _simplify_filters(condition) if isinstance(condition, dict) else condition
+        nested = child.get("conditions") if isinstance(child, dict) else None
+        if isinstance(nested, list) and nested and "field" not in child and child.get("operator") == absorbed:
+            simplified.extend(nested)
+        else:
+            simplified.append(child)
+    simplified = _unique(simplified)
+    if operator != "NOT" and len(simplified) == 1 and isinstance(simplified[0], dict):
+        return simplified[0]
+    return {**filters, "conditions": simplified}
+
+
+def _unique(items: List[Any]) -> List[Any]:
+    """
+    Removes the duplicates of `items`, compared on their JSON serialization, keeping the first occurrences.
+    """
+    try:
+        keys = [json.dumps(item, sort_keys=True, default=_canonical_value) for item in items]
+    except TypeError:
+        return items
+    seen = set()
+    unique = []
+    for key, item in zip(keys, items):
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
 def _parse_logical_condition(condition: Dict[str, Any]) -> SearchQuery:
     if "operator" not in condition:
         msg = f"'operator' key missing in {condition}"
@@ -80,8 +318,13 @@ def _parse_logical_condition(condition: Dict[str, Any]) -> SearchQuery:
 
     operator = condition["operator"]
     conditions = [_parse_comparison_condition(c) for c in condition["conditions"]]
-    # if len(conditions) > 1:
-    #     conditions = _normalize_ranges(conditions)
+    if len(conditions) > 1 and operator in ("AND", "NOT"):
+        # ranges can only be intersected in a conjunction, NOT negates the conjunction of its conditions
+        conditions = _normalize_ranges(conditions)
+    return _logical_query(operator, conditions)
+
+
+def _logical_query(operator: str, conditions: List[SearchQuery]) -> SearchQuery:
     if operator == "AND":
         return search.BooleanQuery(must=search.ConjunctionQuery(*conditions))
     elif operator == "OR":
@@ -124,19 +367,18 @@ def _greater_than(field: str, value: Any) -> Dict[str, Any]:
         # This way we keep the behavior consistent with other Document Stores.
         raise Exception("None value filter not supported")
     if isinstance(value, str):
-        try:
-            datetime.fromisoformat(value)
-            return search.DateRangeQuery(start=value, field=field)
-        except (ValueError, TypeError) as exc:
+        if not _is_iso_date(value):
             msg = (
                 "Can't compare strings using operators '>', '>=', '<', '<='. "
                 "Strings are only comparable if they are ISO formatted dates."
             )
-            raise FilterError(msg) from exc
+            raise FilterError(msg)
+        # the search service includes the start of a range unless told otherwise
+        return DateRangeQuery(start=value, field=field, inclusive_start=False)
     if type(value) in [list, DataFrame]:
         msg = f"Filter value can't be of type {type(value)} using operators '>', '>=', '<', '<='"
         raise FilterError(msg)
-    return NumericRangeQuery(min=value, field=field)
+    return NumericRangeQuery(min=value, field=field, inclusive_min=False)
 
 
 def _greater_than_equal(field: str, value: Any) -> Dict[str, Any]:
@@ -147,17 +389,15 @@ def _greater_than_equal(field: str, value: Any) -> Dict[str, Any]:
         # This way we keep the behavior consistent with other Document Stores.
         raise Exception("None value filter not supported")
     if isinstance(value, str):
-        try:
-            datetime.fromisoformat(value)
-            filter = DateRangeQuery(start=value, field=field)
-            filter.inclusive_start = True
-            return filter
-        except (ValueError, TypeError) as exc:
+        if not _is_iso_date(value):
             msg = (
                 "Can't compare strings using operators '>', '>=', '<', '<='. "
                 "Strings are only comparable if they are ISO formatted dates."
             )
-            raise FilterError(msg) from exc
+            raise FilterError(msg)
+        filter = DateRangeQuery(start=value, field=field)
+        filter.inclusive_start = True
+        return filter
     if type(value) in [list, DataFrame]:
         msg = f"Filter value can't be of type {type(value)} using operators '>', '>=', '<', '<='"
         raise FilterError(msg)
@@ -172,15 +412,13 @@ def _less_than(field: str, value: Any) -> Dict[str, Any]:
         # This way we keep the behavior consistent with other Document Stores.
         raise Exception("None value filter not supported")
     if isinstance(value, str):
-        try:
-            datetime.fromisoformat(value)
-            return search.DateRangeQuery(end=value, field=field)
-        except (ValueError, TypeError) as exc:
+        if not _is_iso_date(value):
             msg = (
                 "Can't compare strings using operators '>', '>=', '<', '<='. "
                 "Strings are only comparable if they are ISO formatted dates."
             )
-            raise FilterError(msg) from exc
+            raise FilterError(msg)
+        return search.DateRangeQuery(end=value, field=field)
     if type(value) in [list, DataFrame]:
         msg = f"Filter value can't be of type {type(value)} using operators '>', '>=', '<', '<='"
         raise FilterError(msg)
@@ -195,17 +433,15 @@ def _less_than_equal(field: str, value: Any) -> Dict[str, Any]:
         # This way we keep the behavior consistent with other Document Stores.
         raise Exception("None value filter not supported")
     if isinstance(value, str):
-        try:
-            datetime.fromisoformat(value)
-            filter = DateRangeQuery(end=value, field=field)
-            filter.inclusive_end = True
-            return filter
-        except (ValueError, TypeError) as exc:
+        if not _is_iso_date(value):
             msg = (
                 "Can't compare strings using operators '>', '>=', '<', '<='. "
                 "Strings are only comparable if they are ISO formatted dates."
             )
-            raise FilterError(msg) from exc
+            raise FilterError(msg)
+        filter = DateRangeQuery(end=value, field=field)
+        filter.inclusive_end = True
+        return filter
     if type(value) in [list, DataFrame]:
         msg = f"Filter value can't be of type {type(value)} using operators '>', '>=', '<', '<='"
         raise FilterError(msg)
@@ -244,11 +480,8 @@ def create_search_query(field: str, value: Any) -> SearchQuery:
     if isinstance(value, (int, float)):
         number_filter = NumericRangeQuery(min=value, max=value, field=field, inclusive_min=True, inclusive_max=True)
         return number_filter
-    try:
-        datetime.fromisoformat(value)
+    if _is_iso_date(value):
         return DateRangeQuery(start=value, end=value, field=field, inclusive_start=True, inclusive_end=True)
-    except (ValueError, TypeError):
-        pass
     return search.MatchQuery(value, field=field)
 
 
@@ -270,12 +503,23 @@ def _parse_comparison_condition(condition: Dict[str, Any]) -> Dict[str, Any]:
     if isinstance(value, DataFrame):
         value = value.to_json()
 
-    return COMPARISON_OPERATORS[operator](field, value)
+    return _comparison_operator(operator)(field, value)
+
+
+def _comparison_operator(operator: str) -> Callable[[str, Any], SearchQuery]:
+    if operator not in COMPARISON_OPERATORS:
+        msg = f"Unknown comparison operator '{operator}'"
+        raise FilterError(msg)
+    return COMPARISON_OPERATORS[operator]
 
 
 def _normalize_ranges(conditions: List[search.SearchQuery]) -> List[search.SearchQuery]:
     """
-    Merges range conditions acting on the same field.
+    Merges the range conditions of a conjunction acting on the same field into a single range.
+
+    The merged range is the intersection of the ranges, taking the tightest lower and upper bounds with their
+    inclusivity, and replaces the first range on the field. Dates are compared as instants, ranges whose bounds
+    can't be compared, such as dates with and without a time zone, are left as they are.
 
     Args:
         conditions (List[search.SearchQuery]): List of search conditions.
@@ -283,32 +527,82 @@ def _normalize_ranges(conditions: List[search.SearchQuery]) -> List[search.Searc
     Returns:
         List[search.SearchQuery]: List with merged range conditions.
     """
-    # Extract range conditions and associated field names
-    range_conditions = [
-        (query.field, query) for query in conditions if isinstance(query, NumericRangeQuery) or isinstance(query, DateRangeQuery)
-    ]
-
-    if range_conditions:
-        # Remove range conditions from the original list
-        conditions = [c for c in conditions if not isinstance(c, NumericRangeQuery) and not isinstance(c, DateRangeQuery)]
-
-        # Dictionary to hold merged range conditions
-        range_conditions_dict: Dict[str, Dict[str, Any]] = {}
-
-        for field_name, query in range_conditions:
-            encodable = query.encodable
-            if field_name not in range_conditions_dict:
-                range_conditions_dict[field_name] = {}
-            for key, value in encodable.items():
-                if key not in range_conditions_dict[field_name]:
-                    range_conditions_dict[field_name][key] = value
-                else:
-                    range_conditions_dict[field_name].update({key: value})
-
-        for _field_name, comparisons in range_conditions_dict.items():
-            if "start" in comparisons or "end" in comparisons:
-                conditions.append(DateRangeQuery(**comparisons))
-            else:
-                conditions.append(NumericRangeQuery(**comparisons))
-
-    return conditions
+    merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    originals: Dict[Tuple[str, str], search.SearchQuery] = {}
+    normalized: List[Union[search.SearchQuery, Tuple[str, str]]] = []
+    for query in conditions:
+        kind = _range_kind(query)
+        if kind is None:
+            normalized.append(query)
+            continue
+        key = (kind, query.encodable["field"])
+        if key not in merged:
+            merged[key] = dict(query.encodable)
+            originals[key] = query
+            normalized.append(key)
+            continue
+        intersection = _intersect_ranges(merged[key], query.encodable, kind)
+        if intersection is None:
+            normalized.append(query)
+        else:
+            merged[key] = intersection
+            originals.pop(key, None)
+
+    queries: List[search.SearchQuery] = []
+    for item in normalized:
+        if not isinstance(item, tuple):
+            queries.append(item)
+        elif item in originals:
+            queries.append(originals[item])
+        elif item[0] == "date":
+            queries.append(DateRangeQuery(**merged[item]))
+        else:
+            queries.append(NumericRangeQuery(**merged[item]))
+    return queries
+
+
+def _range_kind(query: search.SearchQuery) -> Optional[str]:
+    if isinstance(query, search.NumericRangeQuery):
+        kind = "numeric"
+    elif isinstance(query, search.DateRangeQuery):
+        kind = "date"
+    else:
+        return None
+    allowed = {"field", *(key for bound in _RANGE_BOUNDS[kind] for key in bound[:2])}
+    # ranges with other settings, e.g. a boost, are not merged
+    return kind if set(query.encodable) <= allowed else None
+
+
+def _intersect_ranges(current: Dict[str, Any], other: Dict[str, Any], kind: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the intersection of two encoded ranges of the same kind, or None if their bounds can't be compared.
+    """
+    intersection = dict(current)
+    for (bound, inclusive, default), is_lower in zip(_RANGE_BOUNDS[kind], (True, False)):
+        if bound not in other:
+            continue
+        other_inclusive = other.get(inclusive, default)
+        if bound not in intersection:
+            intersection[bound] = other[bound]
+            intersection[inclusive] = other_inclusive
+            continue
+        current_inclusive = intersection.get(inclusive, default)
+        try:
+            current_value = _bound_value(intersection[bound], kind)
+            other_value = _bound_value(other[bound], kind)
+            tighter = other_value > current_value if is_lower else other_value < current_value
+            equal = other_value == current_value
+        except (TypeError, ValueError):
+            return None
+        if equal:
+            intersection[inclusive] = current_inclusive and other_inclusive
+        elif tighter:
+            intersection[bound] = other[bound]
+            intersection[inclusive] = other_inclusive
+        else:
+            intersection[inclusive] = current_inclusive
+    return intersection
+
+
+def _bound_value(value: Any, kind: str) -> Any:
+    return datetime.fromisoformat(value) if kind == "date" else value
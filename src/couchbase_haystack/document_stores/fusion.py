@@ -0,0 +1,57 @@
+# SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
+#
+# SPDX-License-Identifier: Apache-2.0
+from typing import Callable, Dict, List, Optional, Tuple
+
+# A ranking is a list of (document id, score) pairs, best match first.
+Ranking = List[Tuple[str, float]]
+
+
+def _reciprocal_rank_fusion(rankings: List[Ranking], weights: List[float], k: int = 60) -> Ranking:
+    """
+    Fuses rankings with weighted Reciprocal Rank Fusion: each document scores `sum(weight / (k + rank))`.
+
+    Only the positions of the documents are used, so rankings with incomparable scores can be fused.
+    """
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, (id, _) in enumerate(ranking, start=1):
+            scores[id] = scores.get(id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _weighted_score_fusion(rankings: List[Ranking], weights: List[float], k: int = 60) -> Ranking:  # noqa: ARG001
+    """
+    Fuses rankings with a weighted sum of their min-max normalized scores.
+
+    A document missing from a ranking contributes 0 for that ranking.
+    """
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if not ranking:
+            continue
+        min_score = min(score for _, score in ranking)
+        max_score = max(score for _, score in ranking)
+        spread = max_score - min_score
+        for id, score in ranking:
+            normalized = (score - min_score) / spread if spread else 1.0
+            scores[id] = scores.get(id, 0.0) + weight * normalized
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+FUSION_METHODS: Dict[str, Callable[[List[Ranking], List[float], int], Ranking]] = {
+    "reciprocal_rank_fusion": _reciprocal_rank_fusion,
+    "weighted": _weighted_score_fusion,
+}
+
+
+def _fuse(rankings: List[Ranking], fusion: str, weights: Optional[List[float]] = None, k: int = 60) -> Ranking:
+    if fusion not in FUSION_METHODS:
+        msg = f"Unknown fusion method '{fusion}'. Supported methods are: {list(FUSION_METHODS.keys())}"
+        raise ValueError(msg)
+    if weights is None:
+        weights = [1.0 / len(rankings)] * len(rankings)
+    if len(weights) != len(rankings):
+        msg = f"Expected {len(rankings)} weights, got {len(weights)}"
+        raise ValueError(msg)
+    return FUSION_METHODS[fusion](rankings, weights, k)
@@ -0,0 +1,297 @@
+# SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
+#
+# SPDX-License-Identifier: Apache-2.0
+import copy
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .similarity import _validate_similarity
+
+# values of `vector_index_optimized_for`, the trade-off the search service makes when building vector indexes
+VECTOR_INDEX_OPTIMIZATIONS = ["recall", "latency", "memory-efficient"]
+
+# how meta fields are indexed, `keyword` indexes whole strings for exact matches like the Haystack `==` filter
+META_FIELD_TYPES = ["text", "keyword", "number", "boolean", "datetime"]
+
+# text fields of the Documents mapped by the index, `blob` holds bytes and is never indexed
+_TEXT_FIELDS = {"content": None, "dataframe": "keyword"}
+
+# the search service allows at most 3 replicas of an index
+_MAX_INDEX_REPLICAS = 3
+
+_MISSING = object()
+
+# settings of the mappings the search service reads as true when they are omitted from an index definition
+_TRUE_WHEN_OMITTED = {"dynamic", "enabled"}
+
+
+@dataclass
+class SearchIndexResult:
+    """
+    Outcome of creating or updating the vector search index of a document store.
+
+    :param name: Name of the search index.
+    :param action: `created` if the index did not exist, `updated` if its definition differed from the requested
+        one, `unchanged` otherwise.
+    :param changes: Paths of the definition of an existing index whose value differs from the requested one, e.g.
+        `planParams.indexPartitions`. Empty when the index is created.
+    :param applied: Whether the index was created or updated, False for a dry run or an unchanged index.
+    """
+
+    name: str
+    action: str
+    changes: List[str] = field(default_factory=list)
+    applied: bool = False
+
+    @property
+    def changed(self) -> bool:
+        return self.action != "unchanged"
+
+
+def _vector_index_definition(
+    *,
+    type_name: str,
+    vector_type: str,
+    dims: int,
+    similarity: str,
+    vector_index_optimized_for: str,
+    partitions: int,
+    replicas: int,
+    meta_fields: Optional[Dict[str, str]],
+    stored_fields: Optional[List[str]],
+    docvalues_fields: Optional[List[str]],
+    embedding_fields: Optional[Dict[str, int]],
+    meta_embedding_fields: Optional[List[str]],
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Builds the `params` and `planParams` of a search index mapping the Documents of the `type_name` collection.
+
+    `embedding`, `content` and `dataframe` are always mapped, together with the truncated `embedding_fields` and the
+    `meta_embedding_fields`, which are searched with `dims` dimensions. Without `meta_fields` the meta is mapped
+    dynamically.
+
+    :raises ValueError: If a setting is out of range or unknown, or a stored or docvalued field is not mapped.
+    """
+    _validate_similarity(similarity)
+    if vector_index_optimized_for not in VECTOR_INDEX_OPTIMIZATIONS:
+        msg = (
+            f"Unknown vector index optimization '{vector_index_optimized_for}'. "
+            f"Supported optimizations are: {VECTOR_INDEX_OPTIMIZATIONS}"
+        )
+        raise ValueError(msg)
+    if dims < 1:
+        msg = "dims must be greater than 0"
+        raise ValueError(msg)
+    if partitions < 1:
+        msg = "partitions must be greater than 0"
+        raise ValueError(msg)
+    if not 0 <= replicas <= _MAX_INDEX_REPLICAS:
+        msg = f"replicas must be between 0 and {_MAX_INDEX_REPLICAS}"
+        raise ValueError(msg)
+    for meta_field, meta_type in (meta_fields or {}).items():
+        if meta_type not in META_FIELD_TYPES:
+            msg = f"Unknown type '{meta_type}' of meta field '{meta_field}'. Supported types are: {META_FIELD_TYPES}"
+            raise ValueError(msg)
+
+    text_paths = list(_TEXT_FIELDS)
+    meta_paths = [f"meta.{meta_field}" for meta_field in meta_fields or {}]
+    vector_paths = ["embedding", *(embedding_fields or {}), *(meta_embedding_fields or [])]
+    mappable = {*text_paths, *meta_paths, *vector_paths}
+    # by default the Documents can be rebuilt from the index, see `use_search_fields`
+    stored = set(stored_fields) if stored_fields is not None else {*text_paths, *meta_paths}
+    docvalues = set(docvalues_fields or [])
+    for option, paths in (("stored_fields", stored), ("docvalues_fields", docvalues)):
+        unmapped = sorted(paths - mappable)
+        if unmapped:
+            msg = f"{option} {unmapped} are not mapped by the index, add meta fields to meta_fields first"
+            raise ValueError(msg)
+
+    properties: Dict[str, Any] = {}
+    for name, analyzer in _TEXT_FIELDS.items():
+        properties[name] = _field_mapping(_text_field(name, store=name in stored, docvalues=name in docvalues, analyzer=analyzer))
+    vector_dims = {"embedding": dims, **(embedding_fields or {}), **dict.fromkeys(meta_embedding_fields or [], dims)}
+    for name, field_dims in vector_dims.items():
+        vector_field = {
+            "name": name,
+            "type": vector_type,
+            "dims": field_dims,
+            "similarity": similarity,
+            "vector_index_optimized_for": vector_index_optimized_for,
+            "index": True,
+            "store": name in stored,
+            "docvalues": name in docvalues,
+            "include_in_all": False,
+            "include_term_vectors": False,
+        }
+        properties[name] = _field_mapping(vector_field)
+
+    meta_properties: Dict[str, Any] = {}
+    for meta_field, meta_type in (meta_fields or {}).items():
+        path = f"meta.{meta_field}"
+        if meta_type in ("text", "keyword"):
+            analyzer = "keyword" if meta_type == "keyword" else None
+            mapped = _text_field(meta_field.split(".")[-1], store=path in stored, docvalues=path in docvalues, analyzer=analyzer)
+        else:
+            mapped = {
+                "name": meta_field.split(".")[-1],
+                "type": meta_type,
+                "index": True,
+                "store": path in stored,
+                "docvalues": path in docvalues,
+                "include_in_all": False,
+            }
+        _nest_field(meta_properties, meta_field.split("."), mapped)
+    properties["meta"] = {"enabled": True, "dynamic": meta_fields is None, "properties": meta_properties}
+
+    params = {
+        "doc_config": {
+            "docid_prefix_delim": "",
+            "docid_regexp": "",
+            "mode": "scope.collection.type_field",
+            "type_field": "type",
+        },
+        "mapping": {
+            "default_analyzer": "standard",
+            "default_datetime_parser": "dateTimeOptional",
+            "index_dynamic": True,
+            # dynamically mapped meta fields are stored only if the whole Documents are
+            "store_dynamic": meta_fields is None and stored_fields is None,
+            "docvalues_dynamic": False,
+            "default_mapping": {"dynamic": True, "enabled": False},
+            "types": {type_name: {"dynamic": False, "enabled": True, "properties": properties}},
+        },
+    }
+    return params, {"indexPartitions": partitions, "numReplicas": replicas}
+
+
+def _text_field(name: str, *, store: bool, docvalues: bool, analyzer: Optional[str]) -> Dict[str, Any]:
+    text_field = {
+        "name": name,
+        "type": "text",
+        "index": True,
+        "store": store,
+        "docvalues": docvalues,
+        "include_in_all": False,
+        "include_term_vectors": False,
+    }
+    if analyzer is not None:
+        text_field["analyzer"] = analyzer
+    return text_field
+
+
+def _field_mapping(mapped_field: Dict[str, Any]) -> Dict[str, Any]:
+    return {"enabled": True, "dynamic": False, "fields": [mapped_field]}
+
+
+def _nest_field(properties: Dict[str, Any], path: List[str], mapped_field: Dict[str, Any]) -> None:
+    """
+    Adds the mapping of a field at a dotted `path`, e.g. `author.name`, creating the parent object mappings.
+    """
+    *parents, leaf = path
+    for parent in parents:
+        properties = properties.setdefault(parent, {"enabled": True, "dynamic": False, "properties": {}})["properties"]
+    properties[leaf] = _field_mapping(mapped_field)
+
+
+def _merge_index_definition(
+    params: Dict[str, Any], plan_params: Dict[str, Any], desired_params: Dict[str, Any], desired_plan: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Applies the requested definition to the definition of an existing index.
+
+    Only the settings managed by the document store are replaced: the document config, the mapping options and the
+    type mapping of the collection. Other type mappings and settings of the index, such as its store options, are
+    kept, so an unchanged request yields the existing definition.
+    """
+    merged_params = copy.deepcopy(params)
+    merged_params["doc_config"] = desired_params["doc_config"]
+    mapping = merged_params.setdefault("mapping", {})
+    types = mapping.setdefault("types", {})
+    for key, value in desired_params["mapping"].items():
+        if key == "types":
+            types.update(value)
+        else:
+            mapping[key] = value
+
+    merged_plan = {**plan_params, **desired_plan}
+    if plan_params.get("indexPartitions") != desired_plan["indexPartitions"]:
+        # the search service derives it from the number of partitions, a stale value would override them
+        merged_plan.pop("maxPartitionsPerPIndex", None)
+    return merged_params, merged_plan
+
+
+def _definition_changes(current: Any, desired: Any) -> List[str]:
+    """
+    Returns the dotted paths whose value differs between two index definitions. Lists are compared as a whole.
+
+    `None` and empty values are ignored on both sides. The search service omits the false and zero settings of the
+    definitions it returns, e.g. `"store": false`, so a setting missing from `current` matches a false or zero
+    desired value, except `dynamic` and `enabled`, which the service reads as true when omitted.
+    """
+    return _changed_paths(_without_empty_values(current), _without_empty_values(desired), "")
+
+
+def _without_empty_values(value: Any) -> Any:
+    if isinstance(value, dict):
+        kept = {key: _without_empty_values(child) for key, child in value.items()}
+        return {key: child for key, child in kept.items() if child is not None and child not in ({}, [])}
+    if isinstance(value, list):
+        return [_without_empty_values(item) for item in value]
+    return value
+
+
+def _changed_paths(current: Any, desired: Any, path: str) -> List[str]:
+    if isinstance(current, dict) and isinstance(desired, dict):
+        changes: List[str] = []
+        for key in sorted({*current, *desired}):
+            child = f"{path}.{key}" if path else key
+            changes.extend(_changed_paths(_current_value(current, key, desired.get(key)), desired.get(key, _MISSING), child))
+        return changes
+    if isinstance(current, list) and isinstance(desired, list) and len(current) == len(desired):
+        return [] if all(not _changed_paths(*items, path) for items in zip(current, desired)) else [path]
+    return [] if current == desired else [path]
+
+
+def _current_value(current: Dict[str, Any], key: str, desired: Any) -> Any:
+    """
+    Returns the value of `key` in the existing definition, with the false or zero value the service omitted.
+    """
+    if key in current:
+        return current[key]
+    if key not in _TRUE_WHEN_OMITTED and desired is not None and not isinstance(desired, (dict, list)) and not desired:
+        return desired
+    return _MISSING
+
+
+def _stored_paths(params: Dict[str, Any], type_name: str) -> Dict[str, bool]:
+    """
+    Returns the document paths mapped by a search index for the `type_name` collection, with whether their whole
+    value is stored in the index.
+
+    The empty path stands for the documents themselves, it is only included if they are mapped dynamically.
+    """
+    mapping = params.get("mapping") or {}
+    document_mapping = (mapping.get("types") or {}).get(type_name, mapping.get("default_mapping") or {})
+    paths: Dict[str, bool] = {}
+    if document_mapping.get("enabled", True):
+        _collect_stored_paths(document_mapping, "", paths, store_dynamic=bool(mapping.get("store_dynamic")))
+        if not document_mapping.get("dynamic"):
+            del paths[""]
+    return paths
+
+
+def _collect_stored_paths(
+    document_mapping: Dict[str, Any], path: str, paths: Dict[str, bool], *, store_dynamic: bool
+) -> bool:
+    stored = all(mapped_field.get("store") for mapped_field in document_mapping.get("fields") or [])
+    if document_mapping.get("dynamic"):
+        # dynamically mapped fields are stored only if the index stores them all
+        stored = stored and store_dynamic
+    for name, child in (document_mapping.get("properties") or {}).items():
+        if not child.get("enabled", True):
+            stored = False
+            continue
+        child_path = f"{path}.{name}" if path else name
+        stored = _collect_stored_paths(child, child_path, paths, store_dynamic=store_dynamic) and stored
+    paths[path] = stored
+    return stored
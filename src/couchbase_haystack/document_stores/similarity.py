@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
+#
+# SPDX-License-Identifier: Apache-2.0
+from dataclasses import replace
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from haystack.dataclasses import Document
+
+# similarities the candidates of a vector search can be rescored with, named like the metrics of the vector indexes
+SIMILARITY_FUNCTIONS = ["cosine", "dot_product", "l2_norm"]
+
+
+def _validate_similarity(similarity: str) -> None:
+    if similarity not in SIMILARITY_FUNCTIONS:
+        msg = f"Unknown similarity '{similarity}'. Supported similarities are: {SIMILARITY_FUNCTIONS}"
+        raise ValueError(msg)
+
+
+def _validate_mmr_lambda(mmr_lambda: float) -> None:
+    if not 0 <= mmr_lambda <= 1:
+        msg = "mmr_lambda must be between 0 and 1"
+        raise ValueError(msg)
+
+
+def _similarity_scores(query: Sequence[float], embeddings: np.ndarray, similarity: str) -> np.ndarray:
+    """
+    Computes the similarity of `query` to each row of `embeddings` with a single matrix-vector product.
+
+    `l2_norm` scores are the negated Euclidean distance, so a higher score always means more similar. Zero vectors
+    have a cosine similarity of 0.
+    """
+    q = np.asarray(query, dtype=np.float64)
+    dots = embeddings @ q
+    if similarity == "dot_product":
+        return dots
+    norms = np.einsum("ij,ij->i", embeddings, embeddings)
+    if similarity == "l2_norm":
+        return -np.sqrt(np.maximum(norms - 2 * dots + q @ q, 0.0))
+    denominators = np.sqrt(norms) * np.linalg.norm(q)
+    return np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators > 0)
+
+
+def _pairwise_similarities(embeddings: np.ndarray, similarity: str) -> np.ndarray:
+    """
+    Computes the similarity matrix of the rows of `embeddings` with a single matrix product.
+    """
+    gram = embeddings @ embeddings.T
+    if similarity == "dot_product":
+        return gram
+    norms = np.diag(gram)
+    if similarity == "l2_norm":
+        return -np.sqrt(np.maximum(norms[:, None] + norms[None, :] - 2 * gram, 0.0))
+    lengths = np.sqrt(norms)
+    denominators = np.outer(lengths, lengths)
+    return np.divide(gram, denominators, out=np.zeros_like(gram), where=denominators > 0)
+
+
+def _embedding_matrix(documents: List[Document], dimension: int) -> Tuple[List[int], Optional[np.ndarray]]:
+    """
+    Stacks the embeddings of `documents` that have `dimension` values into a matrix.
+
+    :returns: The positions of the stacked Documents and the matrix, None if no Document has a usable embedding.
+    """
+    rows = [i for i, doc in enumerate(documents) if doc.embedding is not None and len(doc.embedding) == dimension]
+    if not rows:
+        return rows, None
+    return rows, np.asarray([documents[i].embedding for i in rows], dtype=np.float64)
+
+
+def _rerank_documents(
+    query_embedding: Sequence[float], documents: List[Document], top_k: int, similarity: str
+) -> List[Document]:
+    """
+    Re-sorts the candidates of a vector search by their exact similarity to `query_embedding` and keeps `top_k`.
+
+    The `score` of the reranked Documents is their exact similarity. Candidates without an embedding of the query
+    dimension can't be rescored, they are kept after the others in their original order.
+    """
+    rows, matrix = _embedding_matrix(documents, len(query_embedding))
+    if matrix is None:
+        return documents[:top_k]
+    scores = _similarity_scores(query_embedding, matrix, similarity)
+    # a stable sort keeps the order of the vector search between ties
+    order = np.argsort(-scores, kind="stable")
+    reranked = [replace(documents[rows[j]], score=float(scores[j])) for j in order[:top_k]]
+    if len(reranked) < top_k:
+        scored = set(rows)
+        reranked.extend(doc for i, doc in enumerate(documents) if i not in scored)
+    return reranked[:top_k]
+
+
+def _mmr_documents(
+    query_embedding: Sequence[float], documents: List[Document], top_k: int, lambda_mult: float, similarity: str
+) -> List[Document]:
+    """
+    Selects `top_k` of the candidates of a vector search with Maximal Marginal Relevance.
+
+    Each step picks the candidate maximizing `lambda_mult * sim(query, d) - (1 - lambda_mult) * max sim(d, selected)`,
+    so a `lambda_mult` of 1 ranks by relevance only and lower values favour candidates unlike the ones already
+    selected. The similarities are computed once as a matrix, each step only updates a vector of the highest
+    similarity of every candidate to the selection. The `score` of the selected Documents is their exact similarity to
+    the query. Candidates without an embedding of the query dimension are kept after the others.
+    """
+    rows, matrix = _embedding_matrix(documents, len(query_embedding))
+    if matrix is None:
+        return documents[:top_k]
+    relevance = _similarity_scores(query_embedding, matrix, similarity)
+    pairwise = _pairwise_similarities(matrix, similarity)
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = pairwise[selected[0]].copy()
+    available = np.ones(len(rows), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < min(top_k, len(rows)):
+        marginal_relevance = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        marginal_relevance[~available] = -np.inf
+        best = int(np.argmax(marginal_relevance))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+
+    diversified = [replace(documents[rows[j]], score=float(relevance[j])) for j in selected]
+    if len(diversified) < top_k:
+        scored = set(rows)
+        diversified.extend(doc for i, doc in enumerate(documents) if i not in scored)
+    return diversified[:top_k]
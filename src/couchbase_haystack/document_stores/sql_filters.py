@@ -0,0 +1,212 @@
+# SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
+#
+# SPDX-License-Identifier: Apache-2.0
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from haystack.errors import FilterError
+from pandas import DataFrame
+
+from .filters import _is_iso_date, _simplify_filters
+
+# an index key on a plain document path, e.g. "`meta`.`tenant`" or "(`meta`.`year` DESC)"
+_INDEX_KEY_PATH = re.compile(r"^\(?((?:`[^`]+`|\w+)(?:\.(?:`[^`]+`|\w+))*)(?:\s+(?:ASC|DESC))?\)?$", re.IGNORECASE)
+
+# comparisons a scan of a GSI index on the field can serve
+_SARGABLE_OPERATORS = {"==", ">", ">=", "<", "<=", "in"}
+
+
+class _SqlParameters:
+    """
+    Collects the values of a SQL++ expression as named parameters, so values are never inlined in the statement.
+    """
+
+    def __init__(self) -> None:
+        self.values: Dict[str, Any] = {}
+
+    def add(self, value: Any) -> str:
+        name = f"f{len(self.values)}"
+        self.values[name] = value
+        return f"${name}"
+
+
+def _normalize_filters_sql(filters: Dict[str, Any], alias: str = "d") -> Tuple[str, Dict[str, Any]]:
+    """
+    Converts Haystack filters into a SQL++ `WHERE` expression on the documents bound to `alias`.
+
+    Follows the Haystack filter semantics, e.g. `!=` and `not in` match the documents without the field.
+
+    :returns: The expression and its named parameters.
+    """
+    if not isinstance(filters, dict):
+        msg = "Filters must be a dictionary"
+        raise FilterError(msg)
+    parameters = _SqlParameters()
+    return _parse_condition(_simplify_filters(filters), alias, parameters), parameters.values
+
+
+def _filter_fields(filters: Dict[str, Any]) -> Set[str]:
+    """
+    Returns the fields compared by `filters`, at any depth.
+    """
+    if "field" in filters:
+        return {filters["field"]}
+    return {field for condition in filters.get("conditions", []) for field in _filter_fields(condition)}
+
+
+def _is_sargable(filters: Dict[str, Any]) -> bool:
+    """
+    Returns whether every comparison of `filters` can be served by a scan of a GSI index on its field.
+
+    `!=`, `not in` and `NOT` also match the documents without the field, which are not in the index, and so do the
+    comparisons with `None`, so they need a full scan. `==` with a list matches the fields containing all the values,
+    which a scan on the field can't serve either.
+    """
+    if "field" in filters:
+        value = filters.get("value")
+        if filters.get("operator") == "==" and isinstance(value, list):
+            return False
+        return filters.get("operator") in _SARGABLE_OPERATORS and value is not None
+    conditions = filters.get("conditions")
+    if filters.get("operator") not in ("AND", "OR") or not isinstance(conditions, list) or not conditions:
+        return False
+    return all(isinstance(condition, dict) and _is_sargable(condition) for condition in conditions)
+
+
+def _index_key_field(index_key: str) -> Optional[str]:
+    """
+    Returns the document path a GSI index key is on, e.g. `meta.tenant`, or None for expressions and array keys.
+    """
+    match = _INDEX_KEY_PATH.match(index_key.strip())
+    if match is None:
+        return None
+    return match.group(1).replace("`", "")
+
+
+def _indexed_fields(index_keys: Iterable[str]) -> Set[str]:
+    fields = {_index_key_field(key) for key in index_keys}
+    fields.discard(None)
+    return fields  # type: ignore[return-value]
+
+
+def _parse_condition(condition: Dict[str, Any], alias: str, parameters: _SqlParameters) -> str:
+    if "field" in condition:
+        return _parse_comparison_condition(condition, alias, parameters)
+    return _parse_logical_condition(condition, alias, parameters)
+
+
+def _parse_logical_condition(condition: Dict[str, Any], alias: str, parameters: _SqlParameters) -> str:
+    if "operator" not in condition:
+        msg = f"'operator' key missing in {condition}"
+        raise FilterError(msg)
+    if "conditions" not in condition:
+        msg = f"'conditions' key missing in {condition}"
+        raise FilterError(msg)
+
+    operator = condition["operator"]
+    if operator not in ("AND", "OR", "NOT"):
+        msg = f"Unknown logical operator '{operator}'"
+        raise FilterError(msg)
+    if not condition["conditions"]:
+        # like an empty conjunction or disjunction of the search service, no document matches
+        return "FALSE"
+    conditions = [_parse_condition(c, alias, parameters) for c in condition["conditions"]]
+    if operator == "OR":
+        return "(" + " OR ".join(conditions) + ")"
+    conjunction = "(" + " AND ".join(conditions) + ")"
+    if operator == "NOT":
+        # a comparison on a missing field evaluates to MISSING, which NOT would keep excluded
+        return f"NOT IFMISSINGORNULL({conjunction}, FALSE)"
+    return conjunction
+
+
+def _parse_comparison_condition(condition: Dict[str, Any], alias: str, parameters: _SqlParameters) -> str:
+    if "operator" not in condition:
+        msg = f"'operator' key missing in {condition}"
+        raise FilterError(msg)
+    if "value" not in condition:
+        msg = f"'value' key missing in {condition}"
+        raise FilterError(msg)
+    operator: str = condition["operator"]
+    if operator not in SQL_COMPARISON_OPERATORS:
+        msg = f"Unknown comparison operator '{operator}'"
+        raise FilterError(msg)
+    value: Any = condition["value"]
+    if isinstance(value, DataFrame):
+        value = value.to_json()
+    return SQL_COMPARISON_OPERATORS[operator](_field_path(condition["field"], alias), value, parameters)
+
+
+def _field_path(field: str, alias: str) -> str:
+    if "`" in field:
+        msg = f"Invalid field name '{field}'"
+        raise FilterError(msg)
+    return ".".join(f"`{part}`" for part in [alias, *field.split(".")])
+
+
+def _equal(path: str, value: Any, parameters: _SqlParameters) -> str:
+    if value is None:
+        return f"{path} IS NOT VALUED"
+    if isinstance(value, list):
+        return _contains_all(path, value, parameters)
+    return f"{path} = {parameters.add(value)}"
+
+
+def _not_equal(path: str, value: Any, parameters: _SqlParameters) -> str:
+    if value is None:
+        return f"{path} IS VALUED"
+    if isinstance(value, list):
+        return f"({path} IS NOT VALUED OR NOT {_contains_all(path, value, parameters)})"
+    return f"({path} IS NOT VALUED OR {path} != {parameters.add(value)})"
+
+
+def _contains_all(path: str, values: List[Any], parameters: _SqlParameters) -> str:
+    # like the search service, a list matches the fields holding all its values, a single value or an array of them
+    return f"(EVERY v IN {parameters.add(values)} SATISFIES v IN TOARRAY({path}) END)"
+
+
+def _range(sql_operator: str) -> Callable[[str, Any, _SqlParameters], str]:
+    def compare(path: str, value: Any, parameters: _SqlParameters) -> str:
+        if value is None:
+            return "FALSE"
+        if isinstance(value, str):
+            if not _is_iso_date(value):
+                msg = (
+                    "Can't compare strings using operators '>', '>=', '<', '<='. "
+                    "Strings are only comparable if they are ISO formatted dates."
+                )
+                raise FilterError(msg)
+            # compared as strings so an index on the field can serve the range, the dates must share a time zone
+            return f"{path} {sql_operator} {parameters.add(value)}"
+        if type(value) in [list, DataFrame]:
+            msg = f"Filter value can't be of type {type(value)} using operators '>', '>=', '<', '<='"
+            raise FilterError(msg)
+        return f"{path} {sql_operator} {parameters.add(value)}"
+
+    return compare
+
+
+def _in(path: str, value: Any, parameters: _SqlParameters) -> str:
+    if not isinstance(value, list):
+        msg = f"{path}'s value must be a list when using 'in' or 'not in' comparators"
+        raise FilterError(msg)
+    return f"{path} IN {parameters.add(value)}"
+
+
+def _not_in(path: str, value: List[Any], parameters: _SqlParameters) -> str:
+    if not isinstance(value, list):
+        msg = f"{path}'s value must be a list when using 'in' or 'not in' comparators"
+        raise FilterError(msg)
+    return f"({path} IS NOT VALUED OR {path} NOT IN {parameters.add(value)})"
+
+
+SQL_COMPARISON_OPERATORS: Dict[str, Callable[[str, Any, _SqlParameters], str]] = {
+    "==": _equal,
+    "!=": _not_equal,
+    ">": _range(">"),
+    ">=": _range(">="),
+    "<": _range("<"),
+    "<=": _range("<="),
+    "in": _in,
+    "not in": _not_in,
+}
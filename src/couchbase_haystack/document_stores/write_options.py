@@ -0,0 +1,160 @@
+# SPDX-FileCopyrightText: 2023-present deepset GmbH <info@deepset.ai>
+#
+# SPDX-License-Identifier: Apache-2.0
+import time
+from datetime import datetime, timedelta
+from typing import Any, ClassVar, Dict, List, Optional, Union, overload
+
+from couchbase.durability import DurabilityLevel, ServerDurability
+from haystack import default_from_dict, default_to_dict
+from haystack.document_stores.types import DuplicatePolicy
+
+
+class CouchbaseWriteOptions(dict):
+    """
+    Key-value options applied when documents are written, see the Couchbase `InsertMultiOptions` and
+    `UpsertMultiOptions`.
+
+    Options left unset use the defaults of the cluster, e.g. no durability requirement and the `kv_timeout`
+    of the cluster options. The outcome of every write is always reported per document, so the `return_exceptions`
+    option of the SDK is not exposed.
+    """
+
+    __timedelta_fields: ClassVar[List[str]] = ["expiry", "timeout"]
+    __direct_fields: ClassVar[List[str]] = ["preserve_expiry"]
+
+    @overload
+    def __init__(
+        self,
+        *,
+        durability: Optional[Union[DurabilityLevel, str]] = None,
+        expiry: Optional[timedelta] = None,
+        timeout: Optional[timedelta] = None,
+        preserve_expiry: Optional[bool] = None,
+    ):
+        """WriteOptions instance."""
+
+    @overload
+    def __init__(self, **kwargs):
+        """WriteOptions instance."""
+
+    def __init__(self, **kwargs):
+        """
+        Creates the write options.
+
+        :param durability: Durability level the server must reach before acknowledging a write, a `DurabilityLevel`
+            or its name, e.g. `"majority"`. `majority` waits for the replicas to hold the mutation in memory,
+            `persist_to_majority` for them to persist it to disk.
+        :param expiry: Time after which the written documents are removed by Couchbase.
+        :param timeout: Timeout of each write operation.
+        :param preserve_expiry: Whether overwriting a document keeps its existing expiry. Only applies to
+            `DuplicatePolicy.OVERWRITE`.
+        :raises ValueError: If `durability` is not a known durability level.
+        """
+        durability = kwargs.get("durability")
+        if isinstance(durability, str):
+            try:
+                kwargs["durability"] = DurabilityLevel[durability.upper()]
+            except KeyError:
+                levels = [level.name.lower() for level in DurabilityLevel]
+                msg = f"Unknown durability level '{durability}'. Supported levels are: {levels}"
+                raise ValueError(msg) from None
+        super().__init__(**{k: v for k, v in kwargs.items() if v is not None})
+
+    def merge(self, other: Optional["CouchbaseWriteOptions"]) -> "CouchbaseWriteOptions":
+        """
+        Returns these options overridden by the options set in `other`.
+        """
+        if not other:
+            return self
+        return CouchbaseWriteOptions(**{**self, **other})
+
+    def get_multi_options(self, policy: DuplicatePolicy) -> Dict[str, Any]:
+        """
+        Returns the keyword arguments of `insert_multi`, or `upsert_multi` when `policy` overwrites documents.
+        """
+        options = self.get_options(policy)
+        # otherwise the first failure raises for the whole batch, and the documents it wrote would be retried
+        options["return_exceptions"] = True
+        return options
+
+    def get_options(self, policy: DuplicatePolicy) -> Dict[str, Any]:
+        """
+        Returns the keyword arguments of a single `insert`, or `upsert` when `policy` overwrites documents.
+        """
+        options: Dict[str, Any] = {}
+        durability = self.get("durability")
+        if durability is not None and durability != DurabilityLevel.NONE:
+            options["durability"] = ServerDurability(durability)
+        for f in CouchbaseWriteOptions.__timedelta_fields:
+            if self.get(f) is not None:
+                options[f] = self[f]
+        if policy != DuplicatePolicy.FAIL and self.get("preserve_expiry") is not None:
+            options["preserve_expiry"] = self["preserve_expiry"]
+        return options
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serializes the component to a dictionary.
+
+        :returns:
+            Dictionary with serialized data.
+        """
+        obj: Dict[str, Any] = {}
+        if self.get("durability") is not None:
+            obj["durability"] = self["durability"].name.lower()
+        for f in CouchbaseWriteOptions.__timedelta_fields:
+            delta_val: Optional[timedelta] = self.get(f)
+            if delta_val is not None:
+                obj[f] = delta_val.total_seconds()
+        for f in CouchbaseWriteOptions.__direct_fields:
+            if self.get(f) is not None:
+                obj[f] = self[f]
+        return default_to_dict(self, **obj)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CouchbaseWriteOptions":
+        """
+        Deserializes the component from a dictionary.
+
+        :param data:
+            Dictionary to deserialize from.
+        :returns:
+              Deserialized component.
+        """
+        obj = dict(data["init_parameters"])
+        for f in CouchbaseWriteOptions.__timedelta_fields:
+            if obj.get(f) is not None:
+                obj[f] = timedelta(seconds=obj[f])
+        return default_from_dict(cls, {**data, "init_parameters": obj})
+
+
+def _expiry_from_meta(value: Any) -> timedelta:
+    """
+    Converts the expiry stored in the meta of a Document to the expiry of its write.
+
+    Numbers are a time to live in seconds, `datetime` objects and ISO 8601 strings an absolute expiry time, naive
+    ones in local time. Absolute times that already passed expire the document right away.
+
+    :raises ValueError: If the value is of an unsupported type, not a valid ISO 8601 string or not positive.
+    """
+    if isinstance(value, timedelta):
+        ttl = value.total_seconds()
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        ttl = float(value)
+    elif isinstance(value, (datetime, str)):
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                msg = f"Invalid expiry '{value}', expected an ISO 8601 date and time"
+                raise ValueError(msg) from None
+        # an expiry of 0 means no expiry, so a past expiry time becomes the shortest expiry possible
+        return timedelta(seconds=max(1, int(value.timestamp() - time.time())))
+    else:
+        msg = f"Invalid expiry '{value}', expected a number of seconds, a datetime or an ISO 8601 string"
+        raise ValueError(msg)
+    if ttl <= 0:
+        msg = f"Invalid expiry '{value}', the number of seconds must be greater than 0"
+        raise ValueError(msg)
+    return timedelta(seconds=ttl)
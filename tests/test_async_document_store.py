@@ -0,0 +1,244 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from typing import Any, Dict
+
+import pytest
+from couchbase.exceptions import DocumentExistsException, DocumentNotFoundException, TemporaryFailException
+from couchbase.management.logic.collections_logic import ScopeSpec, CollectionSpec
+from haystack.dataclasses.document import Document
+from haystack.document_stores.errors import DocumentStoreError, DuplicateDocumentError
+from haystack.utils import Secret
+
+from couchbase_haystack import (
+    AsyncCouchbaseDocumentStore,
+    CouchbaseEmbeddingRetriever,
+    CouchbasePasswordAuthenticator,
+    DeleteResult,
+)
+
+
+class Row:
+    def __init__(self, id: str, score: int = 1):
+        self.id = id
+        self.score = score
+
+
+class AsyncSearchResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    async def rows(self):
+        for row in self._rows:
+            yield row
+
+
+class GetResult:
+    def __init__(self, value: Dict[str, Any]):
+        self.value = value
+
+
+@pytest.mark.unit
+class TestAsyncDocumentStoreUnit:
+    @pytest.fixture
+    def document_store(self, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        with patch("couchbase_haystack.document_stores.async_document_store.AsyncCluster") as mock_cb_cluster:
+            cluster = MagicMock()
+            cluster.wait_until_ready = AsyncMock()
+            mock_cb_cluster.connect = AsyncMock(return_value=cluster)
+            bucket = cluster.bucket.return_value
+            bucket.on_connect = AsyncMock()
+            bucket.collections.return_value.get_all_scopes = AsyncMock(
+                return_value=[ScopeSpec("haystack_test_scope", [CollectionSpec(collection_name="haystack_collection")])]
+            )
+            store = AsyncCouchbaseDocumentStore(
+                cluster_connection_string=Secret.from_env_var("CONNECTION_STRING"),
+                authenticator=CouchbasePasswordAuthenticator(
+                    username=Secret.from_env_var("USER_NAME"), password=Secret.from_env_var("PASSWORD")
+                ),
+                bucket="haystack_integration_test",
+                scope="haystack_test_scope",
+                collection="haystack_collection",
+                vector_search_index="vector_search",
+            )
+            yield store, bucket.scope.return_value
+
+    def test_to_dict_from_dict(self, document_store):
+        store, _ = document_store
+        serialized = store.to_dict()
+        assert serialized["type"] == "couchbase_haystack.document_stores.async_document_store.AsyncCouchbaseDocumentStore"
+        restored = AsyncCouchbaseDocumentStore.from_dict(serialized)
+        assert isinstance(restored, AsyncCouchbaseDocumentStore)
+        assert restored.vector_search_index == "vector_search"
+
+    def test_embedding_retrieval_async(self, document_store):
+        store, scope = document_store
+        scope.search.return_value = AsyncSearchResult([Row(id="1a", score=0.9), Row(id="2b", score=0.5)])
+        collection = scope.collection.return_value
+        values = {"1a": {"content": "one"}, "2b": {"content": "two"}}
+        collection.get = AsyncMock(side_effect=lambda id: GetResult(values[id]))
+
+        docs = asyncio.run(store._embedding_retrieval_async(query_embedding=[0.1, 0.2], top_k=2))
+
+        assert docs == [Document(id="1a", content="one", score=0.9), Document(id="2b", content="two", score=0.5)]
+
+    def test_embedding_retrieval_async_mmr(self, document_store):
+        store, scope = document_store
+        scope.search.return_value = AsyncSearchResult(
+            [Row(id="1a", score=0.9), Row(id="1b", score=0.9), Row(id="2c", score=0.5)]
+        )
+        collection = scope.collection.return_value
+        values = {
+            "1a": {"content": "one", "embedding": [1.0, 0.0]},
+            "1b": {"content": "one again", "embedding": [1.0, 0.01]},
+            "2c": {"content": "two", "embedding": [0.6, 0.8]},
+        }
+        collection.get = AsyncMock(side_effect=lambda id: GetResult(values[id]))
+
+        docs = asyncio.run(store._embedding_retrieval_async(query_embedding=[1.0, 0.0], top_k=2, mmr_lambda=0.3))
+
+        _, request, options = scope.search.call_args.args
+        assert request.vector_search.queries[0].num_candidates == 8
+        assert options["limit"] == 8
+        assert [doc.id for doc in docs] == ["1a", "2c"]
+        assert [doc.score for doc in docs] == pytest.approx([1.0, 0.6])
+
+    def test_write_documents_async_duplicate(self, document_store):
+        store, scope = document_store
+        collection = scope.collection.return_value
+
+        async def insert(id, _doc):
+            if id == "2":
+                raise DocumentExistsException()
+
+        collection.insert = AsyncMock(side_effect=insert)
+        documents = [Document(id="1", content="one"), Document(id="2", content="two")]
+
+        assert asyncio.run(store.write_documents_async(documents[:1])) == 1
+        with pytest.raises(DuplicateDocumentError):
+            asyncio.run(store.write_documents_async(documents))
+
+    def test_retriever_run_async(self, document_store):
+        store, scope = document_store
+        scope.search.return_value = AsyncSearchResult([Row(id="1a")])
+        scope.collection.return_value.get = AsyncMock(return_value=GetResult({"content": "text"}))
+        retriever = CouchbaseEmbeddingRetriever(document_store=store, top_k=3)
+
+        result = asyncio.run(retriever.run_async(query_embedding=[0.1, 0.2]))
+
+        assert result == {"documents": [Document(id="1a", content="text", score=1)]}
+
+    def test_delete_by_filter_async(self, document_store):
+        store, scope = document_store
+        scope.search.side_effect = [
+            AsyncSearchResult([Row(id="1"), Row(id="2")]),
+            AsyncSearchResult([Row(id="3")]),
+        ]
+
+        async def remove(id):
+            if id == "3":
+                raise DocumentNotFoundException()
+
+        scope.collection.return_value.remove = AsyncMock(side_effect=remove)
+
+        result = asyncio.run(
+            store.delete_by_filter_async({"field": "meta.tenant", "operator": "==", "value": "acme"}, batch_size=2)
+        )
+
+        assert result == DeleteResult(deleted=2, not_found=1)
+        assert scope.search.call_args_list[1].args[2]["raw"] == {"search_after": ["2"]}
+
+    def test_document_cache_async(self, document_store):
+        store, scope = document_store
+        data = store.to_dict()
+        data["init_parameters"]["document_cache_size"] = 8
+        data["init_parameters"]["meta_embedding_fields"] = ["title_embedding"]
+        store = AsyncCouchbaseDocumentStore.from_dict(data)
+        collection = scope.collection.return_value
+        value = {"content": "one", "embedding": [0.1, 0.2], "title_embedding": [1.0, 0.0]}
+        collection.get = AsyncMock(return_value=GetResult(value))
+        scope.search.return_value = AsyncSearchResult([Row(id="1a")])
+
+        docs = asyncio.run(store._embedding_retrieval_async(query_embedding=[0.1, 0.2]))
+        assert docs[0].meta == {"title_embedding": [1.0, 0.0]}
+
+        # a cached hit is projected like a key-value lookup, which does not fetch the named embeddings
+        scope.search.return_value = AsyncSearchResult([Row(id="1a")])
+        docs = asyncio.run(store._embedding_retrieval_async(query_embedding=[0.3, 0.4], return_embedding=False))
+        assert docs == [Document(id="1a", content="one", score=1)]
+        assert store.document_cache_info().hits == 1
+
+        # filter scans neither read nor fill the cache
+        scope.search.return_value = AsyncSearchResult([Row(id="1a"), Row(id="2b")])
+        docs = asyncio.run(store.filter_documents_async({"field": "meta.tenant", "operator": "==", "value": "acme"}))
+        assert collection.get.call_count == 3
+        assert [doc.id for doc in docs] == ["1a", "2b"]
+        assert store.document_cache_info().hits == 1
+        assert store.document_cache_info().currsize == 1
+
+    def test_delete_documents_async(self, document_store):
+        store, scope = document_store
+        removed = []
+
+        async def remove(id):
+            removed.append(id)
+            if id == "2":
+                raise DocumentNotFoundException()
+            if id == "3":
+                raise TemporaryFailException()
+
+        scope.collection.return_value.remove = AsyncMock(side_effect=remove)
+
+        asyncio.run(store.delete_documents_async(["1", "2"], batch_size=1))
+        assert removed == ["1", "2"]
+        with pytest.raises(DocumentStoreError, match="1 of 2 documents were deleted"):
+            asyncio.run(store.delete_documents_async(["1", "3"]))
+
+    def test_filter_documents_async_sql(self, document_store):
+        store, scope = document_store
+        store.filter_backend = "sql"
+
+        async def rows():
+            yield {"__id": "1", "content": "one"}
+
+        scope.query.return_value.rows = rows
+
+        docs = asyncio.run(store.filter_documents_async({"field": "meta.tenant", "operator": "==", "value": "acme"}))
+
+        assert docs == [Document(id="1", content="one")]
+        scope.search.assert_not_called()
+
+    def test_filter_documents_iter_async_sql_pages(self, document_store):
+        store, scope = document_store
+        store.filter_backend = "sql"
+        fetched = []
+
+        async def rows():
+            for i in range(5):
+                fetched.append(i)
+                yield {"__id": str(i), "content": str(i)}
+
+        scope.query.return_value.rows = rows
+
+        async def first_page():
+            iterator = store.filter_documents_iter_async(page_size=2)
+            first = await iterator.__anext__()
+            # the first page is decoded before the rest of the rows are read
+            assert fetched == [0, 1]
+            return [first] + [doc async for doc in iterator]
+
+        docs = asyncio.run(first_page())
+        assert [doc.id for doc in docs] == ["0", "1", "2", "3", "4"]
+        assert fetched == [0, 1, 2, 3, 4]
+
+    def test_close_async_resets_lock(self, document_store):
+        store, _ = document_store
+        asyncio.run(store._get_async_scope())
+        assert store._async_lock is not None
+        store._async_connection.close = AsyncMock()
+
+        asyncio.run(store.close_async())
+        assert store._async_lock is None
+        asyncio.run(store._get_async_scope())
@@ -0,0 +1,44 @@
+from unittest.mock import patch
+
+import pytest
+
+from couchbase_haystack.document_stores.cache import CacheInfo, _LRUCache
+
+
+@pytest.mark.unit
+class TestLRUCache:
+    def test_lru_eviction(self):
+        cache = _LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.info() == CacheInfo(hits=3, misses=1, maxsize=2, currsize=2)
+
+    def test_ttl(self):
+        cache = _LRUCache(maxsize=2, ttl=10)
+        with patch("couchbase_haystack.document_stores.cache.time.monotonic", return_value=100.0):
+            cache.put("a", 1)
+        with patch("couchbase_haystack.document_stores.cache.time.monotonic", return_value=105.0):
+            assert cache.get("a") == 1
+        with patch("couchbase_haystack.document_stores.cache.time.monotonic", return_value=111.0):
+            assert cache.get("a") is None
+        assert cache.info().currsize == 0
+
+    def test_put_from_previous_generation_is_dropped(self):
+        cache = _LRUCache(maxsize=2)
+        generation = cache.generation
+        cache.clear()
+        cache.put("a", 1, generation)
+
+        assert cache.get("a") is None
+
+    def test_invalid_settings(self):
+        with pytest.raises(ValueError):
+            _LRUCache(maxsize=0)
+        with pytest.raises(ValueError):
+            _LRUCache(maxsize=1, ttl=0)
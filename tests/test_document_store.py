@@ -2,7 +2,9 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 import os
+from dataclasses import replace
 
+import numpy as np
 from unittest.mock import MagicMock, Mock, patch
 from uuid import uuid1
 import time
@@ -11,10 +13,11 @@ from typing import List, Dict, Any, Optional
 from haystack.dataclasses.document import ByteStream, Document
 from haystack.testing.document_store import DocumentStoreBaseTests
 from haystack.utils import Secret
-from couchbase_haystack import CouchbaseDocumentStore
+from couchbase_haystack import CacheInfo, CouchbaseDocumentStore, CouchbaseWriteOptions, DeleteResult, SearchIndexResult
+from couchbase.durability import DurabilityLevel
 from pandas import DataFrame
 from couchbase.cluster import Cluster, ClusterOptions
-from couchbase.options import ClusterOptions, KnownConfigProfiles
+from couchbase.options import ClusterOptions, InsertOptions, KnownConfigProfiles
 from couchbase.auth import PasswordAuthenticator
 from couchbase_haystack import CouchbaseClusterOptions
 from couchbase_haystack import CouchbasePasswordAuthenticator
@@ -23,7 +26,18 @@ from couchbase.exceptions import SearchIndexNotFoundException
 from datetime import timedelta
 from sentence_transformers import SentenceTransformer
 from couchbase.management.logic.collections_logic import ScopeSpec, CollectionSpec
+from couchbase.management.queries import QueryIndex
 from couchbase.result import SearchResult
+from couchbase.exceptions import (
+    AmbiguousTimeoutException,
+    DocumentExistsException,
+    DocumentNotFoundException,
+    RequestCanceledException,
+    TemporaryFailException,
+    TimeoutException,
+)
+from haystack.document_stores.errors import DocumentStoreError
+from haystack.document_stores.types import DuplicatePolicy
 
 from .common import common
 
@@ -179,6 +193,26 @@ class TestDocumentStore(DocumentStoreBaseTests):
         expected = [d for d in filterable_docs if d.meta.get("number") is not None and d.meta["number"] in [10, -10]]
         self.assert_documents_are_equal(result, expected)
 
+    def test_list_filters_match_on_both_backends(self, document_store: CouchbaseDocumentStore):
+        documents = [
+            Document(id="1", content="red and blue", meta={"tags": ["red", "blue"]}),
+            Document(id="2", content="red", meta={"tags": ["red"]}),
+            Document(id="3", content="scalar red", meta={"tags": "red"}),
+            Document(id="4", content="blue", meta={"tags": ["blue", "green"]}),
+        ]
+        document_store.write_documents(documents)
+        document_store.collection.query_indexes().create_primary_index(ignore_if_exists=True)
+        # let the search index catch up with the writes
+        time.sleep(5)
+        for value in (["red"], ["red", "blue"], ["blue", "green"]):
+            for operator in ("==", "!="):
+                filters = {"field": "meta.tags", "operator": operator, "value": value}
+                matches = {}
+                for backend in ("fts", "sql"):
+                    document_store.filter_backend = backend
+                    matches[backend] = sorted(doc.id for doc in document_store.filter_documents(filters))
+                assert matches["fts"] == matches["sql"], filters
+
     def test_complex_filter(self, document_store, filterable_docs):
         document_store.write_documents(filterable_docs)
         filters = {
@@ -292,6 +326,22 @@ class TestDocumentStoreUnit:
                 'scope': 'haystack_test_scope',
                 'collection': 'haystack_collection',
                 'vector_search_index': 'vector_search',
+                'use_search_fields': False,
+                'query_cache_size': 0,
+                'query_cache_ttl': 300.0,
+                'document_cache_size': 0,
+                'document_cache_ttl': 300.0,
+                'embedding_format': 'float',
+                'max_write_retries': 3,
+                'write_retry_backoff': 0.1,
+                'write_options': {
+                    'type': 'couchbase_haystack.document_stores.write_options.CouchbaseWriteOptions',
+                    'init_parameters': {},
+                },
+                'expiry_meta_field': None,
+                'filter_backend': 'fts',
+                'embedding_fields': None,
+                'meta_embedding_fields': None,
             },
         }
 
@@ -341,3 +391,920 @@ class TestDocumentStoreUnit:
 
         document_store.cluster.bucket.return_value.scope.assert_called_once_with("haystack_test_scope")
         assert doc == [Document(id="1a", content="text", score=1)]
+
+    def test_write_documents_in_batches(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        documents = [Document(id=str(i), content=f"doc {i}") for i in range(5)]
+        document_store.collection.insert_multi.side_effect = lambda ops, **_: MultiResult(
+            all_ok="3" not in ops,
+            results={},
+            exceptions={"3": DocumentExistsException()} if "3" in ops else None,
+        )
+        results = document_store.document_store.write_documents_in_batches(documents, batch_size=2, max_concurrency=2)
+
+        assert [r.batch_index for r in results] == [0, 1, 2]
+        assert document_store.collection.insert_multi.call_count == 3
+        assert [r.written for r in results] == [2, 1, 1]
+        assert results[1].duplicate_ids == ["3"]
+        assert results[1].failed_ids == []
+        assert not results[1].all_ok
+        assert results[0].all_ok and results[2].all_ok
+
+    def test_write_documents_in_batches_failed_batch(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        documents = [Document(id=str(i), content=f"doc {i}") for i in range(4)]
+        error = Exception("timeout")
+
+        def upsert_multi(ops, **_):
+            if "0" in ops:
+                raise error
+            return MultiResult(all_ok=True, results={})
+
+        document_store.collection.upsert_multi.side_effect = upsert_multi
+        results = document_store.document_store.write_documents_in_batches(
+            documents, policy=DuplicatePolicy.OVERWRITE, batch_size=2
+        )
+
+        assert results[0].written == 0
+        assert results[0].failed_ids == ["0", "1"]
+        assert results[0].errors == {"0": error, "1": error}
+        assert results[1].written == 2
+
+    def test_write_documents_iter(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        document_store.collection.insert_multi.side_effect = lambda ops, **_: MultiResult(all_ok=True, results={})
+        produced = []
+
+        def generate():
+            for i in range(5):
+                produced.append(i)
+                yield Document(id=str(i), content=f"doc {i}")
+
+        progress = []
+        written = document_store.document_store.write_documents_iter(
+            generate(), batch_size=2, max_concurrency=1, progress_callback=progress.append
+        )
+
+        assert written == 5
+        assert produced == [0, 1, 2, 3, 4]
+        assert sorted(r.batch_index for r in progress) == [0, 1, 2]
+        assert sum(r.written for r in progress) == 5
+
+    def test_write_documents_iter_invalid_input(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        with pytest.raises(ValueError):
+            document_store.document_store.write_documents_iter(iter(["not a document"]))
+
+    def test_embedding_retrieval_from_search_fields(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        # the index stores every field it maps, the meta dynamically
+        index = common.load_json_file("./tests/vector_index.json")
+        document_store.scope.search_indexes.return_value.get_index.return_value = MagicMock(params=index["params"])
+        row = Row(id="1a", score=0.9)
+        row.fields = {"content": "stored text", "embedding": [0.1, 0.2], "meta.year": 2020, "meta.author.name": "jane"}
+        document_store.scope.search.return_value = SearchResult(search_request=[row])
+
+        docs = document_store.document_store._embedding_retrieval(
+            query_embedding=[0.1, 0.2], top_k=1, use_search_fields=True
+        )
+
+        _, _, options = document_store.scope.search.call_args.args
+        assert options["fields"] == ["*"]
+        document_store.collection.lookup_in.assert_not_called()
+        document_store.collection.get_multi.assert_not_called()
+        # the dataframe is stored but missing from the hit, it is left empty
+        assert docs == [
+            Document(
+                id="1a",
+                content="stored text",
+                embedding=[0.1, 0.2],
+                meta={"year": 2020, "author": {"name": "jane"}},
+                score=0.9,
+            )
+        ]
+
+    def test_embedding_retrieval_search_fields_unstored_embedding(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        document_store.scope.search_indexes.return_value.get_index.side_effect = SearchIndexNotFoundException()
+        # by default the index stores the text fields and the meta, but not the embedding
+        document_store.document_store.create_or_update_vector_index(dims=2)
+        stored = Row(id="1a", score=0.9)
+        stored.fields = {"content": "stored text", "meta.year": 2020}
+        not_stored = Row(id="2b", score=0.5)
+        not_stored.fields = {"meta.year": 2021}
+        document_store.scope.search.return_value = SearchResult(search_request=[stored, not_stored])
+        document_store.collection.get_multi.return_value = MultiResult(
+            all_ok=True, results={"2b": GetResult(success=True, value={"content": "kv text"})}
+        )
+        lookup_result = MagicMock()
+        lookup_result.exists.return_value = True
+        lookup_result.content_as.__getitem__.return_value = lambda i: [0.3, 0.4]
+        document_store.collection.lookup_in.return_value = lookup_result
+
+        docs = document_store.document_store._embedding_retrieval(
+            query_embedding=[0.1, 0.2], top_k=2, use_search_fields=True
+        )
+
+        # only the embedding is looked up, the blob is not mapped by the index
+        key, specs = document_store.collection.lookup_in.call_args.args
+        assert (key, [spec[1] for spec in specs]) == ("1a", ["embedding"])
+        document_store.collection.get_multi.assert_called_once_with(keys=["2b"])
+        assert docs == [
+            Document(id="1a", content="stored text", embedding=[0.3, 0.4], meta={"year": 2020}, score=0.9),
+            Document(id="2b", content="kv text", score=0.5),
+        ]
+
+    def test_filter_documents_without_embedding(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        document_store.scope.search.return_value = SearchResult(search_request=[Row(id="1a")])
+        lookup_result = MagicMock()
+        # content and meta exist, dataframe and blob do not
+        lookup_result.exists.side_effect = lambda i: i in (0, 3)
+        lookup_result.content_as.__getitem__.return_value = lambda i: ["text", None, None, {"year": 2020}][i]
+        document_store.collection.lookup_in.return_value = lookup_result
+
+        docs = document_store.document_store.filter_documents({}, return_embedding=False)
+
+        document_store.collection.get_multi.assert_not_called()
+        _, specs = document_store.collection.lookup_in.call_args.args
+        assert [spec[1] for spec in specs] == ["content", "dataframe", "blob", "meta"]
+        assert docs == [Document(id="1a", content="text", meta={"year": 2020}, score=1)]
+
+    def test_embedding_retrieval_search_fields_projection(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        document_store.scope.search_indexes.return_value.get_index.side_effect = SearchIndexNotFoundException()
+        document_store.document_store.create_or_update_vector_index(dims=2)
+        row = Row(id="1a")
+        row.fields = {"content": "text", "meta.title": "title"}
+        document_store.scope.search.return_value = SearchResult(search_request=[row])
+
+        docs = document_store.document_store._embedding_retrieval(
+            query_embedding=[0.1, 0.2], use_search_fields=True, fields=["content", "meta.title"]
+        )
+
+        _, _, options = document_store.scope.search.call_args.args
+        assert options["fields"] == ["content", "meta.title"]
+        document_store.collection.lookup_in.assert_not_called()
+        assert docs == [Document(id="1a", content="text", meta={"title": "title"}, score=1)]
+
+    def test_embedding_retrieval_search_fields_partially_stored(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        document_store.scope.search_indexes.return_value.get_index.side_effect = SearchIndexNotFoundException()
+        document_store.document_store.create_or_update_vector_index(
+            dims=2, meta_fields={"title": "keyword", "year": "number"}, stored_fields=["content", "meta.title"]
+        )
+        stored = Row(id="1a")
+        stored.fields = {"content": "text", "meta.title": "title"}
+        no_content = Row(id="2b")
+        no_content.fields = {"meta.title": "other title"}
+        document_store.scope.search.return_value = SearchResult(search_request=[stored, no_content])
+        kv_values = {"1a": {"meta.year": 2020}, "2b": {"meta.year": 2021}}
+        lookups = {}
+
+        def lookup_in(key, specs):
+            paths = lookups[key] = [spec[1] for spec in specs]
+            result = MagicMock()
+            result.exists.side_effect = lambda i: paths[i] in kv_values[key]
+            result.content_as.__getitem__.return_value = lambda i: kv_values[key][paths[i]]
+            return result
+
+        document_store.collection.lookup_in.side_effect = lookup_in
+
+        docs = document_store.document_store._embedding_retrieval(
+            query_embedding=[0.1, 0.2], use_search_fields=True, fields=["content", "meta.title", "meta.year"]
+        )
+
+        # only the requested paths the index does not store are fetched, a stored content missing from a hit is empty
+        assert lookups == {"1a": ["meta.year"], "2b": ["meta.year"]}
+        document_store.collection.get_multi.assert_not_called()
+        assert docs == [
+            Document(id="1a", content="text", meta={"title": "title", "year": 2020}, score=1),
+            Document(id="2b", meta={"title": "other title", "year": 2021}, score=1),
+        ]
+
+    def test_embedding_retrieval_batch(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        responses = {
+            0.1: SearchResult(search_request=[Row(id="1a", score=0.9), Row(id="2b", score=0.8)]),
+            0.2: SearchResult(search_request=[Row(id="2b", score=0.7)]),
+        }
+        document_store.scope.search.side_effect = lambda index, request, options: responses[
+            request.vector_search.queries[0].vector[0]
+        ]
+        document_store.collection.get_multi.return_value = MultiResult(
+            all_ok=True,
+            results={
+                "1a": GetResult(success=True, value={"content": "one"}),
+                "2b": GetResult(success=True, value={"content": "two"}),
+            },
+        )
+
+        docs = document_store.document_store._embedding_retrieval_batch(query_embeddings=[[0.1, 0.0], [0.2, 0.0]], top_k=2)
+
+        document_store.collection.get_multi.assert_called_once_with(keys=["1a", "2b"])
+        assert docs == [
+            [Document(id="1a", content="one", score=0.9), Document(id="2b", content="two", score=0.8)],
+            [Document(id="2b", content="two", score=0.7)],
+        ]
+
+    def test_filter_documents_iter_pages(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        pages = [
+            SearchResult(search_request=[Row(id="1"), Row(id="2")]),
+            SearchResult(search_request=[Row(id="3"), Row(id="4")]),
+            SearchResult(search_request=[Row(id="5")]),
+        ]
+        document_store.scope.search.side_effect = pages
+        document_store.collection.get_multi.side_effect = lambda keys: MultiResult(
+            all_ok=True, results={id: GetResult(success=True, value={"content": id}) for id in keys}
+        )
+
+        docs = document_store.document_store.filter_documents_iter(page_size=2)
+        assert [doc.id for doc in docs] == ["1", "2", "3", "4", "5"]
+
+        options = [call.args[2] for call in document_store.scope.search.call_args_list]
+        assert all(o["sort"] == ["_id"] and o["limit"] == 2 for o in options)
+        assert "raw" not in options[0]
+        assert options[1]["raw"] == {"search_after": ["2"]}
+        assert options[2]["raw"] == {"search_after": ["4"]}
+        assert document_store.collection.get_multi.call_count == 3
+
+    def test_filter_documents_limit(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        document_store.scope.search.side_effect = [
+            SearchResult(search_request=[Row(id="1"), Row(id="2")]),
+            SearchResult(search_request=[Row(id="3")]),
+        ]
+        document_store.collection.get_multi.side_effect = lambda keys: MultiResult(
+            all_ok=True, results={id: GetResult(success=True, value={"content": id}) for id in keys}
+        )
+
+        docs = document_store.document_store.filter_documents(limit=3, page_size=2)
+
+        assert [doc.id for doc in docs] == ["1", "2", "3"]
+        assert document_store.scope.search.call_args_list[1].args[2]["limit"] == 1
+
+    def test_embedding_retrieval_prefilter(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        document_store.scope.search.return_value = SearchResult(search_request=[])
+
+        document_store.document_store._embedding_retrieval(
+            query_embedding=[0.1, 0.2], top_k=3, filters={"field": "meta.lang", "operator": "==", "value": "en"}
+        )
+
+        _, request, _ = document_store.scope.search.call_args.args
+        vector_query = request.vector_search.queries[0]
+        assert vector_query.prefilter.encodable == {"field": "meta.lang", "match": "en"}
+        assert vector_query.num_candidates == 3
+
+    def test_embedding_retrieval_rerank(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        document_store.scope.search.return_value = SearchResult(
+            search_request=[Row(id="1a", score=0.9), Row(id="2b", score=0.8), Row(id="3c", score=0.7)]
+        )
+        embeddings = {"1a": [1.0, 0.0], "2b": [0.6, 0.8], "3c": [0.0, 1.0]}
+        lookup_results = {}
+        for id, embedding in embeddings.items():
+            lookup_results[id] = MagicMock()
+            lookup_results[id].exists.return_value = True
+            lookup_results[id].content_as.__getitem__.return_value = lambda i, e=embedding: ["text", e][i]
+        document_store.collection.lookup_in.side_effect = lambda id, specs: lookup_results[id]
+
+        docs = document_store.document_store._embedding_retrieval(
+            query_embedding=[0.0, 1.0], top_k=2, num_candidates=3, rerank="cosine", fields=["content"]
+        )
+
+        _, request, options = document_store.scope.search.call_args.args
+        assert request.vector_search.queries[0].num_candidates == 3
+        assert options["limit"] == 3
+        _, specs = document_store.collection.lookup_in.call_args.args
+        assert [spec[1] for spec in specs] == ["content", "embedding"]
+        assert docs == [Document(id="3c", content="text", score=1.0), Document(id="2b", content="text", score=0.8)]
+
+        with pytest.raises(ValueError):
+            document_store.document_store._embedding_retrieval(query_embedding=[0.1], rerank="manhattan")
+        with pytest.raises(ValueError):
+            document_store.document_store._embedding_retrieval(query_embedding=[0.1], num_candidates=0)
+
+    def test_hybrid_retrieval(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        text_response = SearchResult(search_request=[Row(id="1a", score=4.2), Row(id="2b", score=1.3)])
+        vector_response = SearchResult(search_request=[Row(id="2b", score=0.9), Row(id="3c", score=0.8)])
+        document_store.scope.search.side_effect = lambda index, request, options: (
+            vector_response if request.vector_search else text_response
+        )
+        document_store.collection.get_multi.return_value = MultiResult(
+            all_ok=True,
+            results={
+                "2b": GetResult(success=True, value={"content": "two"}),
+                "1a": GetResult(success=True, value={"content": "one"}),
+            },
+        )
+
+        docs = document_store.document_store._hybrid_retrieval(
+            query="two", query_embedding=[0.1, 0.2], top_k=2, filters={"field": "meta.lang", "operator": "==", "value": "en"}
+        )
+
+        document_store.collection.get_multi.assert_called_once_with(keys=["2b", "1a"])
+        assert [doc.id for doc in docs] == ["2b", "1a"]
+        assert docs[0].score == pytest.approx(0.5 / 62 + 0.5 / 61)
+        for _, request, _ in (call.args for call in document_store.scope.search.call_args_list):
+            if request.vector_search:
+                assert request.vector_search.queries[0].prefilter.encodable == {"field": "meta.lang", "match": "en"}
+            else:
+                assert request.search_query.encodable["conjuncts"][1] == {"field": "meta.lang", "match": "en"}
+
+    def test_hybrid_retrieval_unknown_fusion(self, document_store: DocumentStore):
+        with pytest.raises(ValueError):
+            document_store.document_store._hybrid_retrieval(query="two", query_embedding=[0.1], fusion="max")
+
+    def test_embedding_retrieval_query_cache(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["query_cache_size"] = 8
+        store = CouchbaseDocumentStore.from_dict(data)
+        document_store.scope.search.return_value = SearchResult(search_request=[Row(id="1a", score=0.9)])
+        document_store.collection.get_multi.return_value = MultiResult(
+            all_ok=True, results={"1a": GetResult(success=True, value={"content": "one"})}
+        )
+
+        first = store._embedding_retrieval(query_embedding=[0.1, 0.2], top_k=2)
+        first[0].meta["changed"] = True
+        second = store._embedding_retrieval(query_embedding=[0.1, 0.2], top_k=2)
+
+        assert second == [Document(id="1a", content="one", score=0.9)]
+        assert document_store.scope.search.call_count == 1
+        assert store.query_cache_info() == CacheInfo(hits=1, misses=1, maxsize=8, currsize=1)
+
+        store._embedding_retrieval(query_embedding=[0.1, 0.2], top_k=3)
+        store._embedding_retrieval(query_embedding=[0.1, 0.2], top_k=2, use_query_cache=False)
+        assert document_store.scope.search.call_count == 3
+
+        document_store.collection.remove_multi.return_value = MultiResult(all_ok=True, results={})
+        store.delete_documents(["1a"])
+        store._embedding_retrieval(query_embedding=[0.1, 0.2], top_k=2)
+        assert document_store.scope.search.call_count == 4
+        assert document_store.document_store.query_cache_info() is None
+
+    def test_embedding_retrieval_document_cache(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["document_cache_size"] = 8
+        store = CouchbaseDocumentStore.from_dict(data)
+        values = {
+            "1a": {"content": "one", "embedding": [0.1, 0.2]},
+            "2b": {"content": "two", "meta": {"year": 2020}},
+            "3c": {"content": "three"},
+        }
+        document_store.collection.get_multi.side_effect = lambda keys: MultiResult(
+            all_ok=True, results={id: GetResult(success=True, value=values[id]) for id in keys}
+        )
+        document_store.collection.insert_multi.return_value = MultiResult(all_ok=True, results={})
+
+        document_store.scope.search.return_value = SearchResult(search_request=[Row(id="1a"), Row(id="2b")])
+        store._embedding_retrieval(query_embedding=[0.1, 0.2], top_k=2)
+        document_store.scope.search.return_value = SearchResult(
+            search_request=[Row(id="3c", score=0.9), Row(id="2b", score=0.8)]
+        )
+        docs = store._embedding_retrieval(query_embedding=[0.3, 0.4], top_k=2)
+
+        document_store.collection.get_multi.assert_called_with(keys=["3c"])
+        assert docs == [
+            Document(id="3c", content="three", score=0.9),
+            Document(id="2b", content="two", meta={"year": 2020}, score=0.8),
+        ]
+
+        document_store.scope.search.return_value = SearchResult(search_request=[Row(id="1a", score=0.7)])
+        docs = store._embedding_retrieval(query_embedding=[0.5, 0.6], top_k=1, return_embedding=False)
+        assert docs == [Document(id="1a", content="one", score=0.7)]
+        assert document_store.collection.get_multi.call_count == 2
+        assert store.document_cache_info().hits == 2
+
+        store.write_documents([Document(id="1a", content="new one")])
+        store._embedding_retrieval(query_embedding=[0.5, 0.6], top_k=1)
+        document_store.collection.get_multi.assert_called_with(keys=["1a"])
+
+    def test_document_cache_returns_copies(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["document_cache_size"] = 8
+        store = CouchbaseDocumentStore.from_dict(data)
+        document_store.collection.get_multi.side_effect = lambda keys: MultiResult(
+            all_ok=True,
+            results={
+                "1a": GetResult(
+                    success=True, value={"content": "one", "embedding": [0.1, 0.2], "meta": {"tags": ["a"]}}
+                )
+            },
+        )
+        document_store.scope.search.return_value = SearchResult(search_request=[Row(id="1a", score=0.9)])
+        expected = Document(id="1a", content="one", embedding=[0.1, 0.2], meta={"tags": ["a"]}, score=0.9)
+
+        # neither the Document returned by the fetch nor the one served from the cache share state with the cache
+        for _ in range(2):
+            doc = store._embedding_retrieval(query_embedding=[0.1, 0.2], top_k=1)[0]
+            assert doc == expected
+            doc.embedding.append(0.3)
+            doc.meta["tags"].append("b")
+            doc.meta["year"] = 2020
+
+        assert store._embedding_retrieval(query_embedding=[0.1, 0.2], top_k=1) == [expected]
+        assert document_store.collection.get_multi.call_count == 1
+        assert store.document_cache_info().hits == 2
+
+    def test_embedding_retrieval_read_error(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        document_store.scope.search.return_value = SearchResult(search_request=[Row(id="1a")])
+        document_store.collection.get_multi.return_value = MultiResult(
+            all_ok=False, results={}, exceptions={"1a": TemporaryFailException()}
+        )
+
+        with pytest.raises(DocumentStoreError, match="Failed to read documents from couchbase"):
+            document_store.document_store._embedding_retrieval(query_embedding=[0.1, 0.2])
+
+    def test_base64_embedding_format(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["embedding_format"] = "base64_float32"
+        store = CouchbaseDocumentStore.from_dict(data)
+        document_store.collection.insert_multi.return_value = MultiResult(all_ok=True, results={})
+
+        store.write_documents([Document(id="1a", content="one", embedding=[0.5, -1.0, 2.0])])
+
+        operations = document_store.collection.insert_multi.call_args.args[0]
+        assert operations["1a"]["embedding"] == "AAAAPwAAgL8AAABA"
+
+        document_store.scope.search.return_value = SearchResult(search_request=[Row(id="1a"), Row(id="2b")])
+        document_store.collection.get_multi.return_value = MultiResult(
+            all_ok=True,
+            results={
+                "1a": GetResult(success=True, value=operations["1a"]),
+                "2b": GetResult(success=True, value={"content": "two", "embedding": [0.25, 0.75]}),
+            },
+        )
+        docs = store._embedding_retrieval(query_embedding=[0.1, 0.2], top_k=2)
+
+        assert [doc.embedding for doc in docs] == [[0.5, -1.0, 2.0], [0.25, 0.75]]
+
+    def test_mixed_embedding_formats(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["embedding_format"] = "base64_float16"
+        float16_store = CouchbaseDocumentStore.from_dict(data)
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["embedding_format"] = "base64_float32"
+        float32_store = CouchbaseDocumentStore.from_dict(data)
+        document_store.collection.insert_multi.return_value = MultiResult(all_ok=True, results={})
+
+        float16_store.write_documents([Document(id="1a", content="one", embedding=[0.5, -1.0, 2.0, 0.25])])
+        float16_value = document_store.collection.insert_multi.call_args.args[0]["1a"]
+        float32_store.write_documents([Document(id="2b", content="two", embedding=[0.5, -1.0])])
+        float32_value = document_store.collection.insert_multi.call_args.args[0]["2b"]
+
+        assert float16_value["embedding"].startswith("float16:")
+        assert float32_value["embedding"] == "AAAAPwAAgL8="
+        document_store.scope.search.return_value = SearchResult(search_request=[Row(id="1a"), Row(id="2b")])
+        document_store.collection.get_multi.return_value = MultiResult(
+            all_ok=True,
+            results={"1a": GetResult(success=True, value=float16_value), "2b": GetResult(success=True, value=float32_value)},
+        )
+        for store in (float32_store, float16_store):
+            docs = store._embedding_retrieval(query_embedding=[0.1, 0.2], top_k=2)
+            assert [doc.embedding for doc in docs] == [[0.5, -1.0, 2.0, 0.25], [0.5, -1.0]]
+
+    def test_invalid_embedding_format(self, document_store: DocumentStore):
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["embedding_format"] = "float64"
+        with pytest.raises(ValueError):
+            CouchbaseDocumentStore.from_dict(data)
+
+    def test_write_documents_with_embeddings_array(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["embedding_format"] = "base64_float32"
+        store = CouchbaseDocumentStore.from_dict(data)
+        document_store.collection.insert_multi.return_value = MultiResult(all_ok=True, results={})
+        documents = [Document(id="1a", content="one", meta={"year": 2020}), Document(id="2b", content="two")]
+
+        store.write_documents(documents, embeddings=np.array([[0.5, -1.0, 2.0], [0.0, 0.0, 0.0]]))
+
+        operations = document_store.collection.insert_multi.call_args.args[0]
+        assert operations == {
+            "1a": {"id": "1a", "content": "one", "meta": {"year": 2020}, "embedding": "AAAAPwAAgL8AAABA"},
+            "2b": {"id": "2b", "content": "two", "meta": {}, "embedding": "AAAAAAAAAAAAAAAA"},
+        }
+        with pytest.raises(ValueError):
+            store.write_documents(documents, embeddings=np.zeros((1, 3)))
+
+    def test_embedding_fields(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["embedding_fields"] = {"embedding_2": 2}
+        store = CouchbaseDocumentStore.from_dict(data)
+        document_store.collection.insert_multi.return_value = MultiResult(all_ok=True, results={})
+
+        store.write_documents([Document(id="1a", content="one", embedding=[3.0, 4.0, 1.0]), Document(id="2b")])
+
+        operations = document_store.collection.insert_multi.call_args.args[0]
+        assert operations["1a"]["embedding_2"] == pytest.approx([0.6, 0.8])
+        assert "embedding_2" not in operations["2b"]
+
+        document_store.scope.search.return_value = SearchResult(search_request=[Row(id="1a", score=0.5)])
+        document_store.collection.get_multi.return_value = MultiResult(
+            all_ok=True, results={"1a": GetResult(success=True, value=operations["1a"])}
+        )
+        docs = store._embedding_retrieval(
+            query_embedding=[0.0, 2.0, 1.0], top_k=1, embedding_field="embedding_2", rerank="dot_product"
+        )
+
+        _, request, _ = document_store.scope.search.call_args.args
+        vector_query = request.vector_search.queries[0]
+        assert vector_query.field_name == "embedding_2"
+        assert vector_query.vector == pytest.approx([0.0, 1.0])
+        # rescored with the full embeddings, the truncated copy isn't part of the Document
+        assert docs == [Document(id="1a", content="one", embedding=[3.0, 4.0, 1.0], score=9.0)]
+        with pytest.raises(ValueError):
+            store._embedding_retrieval(query_embedding=[0.1, 0.2], embedding_field="embedding_4")
+
+    def test_invalid_embedding_fields(self, document_store: DocumentStore):
+        for embedding_fields in ({"meta": 2}, {"embedding.small": 2}, {"embedding_0": 0}):
+            data = document_store.document_store.to_dict()
+            data["init_parameters"]["embedding_fields"] = embedding_fields
+            with pytest.raises(ValueError):
+                CouchbaseDocumentStore.from_dict(data)
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["embedding_fields"] = {"title_embedding": 2}
+        data["init_parameters"]["meta_embedding_fields"] = ["title_embedding"]
+        with pytest.raises(ValueError):
+            CouchbaseDocumentStore.from_dict(data)
+
+    def test_meta_embedding_fields(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["embedding_format"] = "base64_float32"
+        data["init_parameters"]["meta_embedding_fields"] = ["title_embedding"]
+        store = CouchbaseDocumentStore.from_dict(data)
+        document_store.collection.insert_multi.return_value = MultiResult(all_ok=True, results={})
+        document = Document(id="1a", content="one", meta={"year": 2020, "title_embedding": [0.5, -1.0, 2.0]})
+
+        store.write_documents([document, Document(id="2b", content="two")])
+
+        operations = document_store.collection.insert_multi.call_args.args[0]
+        assert operations["1a"]["meta"] == {"year": 2020}
+        assert operations["1a"]["title_embedding"] == "AAAAPwAAgL8AAABA"
+        assert document.meta["title_embedding"] == [0.5, -1.0, 2.0]
+        assert "title_embedding" not in operations["2b"]
+
+        document_store.scope.search.return_value = SearchResult(search_request=[Row(id="1a", score=0.5)])
+        document_store.collection.get_multi.return_value = MultiResult(
+            all_ok=True, results={"1a": GetResult(success=True, value=operations["1a"])}
+        )
+        docs = store._embedding_retrieval(
+            query_embedding=[0.1, 0.2],
+            vector_queries={"title_embedding": [0.3, 0.4]},
+            vector_query_combination="and",
+        )
+
+        _, request, _ = document_store.scope.search.call_args.args
+        assert [(q.field_name, q.vector) for q in request.vector_search.queries] == [
+            ("embedding", [0.1, 0.2]),
+            ("title_embedding", [0.3, 0.4]),
+        ]
+        assert request.vector_search.options["vector_query_combination"].value == "and"
+        assert docs == [Document(id="1a", content="one", meta={"year": 2020, "title_embedding": [0.5, -1.0, 2.0]}, score=0.5)]
+
+        with pytest.raises(ValueError):
+            store._embedding_retrieval(query_embedding=[0.1], vector_queries={"body_embedding": [0.1]})
+        with pytest.raises(ValueError):
+            store._embedding_retrieval(
+                query_embedding=[0.1], vector_queries={"title_embedding": [0.1]}, vector_query_combination="xor"
+            )
+
+    def test_create_or_update_vector_index(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        manager = document_store.scope.search_indexes.return_value
+        manager.get_index.side_effect = SearchIndexNotFoundException()
+
+        created = document_store.document_store.create_or_update_vector_index(
+            dims=3, partitions=4, meta_fields={"year": "number", "author.name": "keyword"}
+        )
+
+        assert created == SearchIndexResult(name="vector_search", action="created", applied=True)
+        index = manager.upsert_index.call_args.args[0]
+        assert (index.name, index.source_name, index.plan_params) == (
+            "vector_search",
+            "haystack_integration_test",
+            {"indexPartitions": 4, "numReplicas": 0},
+        )
+        properties = index.params["mapping"]["types"]["haystack_test_scope.haystack_collection"]["properties"]
+        assert properties["embedding"]["fields"][0]["dims"] == 3
+        assert properties["meta"]["properties"]["author"]["properties"]["name"]["fields"][0]["analyzer"] == "keyword"
+
+        # the server adds settings of its own, which are kept
+        existing = replace(
+            index,
+            uuid="1234",
+            params={**index.params, "store": {"indexType": "scorch"}},
+            plan_params={**index.plan_params, "maxPartitionsPerPIndex": 256},
+        )
+        manager.get_index.side_effect = None
+        manager.get_index.return_value = existing
+        manager.upsert_index.reset_mock()
+
+        unchanged = document_store.document_store.create_or_update_vector_index(
+            dims=3, partitions=4, meta_fields={"year": "number", "author.name": "keyword"}
+        )
+        assert unchanged == SearchIndexResult(name="vector_search", action="unchanged")
+
+        updated = document_store.document_store.create_or_update_vector_index(
+            dims=3, partitions=2, meta_fields={"year": "number", "author.name": "keyword"}, dry_run=True
+        )
+        assert updated == SearchIndexResult(
+            name="vector_search",
+            action="updated",
+            changes=["planParams.indexPartitions", "planParams.maxPartitionsPerPIndex"],
+        )
+        manager.upsert_index.assert_not_called()
+
+        document_store.document_store.create_or_update_vector_index(dims=3, similarity="l2_norm")
+        index = manager.upsert_index.call_args.args[0]
+        assert index.uuid == "1234"
+        assert index.params["store"] == {"indexType": "scorch"}
+
+    def test_write_documents_retries_transient_failures(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        monkeypatch.setattr("couchbase_haystack.document_stores.document_store.time.sleep", lambda _: None)
+        calls = []
+
+        def insert_multi(ops, **_):
+            calls.append(sorted(ops))
+            if len(calls) == 1:
+                return MultiResult(
+                    all_ok=False,
+                    results={},
+                    exceptions={"1": TemporaryFailException(), "2": DocumentExistsException(), "3": TemporaryFailException()},
+                )
+            if len(calls) == 2:
+                return MultiResult(all_ok=False, results={}, exceptions={"3": TemporaryFailException()})
+            return MultiResult(all_ok=True, results={})
+
+        document_store.collection.insert_multi.side_effect = insert_multi
+        documents = [Document(id=str(i), content=f"doc {i}") for i in range(4)]
+
+        [result] = document_store.document_store.write_documents_in_batches(documents)
+
+        assert calls == [["0", "1", "2", "3"], ["1", "3"], ["3"]]
+        assert result.written_ids == ["0", "1", "3"]
+        assert result.duplicate_ids == ["2"]
+        assert result.retries == 2
+        assert not result.failed_ids
+
+        document_store.collection.insert_multi.reset_mock()
+        document_store.collection.insert_multi.side_effect = lambda ops, **_: MultiResult(
+            all_ok=False, results={}, exceptions={"3": TemporaryFailException()}
+        )
+        with pytest.raises(DocumentStoreError, match="3 of 4 documents were written"):
+            document_store.document_store.write_documents(documents)
+        assert document_store.collection.insert_multi.call_count == 4
+
+    @pytest.mark.parametrize(
+        "error", [AmbiguousTimeoutException(), TimeoutException(), RequestCanceledException()], ids=type
+    )
+    def test_write_documents_ambiguous_failures(self, document_store: DocumentStore, monkeypatch, error):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        monkeypatch.setattr("couchbase_haystack.document_stores.document_store.time.sleep", lambda _: None)
+
+        def write_multi(ops, **_):
+            return MultiResult(all_ok=False, results={}, exceptions={"1": error} if "1" in ops and len(ops) > 1 else {})
+
+        document_store.collection.insert_multi.side_effect = write_multi
+        document_store.collection.upsert_multi.side_effect = write_multi
+        documents = [Document(id=str(i), content=f"doc {i}") for i in range(2)]
+
+        # the insert may have been applied, sending it again would report a false duplicate
+        [result] = document_store.document_store.write_documents_in_batches(documents)
+        assert document_store.collection.insert_multi.call_count == 1
+        assert result.written_ids == ["0"]
+        assert result.failed_ids == result.ambiguous_ids == ["1"]
+        assert result.errors == {"1": error}
+        assert not result.duplicate_ids
+
+        [result] = document_store.document_store.write_documents_in_batches(documents, policy=DuplicatePolicy.OVERWRITE)
+        assert document_store.collection.upsert_multi.call_count == 2
+        assert result.written_ids == ["0", "1"]
+        assert result.all_ok
+
+    def test_write_options(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["write_options"] = CouchbaseWriteOptions(durability="majority").to_dict()
+        store = CouchbaseDocumentStore.from_dict(data)
+        document_store.collection.upsert_multi.return_value = MultiResult(all_ok=True, results={})
+
+        store.write_documents(
+            [Document(id="1a", content="one")],
+            policy=DuplicatePolicy.OVERWRITE,
+            write_options=CouchbaseWriteOptions(timeout=timedelta(seconds=2)),
+        )
+
+        kwargs = document_store.collection.upsert_multi.call_args.kwargs
+        assert kwargs["durability"].level == DurabilityLevel.MAJORITY
+        assert kwargs["timeout"] == timedelta(seconds=2)
+
+    def test_write_documents_with_expiry_meta_field(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["expiry_meta_field"] = "ttl"
+        data["init_parameters"]["write_options"] = CouchbaseWriteOptions(expiry=timedelta(days=1)).to_dict()
+        store = CouchbaseDocumentStore.from_dict(data)
+        document_store.collection.insert_multi.return_value = MultiResult(all_ok=True, results={})
+
+        store.write_documents([Document(id="1", content="one", meta={"ttl": 60}), Document(id="2", content="two")])
+
+        kwargs = document_store.collection.insert_multi.call_args.kwargs
+        assert kwargs["expiry"] == timedelta(days=1)
+        assert kwargs["per_key_options"] == {"1": InsertOptions(expiry=timedelta(seconds=60))}
+        with pytest.raises(ValueError):
+            store.write_documents([Document(id="3", content="three", meta={"ttl": "soon"})])
+
+    def test_delete_documents_in_batches(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        calls = []
+
+        def remove_multi(keys, **kwargs):
+            calls.append(keys)
+            exceptions = {"2": DocumentNotFoundException()} if "2" in keys else {}
+            if "5" in keys:
+                exceptions["5"] = TimeoutException()
+            return MultiResult(all_ok=not exceptions, results={}, exceptions=exceptions)
+
+        document_store.collection.remove_multi.side_effect = remove_multi
+
+        document_store.document_store.delete_documents(["1", "2", "3"], batch_size=2)
+        assert sorted(calls) == [["1", "2"], ["3"]]
+
+        with pytest.raises(DocumentStoreError, match="1 of 2 documents were deleted"):
+            document_store.document_store.delete_documents(["4", "5"])
+
+    def test_delete_by_filter(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        document_store.scope.search.side_effect = [
+            SearchResult(search_request=[Row(id="1"), Row(id="2")]),
+            SearchResult(search_request=[Row(id="3")]),
+        ]
+        document_store.collection.remove_multi.side_effect = lambda keys, **kwargs: MultiResult(
+            all_ok=False, results={}, exceptions={"3": DocumentNotFoundException()} if "3" in keys else {}
+        )
+
+        result = document_store.document_store.delete_by_filter(
+            {"field": "meta.tenant", "operator": "==", "value": "acme"}, batch_size=2
+        )
+
+        assert result == DeleteResult(deleted=2, not_found=1)
+        request = document_store.scope.search.call_args_list[0].args[1]
+        assert request.search_query.encodable == {"field": "meta.tenant", "match": "acme"}
+        assert document_store.collection.remove_multi.call_count == 2
+        with pytest.raises(ValueError):
+            document_store.document_store.delete_by_filter({})
+
+    def test_delete_by_filter_sql(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        response = MagicMock()
+        response.metadata.return_value.metrics.return_value.mutation_count.return_value.value = 7
+        document_store.scope.query.return_value = response
+        filters = {
+            "operator": "AND",
+            "conditions": [
+                {"field": "meta.tenant", "operator": "==", "value": "acme"},
+                {"field": "meta.year", "operator": "<", "value": 2020},
+            ],
+        }
+
+        result = document_store.document_store.delete_by_filter(filters, use_sql=True)
+
+        assert result == DeleteResult(deleted=7)
+        statement, options = document_store.scope.query.call_args.args
+        assert statement == "DELETE FROM `haystack_collection` AS d WHERE (`d`.`meta`.`tenant` = $f0 AND `d`.`meta`.`year` < $f1)"
+        assert options["named_parameters"] == {"f0": "acme", "f1": 2020}
+        document_store.collection.remove_multi.assert_not_called()
+
+    def test_filter_documents_sql(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["filter_backend"] = "sql"
+        store = CouchbaseDocumentStore.from_dict(data)
+        document_store.scope.query.return_value.rows.return_value = iter(
+            [{"__id": "1", "content": "one", "meta.year": 2020}, {"__id": "2", "content": "two"}]
+        )
+
+        docs = store.filter_documents(
+            {"field": "meta.year", "operator": ">=", "value": 2020}, fields=["content", "meta.year"], limit=5
+        )
+
+        assert docs == [Document(id="1", content="one", meta={"year": 2020}), Document(id="2", content="two")]
+        statement, options = document_store.scope.query.call_args.args
+        assert statement == (
+            "SELECT META(d).id AS `__id`, `d`.`content` AS `content`, `d`.`meta`.`year` AS `meta.year` "
+            "FROM `haystack_collection` AS d WHERE `d`.`meta`.`year` >= $f0 LIMIT $limit"
+        )
+        assert options["named_parameters"] == {"f0": 2020, "limit": 5}
+        document_store.scope.search.assert_not_called()
+        document_store.collection.get_multi.assert_not_called()
+
+    def test_filter_documents_auto_backend(self, document_store: DocumentStore, monkeypatch):
+        monkeypatch.setenv("CONNECTION_STRING", "value_one")
+        monkeypatch.setenv("USER_NAME", "value_one")
+        monkeypatch.setenv("PASSWORD", "value_one")
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["filter_backend"] = "auto"
+        store = CouchbaseDocumentStore.from_dict(data)
+        document_store.collection.query_indexes.return_value.get_all_indexes.return_value = [
+            QueryIndex("idx_tenant", False, "gsi", "online", "default", "", "", ["`meta`.`tenant`", "(`meta`.`year` DESC)"]),
+            QueryIndex("idx_lang", False, "gsi", "online", "default", "", "", ["`meta`.`lang`"], condition="(`x` = 1)"),
+            QueryIndex("#primary", True, "gsi", "online", "default", "", "", []),
+        ]
+        tenant_and_year = {
+            "operator": "AND",
+            "conditions": [
+                {"field": "meta.tenant", "operator": "==", "value": "acme"},
+                {"field": "meta.year", "operator": ">", "value": 2000},
+            ],
+        }
+
+        assert store._use_sql_filters(tenant_and_year)
+        assert not store._use_sql_filters({"field": "meta.lang", "operator": "==", "value": "en"})
+        # an index scan can't serve the documents without the field, which `!=` and NOT match
+        assert not store._use_sql_filters({"field": "meta.tenant", "operator": "!=", "value": "acme"})
+        assert not store._use_sql_filters({"operator": "NOT", "conditions": [tenant_and_year]})
+        assert not store._use_sql_filters(None)
+        assert document_store.collection.query_indexes.return_value.get_all_indexes.call_count == 1
+        data = document_store.document_store.to_dict()
+        data["init_parameters"]["filter_backend"] = "n1ql"
+        with pytest.raises(ValueError):
+            CouchbaseDocumentStore.from_dict(data)
@@ -1,6 +1,14 @@
-from couchbase_haystack.document_stores.filters import _normalize_filters
+from couchbase_haystack.document_stores import filters as filters_module
+from couchbase_haystack.document_stores.filters import (
+    _compile_filter_shape,
+    _is_iso_date,
+    _normalize_filters,
+    _simplify_filters,
+    compile_filters,
+)
 import pytest
 from haystack.errors import FilterError
+from pandas import DataFrame
 
 
 @pytest.mark.unit
@@ -243,12 +251,16 @@ class TestFilterGT:
     def test_filter_gt_condition_number(self):
         _filter = {"field": "meta.years", "operator": ">", "value": 2019}
         normalized_filter = _normalize_filters(_filter)
-        assert normalized_filter.encodable == {"field": "meta.years", "min": 2019}
+        assert normalized_filter.encodable == {"field": "meta.years", "min": 2019, "inclusive_min": False}
 
     def test_filter_gt_condition_date(self):
         _filter = {"field": "meta.years", "operator": ">", "value": "2011-10-05T14:48:00.000Z"}
         normalized_filter = _normalize_filters(_filter)
-        assert normalized_filter.encodable == {"field": "meta.years", "start": "2011-10-05T14:48:00.000Z"}
+        assert normalized_filter.encodable == {
+            "field": "meta.years",
+            "start": "2011-10-05T14:48:00.000Z",
+            "inclusive_start": False,
+        }
 
     def test_filter_gt_condition_array_of_str(self):
         _filter = {"field": "meta.years", "operator": ">", "value": ["1", "2"]}
@@ -554,3 +566,210 @@ class TestFilterComplex:
                 ]
             }
         }
+
+
+@pytest.mark.unit
+class TestFilterSimplification:
+    def test_merge_numeric_ranges(self):
+        _filter = {
+            "operator": "AND",
+            "conditions": [
+                {"field": "meta.year", "operator": ">=", "value": 2000},
+                {"field": "meta.name", "operator": "==", "value": "x"},
+                {"field": "meta.year", "operator": "<", "value": 2010},
+                {"field": "meta.year", "operator": ">", "value": 2000},
+            ],
+        }
+        normalized_filter = _normalize_filters(_filter)
+        assert normalized_filter.encodable == {
+            "must": {
+                "conjuncts": [
+                    {"field": "meta.year", "min": 2000, "inclusive_min": False, "max": 2010, "inclusive_max": False},
+                    {"field": "meta.name", "match": "x"},
+                ]
+            }
+        }
+
+    def test_merge_date_ranges(self):
+        _filter = {
+            "operator": "AND",
+            "conditions": [
+                {"field": "meta.date", "operator": ">=", "value": "2020-01-01T00:00:00+00:00"},
+                {"field": "meta.date", "operator": ">=", "value": "2020-01-01T02:00:00+01:00"},
+                {"field": "meta.date", "operator": "<=", "value": "2021-01-01T00:00:00+00:00"},
+            ],
+        }
+        normalized_filter = _normalize_filters(_filter)
+        assert normalized_filter.encodable == {
+            "must": {
+                "conjuncts": [
+                    {
+                        "field": "meta.date",
+                        "start": "2020-01-01T02:00:00+01:00",
+                        "inclusive_start": True,
+                        "end": "2021-01-01T00:00:00+00:00",
+                        "inclusive_end": True,
+                    }
+                ]
+            }
+        }
+
+    def test_ranges_are_not_merged_in_or(self):
+        _filter = {
+            "operator": "OR",
+            "conditions": [
+                {"field": "meta.year", "operator": "<", "value": 2000},
+                {"field": "meta.year", "operator": ">", "value": 2010},
+            ],
+        }
+        normalized_filter = _normalize_filters(_filter)
+        assert normalized_filter.encodable == {
+            "should": {
+                "min": 1,
+                "disjuncts": [
+                    {"field": "meta.year", "max": 2000},
+                    {"field": "meta.year", "min": 2010, "inclusive_min": False},
+                ],
+            }
+        }
+
+    def test_incomparable_dates_are_not_merged(self):
+        _filter = {
+            "operator": "AND",
+            "conditions": [
+                {"field": "meta.date", "operator": ">=", "value": "2020-01-01T00:00:00"},
+                {"field": "meta.date", "operator": ">=", "value": "2020-01-01T00:00:00+00:00"},
+            ],
+        }
+        assert len(_normalize_filters(_filter).encodable["must"]["conjuncts"]) == 2
+
+    def test_simplify_filters(self):
+        a = {"field": "meta.a", "operator": "==", "value": 1}
+        b = {"field": "meta.b", "operator": "in", "value": ["x", "y", "x"]}
+        c = {"field": "meta.c", "operator": "==", "value": 3}
+        _filter = {
+            "operator": "AND",
+            "conditions": [a, {"operator": "AND", "conditions": [b, {"operator": "AND", "conditions": [a]}]}, c],
+        }
+        assert _simplify_filters(_filter) == {
+            "operator": "AND",
+            "conditions": [a, {"field": "meta.b", "operator": "in", "value": ["x", "y"]}, c],
+        }
+        assert _simplify_filters({"operator": "OR", "conditions": [{"operator": "OR", "conditions": [a]}]}) == a
+        assert _simplify_filters({"operator": "NOT", "conditions": [{"operator": "AND", "conditions": [a, c]}]}) == {
+            "operator": "NOT",
+            "conditions": [a, c],
+        }
+        assert _simplify_filters({"operator": "OR", "conditions": [{"operator": "AND", "conditions": [a, c]}]}) == {
+            "operator": "AND",
+            "conditions": [a, c],
+        }
+        empty = {"operator": "AND", "conditions": [a, {"operator": "OR", "conditions": []}]}
+        assert _simplify_filters(empty) == empty
+
+
+@pytest.mark.unit
+class TestCompileFilters:
+    def test_compile_filters_is_memoized(self):
+        _filter = {
+            "operator": "AND",
+            "conditions": [
+                {"field": "meta.tenant", "operator": "==", "value": "acme"},
+                {"field": "meta.date", "operator": ">=", "value": "2020-01-01"},
+            ],
+        }
+        reordered = {"conditions": [{"value": "acme", "operator": "==", "field": "meta.tenant"}, _filter["conditions"][1]]}
+        reordered["operator"] = "AND"
+
+        other_values = {
+            "operator": "AND",
+            "conditions": [
+                {"field": "meta.tenant", "operator": "==", "value": "globex"},
+                {"field": "meta.date", "operator": ">=", "value": "2021-06-01"},
+            ],
+        }
+        _compile_filter_shape.cache_clear()
+
+        compiled = compile_filters(_filter)
+
+        assert compiled.encodable == _normalize_filters(_filter).encodable
+        assert compile_filters(reordered).encodable == compiled.encodable
+        # the template of a shape is reused with other values
+        assert compile_filters(other_values).encodable == _normalize_filters(other_values).encodable
+        assert _compile_filter_shape.cache_info().misses == 1
+        compile_filters({**_filter, "operator": "OR"})
+        assert _compile_filter_shape.cache_info().misses == 2
+
+    def test_compile_filters_simplifies_shapes(self):
+        a = {"field": "meta.a", "operator": "==", "value": 1}
+        a_float = {"field": "meta.a", "operator": "==", "value": 1.0}
+        b = {"field": "meta.b", "operator": "in", "value": ["x", "y", "x"]}
+        _filter = {
+            "operator": "AND",
+            "conditions": [
+                a,
+                {"operator": "AND", "conditions": [b, {"operator": "AND", "conditions": [a, a_float]}]},
+                {"field": "meta.a", "operator": "<", "value": 5},
+                {"operator": "OR", "conditions": [{"operator": "OR", "conditions": [b]}]},
+            ],
+        }
+
+        assert compile_filters(_filter).encodable == _normalize_filters(_filter).encodable
+        assert compile_filters({"operator": "AND", "conditions": [a, a]}).encodable == _normalize_filters(a).encodable
+
+    def test_compile_filters_cost(self, monkeypatch):
+        # filters reused with other values must not pay for the simplification or the range merge again
+        calls = []
+        for name in ("_simplify_filters", "_unique", "_normalize_ranges"):
+            function = getattr(filters_module, name)
+            monkeypatch.setattr(filters_module, name, lambda *args, f=function, n=name: calls.append(n) or f(*args))
+        _compile_filter_shape.cache_clear()
+
+        for i in range(100):
+            compile_filters(
+                {
+                    "operator": "AND",
+                    "conditions": [
+                        {"field": "meta.tenant", "operator": "==", "value": f"tenant-{i}"},
+                        {"field": "meta.year", "operator": ">=", "value": i},
+                        {"field": "meta.lang", "operator": "in", "value": ["en", str(i)]},
+                    ],
+                }
+            )
+        assert calls == []
+        assert _compile_filter_shape.cache_info().misses == 1
+
+        ranges = {
+            "operator": "AND",
+            "conditions": [
+                {"field": "meta.year", "operator": ">=", "value": 2000},
+                {"field": "meta.year", "operator": "<", "value": 2010},
+            ],
+        }
+        compiled = compile_filters(ranges)
+        assert calls == ["_normalize_ranges"]
+        assert compiled.encodable == _normalize_filters(ranges).encodable
+
+    def test_compile_filters_dataframe(self):
+        df = DataFrame({"a": [1, 2]})
+        _filter = {"field": "dataframe", "operator": "==", "value": df}
+        assert compile_filters(_filter).encodable == {"field": "dataframe", "match": df.to_json()}
+
+    def test_compile_filters_invalid(self):
+        with pytest.raises(FilterError):
+            compile_filters({"field": "meta.date", "operator": ">", "value": "yesterday"})
+        with pytest.raises(FilterError):
+            compile_filters("meta.date > yesterday")
+        with pytest.raises(FilterError):
+            compile_filters({"field": "meta.date", "operator": "~", "value": 1})
+        with pytest.raises(FilterError):
+            compile_filters({"operator": "XOR", "conditions": []})
+
+    def test_is_iso_date(self):
+        assert _is_iso_date("2011-10-05")
+        assert _is_iso_date("2011-10-05T14:48:00.000Z")
+        assert _is_iso_date("2011-10-05 14:48:00+02:00")
+        assert not _is_iso_date("2011-13-05")
+        assert not _is_iso_date("2019")
+        assert not _is_iso_date("hello")
+        assert not _is_iso_date(2019)
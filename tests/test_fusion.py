@@ -0,0 +1,31 @@
+import pytest
+
+from couchbase_haystack.document_stores.fusion import _fuse
+
+
+@pytest.mark.unit
+class TestFusion:
+    def test_reciprocal_rank_fusion(self):
+        text = [("a", 10.0), ("b", 5.0)]
+        vector = [("b", 0.9), ("c", 0.1)]
+
+        fused = _fuse([text, vector], "reciprocal_rank_fusion", k=60)
+
+        assert [id for id, _ in fused] == ["b", "a", "c"]
+        assert fused[0][1] == pytest.approx(0.5 / 62 + 0.5 / 61)
+
+    def test_weighted_fusion(self):
+        text = [("a", 10.0), ("b", 5.0), ("c", 0.0)]
+        vector = [("c", 0.9), ("b", 0.5)]
+
+        fused = dict(_fuse([text, vector], "weighted", weights=[0.2, 0.8]))
+
+        assert fused["a"] == pytest.approx(0.2)
+        assert fused["b"] == pytest.approx(0.2 * 0.5)
+        assert fused["c"] == pytest.approx(0.8)
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            _fuse([[("a", 1.0)]], "max")
+        with pytest.raises(ValueError):
+            _fuse([[("a", 1.0)], [("a", 1.0)]], "weighted", weights=[1.0])
@@ -1,12 +1,14 @@
+import asyncio
 import os
 
 from unittest.mock import MagicMock, Mock, patch
 import pytest
-from couchbase_haystack import CouchbaseDocumentStore
-from couchbase_haystack import CouchbaseEmbeddingRetriever, CouchbaseDocumentStore
+from couchbase_haystack import AsyncCouchbaseDocumentStore, CouchbaseDocumentStore
+from couchbase_haystack import CouchbaseEmbeddingRetriever, CouchbaseDocumentStore, CouchbaseHybridRetriever
 from couchbase_haystack import CouchbasePasswordAuthenticator
 
 from haystack.dataclasses import Document
+from haystack.document_stores.types import FilterPolicy
 from haystack import GeneratedAnswer, Pipeline
 from haystack.components.builders.answer_builder import AnswerBuilder
 from haystack.components.builders.prompt_builder import PromptBuilder
@@ -38,6 +40,17 @@ class TestRetrieverUnit:
             "type": "couchbase_haystack.components.retrievers.embedding_retriever.CouchbaseEmbeddingRetriever",
             "init_parameters": {
                 "top_k": 15,
+                "filters": None,
+                "filter_policy": "replace",
+                "use_search_fields": None,
+                "return_embedding": True,
+                "fields": None,
+                "use_query_cache": True,
+                "num_candidates": None,
+                "rerank": None,
+                "mmr_lambda": None,
+                "embedding_field": None,
+                "vector_query_combination": "or",
                 "document_store": {
                     "type": "couchbase_haystack.document_stores.document_store.CouchbaseDocumentStore",
                     "init_parameters": {
@@ -58,6 +71,22 @@ class TestRetrieverUnit:
                         "scope": "haystack_test_scope",
                         "collection": "haystack_collection",
                         "vector_search_index": "vector_search",
+                        "use_search_fields": False,
+                        "query_cache_size": 0,
+                        "query_cache_ttl": 300.0,
+                        "document_cache_size": 0,
+                        "document_cache_ttl": 300.0,
+                        "embedding_format": "float",
+                        "max_write_retries": 3,
+                        "write_retry_backoff": 0.1,
+                        "write_options": {
+                            "type": "couchbase_haystack.document_stores.write_options.CouchbaseWriteOptions",
+                            "init_parameters": {},
+                        },
+                        "expiry_meta_field": None,
+                        "filter_backend": "fts",
+                        "embedding_fields": None,
+                        "meta_embedding_fields": None,
                     },
                 },
             },
@@ -131,5 +160,136 @@ class TestRetrieverUnit:
             top_k=3,
             search_query=data["retriever"]["search_query"],
             limit=None,
+            filters=None,
+            use_search_fields=None,
+            return_embedding=True,
+            fields=None,
+            use_query_cache=True,
+            num_candidates=None,
+            rerank=None,
+            mmr_lambda=None,
+            embedding_field=None,
+            vector_queries=None,
+            vector_query_combination="or",
         )
         assert result["retriever"]["documents"] == doc_store._embedding_retrieval.return_value
+
+    def test_run_async_requires_async_store(self, doc_store: MagicMock):
+        retriever = CouchbaseEmbeddingRetriever(document_store=doc_store)
+        with pytest.raises(ValueError):
+            asyncio.run(retriever.run_async(query_embedding=[0.1, 0.2]))
+
+    def test_run_batch(self, doc_store: MagicMock):
+        doc_store._embedding_retrieval_batch.return_value = [[Document(content="one")], [Document(content="two")]]
+        retriever = CouchbaseEmbeddingRetriever(document_store=doc_store, top_k=5)
+
+        result = retriever.run_batch(query_embeddings=[[0.1, 0.2], [0.3, 0.4]])
+
+        doc_store._embedding_retrieval_batch.assert_called_once_with(
+            query_embeddings=[[0.1, 0.2], [0.3, 0.4]],
+            top_k=5,
+            search_query=None,
+            limit=None,
+            filters=None,
+            use_search_fields=None,
+            return_embedding=True,
+            fields=None,
+            num_candidates=None,
+            rerank=None,
+            mmr_lambda=None,
+            embedding_field=None,
+        )
+        assert result == {"documents": doc_store._embedding_retrieval_batch.return_value}
+
+    def test_run_mmr(self, doc_store: MagicMock):
+        doc_store._embedding_retrieval.return_value = []
+        retriever = CouchbaseEmbeddingRetriever(document_store=doc_store, top_k=3, num_candidates=20, mmr_lambda=0.7)
+
+        retriever.run(query_embedding=[0.1, 0.2])
+
+        kwargs = doc_store._embedding_retrieval.call_args.kwargs
+        assert (kwargs["top_k"], kwargs["num_candidates"], kwargs["mmr_lambda"]) == (3, 20, 0.7)
+        with pytest.raises(ValueError):
+            CouchbaseEmbeddingRetriever(document_store=doc_store, mmr_lambda=1.5)
+        with pytest.raises(ValueError):
+            CouchbaseEmbeddingRetriever(document_store=doc_store, rerank="manhattan")
+
+    def test_num_candidates(self, doc_store: MagicMock):
+        with pytest.raises(ValueError, match="greater than 0"):
+            CouchbaseEmbeddingRetriever(document_store=doc_store, num_candidates=0)
+        with pytest.raises(ValueError, match="top_k"):
+            CouchbaseEmbeddingRetriever(document_store=doc_store, top_k=10, num_candidates=5)
+
+        retriever = CouchbaseEmbeddingRetriever(document_store=doc_store, top_k=3, num_candidates=5)
+        with pytest.raises(ValueError, match="top_k"):
+            retriever.run(query_embedding=[0.1, 0.2], top_k=8)
+        doc_store._embedding_retrieval.assert_not_called()
+
+        async_store = MagicMock(spec=AsyncCouchbaseDocumentStore)
+        retriever = CouchbaseEmbeddingRetriever(document_store=async_store, top_k=3, num_candidates=5)
+        with pytest.raises(ValueError, match="top_k"):
+            asyncio.run(retriever.run_async(query_embedding=[0.1, 0.2], top_k=8))
+        async_store._embedding_retrieval_async.assert_not_called()
+
+    def test_run_with_filters(self, doc_store: MagicMock):
+        doc_store._embedding_retrieval.return_value = []
+        init_filters = {"field": "meta.lang", "operator": "==", "value": "en"}
+        runtime_filters = {"field": "meta.year", "operator": ">", "value": 2000}
+        retriever = CouchbaseEmbeddingRetriever(document_store=doc_store, filters=init_filters, filter_policy="merge")
+
+        retriever.run(query_embedding=[0.1, 0.2], filters=runtime_filters)
+
+        assert retriever.filter_policy == FilterPolicy.MERGE
+        assert doc_store._embedding_retrieval.call_args.kwargs["filters"] == {**init_filters, **runtime_filters}
+
+        retriever = CouchbaseEmbeddingRetriever(document_store=doc_store, filters=init_filters)
+        retriever.run(query_embedding=[0.1, 0.2], filters=runtime_filters)
+        assert doc_store._embedding_retrieval.call_args.kwargs["filters"] == runtime_filters
+
+    def test_hybrid_run(self, doc_store: MagicMock):
+        doc_store._hybrid_retrieval.return_value = [Document(content="two")]
+        retriever = CouchbaseHybridRetriever(document_store=doc_store, top_k=4, fusion="weighted", weights=[0.3, 0.7])
+
+        result = retriever.run(query="two", query_embedding=[0.1, 0.2], top_k=2)
+
+        doc_store._hybrid_retrieval.assert_called_once_with(
+            query="two",
+            query_embedding=[0.1, 0.2],
+            top_k=2,
+            text_top_k=None,
+            vector_top_k=None,
+            text_field="content",
+            filters=None,
+            fusion="weighted",
+            weights=[0.3, 0.7],
+            rrf_k=60,
+            return_embedding=True,
+            fields=None,
+        )
+        assert result == {"documents": doc_store._hybrid_retrieval.return_value}
+
+    def test_hybrid_invalid_init(self, doc_store: MagicMock):
+        with pytest.raises(ValueError):
+            CouchbaseHybridRetriever(document_store=doc_store, fusion="max")
+        with pytest.raises(ValueError):
+            CouchbaseHybridRetriever(document_store=doc_store, weights=[1.0])
+
+    def test_hybrid_to_dict_from_dict(self):
+        doc_store = CouchbaseDocumentStore(
+            authenticator=CouchbasePasswordAuthenticator(),
+            bucket="haystack_integration_test",
+            scope="haystack_test_scope",
+            collection="haystack_collection",
+            vector_search_index="vector_search",
+        )
+        retriever = CouchbaseHybridRetriever(document_store=doc_store, rrf_k=10, filter_policy="merge")
+
+        data = retriever.to_dict()
+        assert data["type"] == "couchbase_haystack.components.retrievers.hybrid_retriever.CouchbaseHybridRetriever"
+        assert data["init_parameters"]["rrf_k"] == 10
+        assert data["init_parameters"]["filter_policy"] == "merge"
+
+        restored = CouchbaseHybridRetriever.from_dict(data)
+        assert restored.rrf_k == 10
+        assert restored.filter_policy == FilterPolicy.MERGE
+        assert restored.document_store.vector_search_index == "vector_search"
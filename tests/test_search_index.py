@@ -0,0 +1,194 @@
+import pytest
+
+from couchbase_haystack.document_stores.search_index import (
+    _definition_changes,
+    _merge_index_definition,
+    _stored_paths,
+    _vector_index_definition,
+)
+
+from .common import common
+
+
+def definition(**kwargs):
+    settings = {
+        "type_name": "haystack_test_scope.haystack_collection",
+        "vector_type": "vector",
+        "dims": 768,
+        "similarity": "dot_product",
+        "vector_index_optimized_for": "recall",
+        "partitions": 1,
+        "replicas": 0,
+        "meta_fields": None,
+        "stored_fields": None,
+        "docvalues_fields": None,
+        "embedding_fields": None,
+        "meta_embedding_fields": None,
+        **kwargs,
+    }
+    return _vector_index_definition(**settings)
+
+
+def server_shaped(value):
+    # the search service omits the false, zero and empty values of the definitions it returns, but not the mapping flags
+    if isinstance(value, dict):
+        return {
+            key: server_shaped(child)
+            for key, child in value.items()
+            if key in ("dynamic", "enabled") or child not in (False, 0, "", None, [], {})
+        }
+    if isinstance(value, list):
+        return [server_shaped(item) for item in value]
+    return value
+
+
+def fields(params, name, type_name="haystack_test_scope.haystack_collection"):
+    properties = params["mapping"]["types"][type_name]["properties"]
+    for key in name.split("."):
+        properties = properties[key].get("properties", properties[key])
+    return properties["fields"][0]
+
+
+@pytest.mark.unit
+class TestSearchIndex:
+    def test_vector_index_definition(self):
+        index = common.load_json_file("./tests/vector_index.json")
+
+        params, plan_params = definition()
+
+        assert plan_params == index["planParams"]
+        assert params["doc_config"] == index["params"]["doc_config"]
+        expected = fields(index["params"], "embedding")
+        assert {k: v for k, v in fields(params, "embedding").items() if k not in ("store", "docvalues")} == {
+            k: v for k, v in expected.items() if k not in ("store", "docvalues")
+        }
+        # Documents can be rebuilt from the stored fields by default, vectors are neither stored nor docvalued
+        assert fields(params, "content")["store"] is True
+        assert fields(params, "embedding")["store"] is False
+        assert params["mapping"]["types"]["haystack_test_scope.haystack_collection"]["properties"]["meta"]["dynamic"]
+
+    def test_vector_index_definition_fields(self):
+        params, plan_params = definition(
+            vector_type="vector_base64",
+            vector_index_optimized_for="memory-efficient",
+            partitions=6,
+            replicas=1,
+            meta_fields={"year": "number", "author.name": "keyword"},
+            stored_fields=["content", "meta.author.name"],
+            docvalues_fields=["meta.year"],
+            embedding_fields={"embedding_256": 256},
+            meta_embedding_fields=["title_embedding"],
+        )
+
+        assert plan_params == {"indexPartitions": 6, "numReplicas": 1}
+        assert fields(params, "embedding_256")["dims"] == 256
+        assert fields(params, "title_embedding")["dims"] == 768
+        assert fields(params, "title_embedding")["vector_index_optimized_for"] == "memory-efficient"
+        assert fields(params, "embedding")["type"] == "vector_base64"
+        assert fields(params, "meta.year") == {
+            "name": "year",
+            "type": "number",
+            "index": True,
+            "store": False,
+            "docvalues": True,
+            "include_in_all": False,
+        }
+        assert fields(params, "meta.author.name")["analyzer"] == "keyword"
+        assert fields(params, "meta.author.name")["store"] is True
+        assert fields(params, "dataframe")["store"] is False
+        assert params["mapping"]["store_dynamic"] is False
+
+    def test_invalid_vector_index_definition(self):
+        for kwargs in (
+            {"similarity": "manhattan"},
+            {"vector_index_optimized_for": "speed"},
+            {"dims": 0},
+            {"partitions": 0},
+            {"replicas": 4},
+            {"meta_fields": {"year": "integer"}},
+            {"stored_fields": ["meta.year"]},
+            {"meta_fields": {"year": "number"}, "docvalues_fields": ["blob"]},
+        ):
+            with pytest.raises(ValueError):
+                definition(**kwargs)
+
+    def test_merge_and_diff(self):
+        params, plan_params = definition()
+        existing_params = {
+            **params,
+            "store": {"indexType": "scorch"},
+            "mapping": {**params["mapping"], "types": {**params["mapping"]["types"], "other.collection": {}}},
+        }
+        existing_plan = {**plan_params, "maxPartitionsPerPIndex": 1024}
+
+        merged_params, merged_plan = _merge_index_definition(existing_params, existing_plan, params, plan_params)
+        assert (merged_params, merged_plan) == (existing_params, existing_plan)
+
+        desired_params, desired_plan = definition(dims=384, partitions=2)
+        merged_params, merged_plan = _merge_index_definition(
+            existing_params, existing_plan, desired_params, desired_plan
+        )
+        assert merged_params["store"] == {"indexType": "scorch"}
+        assert "other.collection" in merged_params["mapping"]["types"]
+        assert _definition_changes(
+            {"params": existing_params, "planParams": existing_plan},
+            {"params": merged_params, "planParams": merged_plan},
+        ) == [
+            "params.mapping.types.haystack_test_scope.haystack_collection.properties.embedding.fields",
+            "planParams.indexPartitions",
+            "planParams.maxPartitionsPerPIndex",
+        ]
+
+    def test_diff_server_shaped_definition(self):
+        params, plan_params = definition(meta_fields={"year": "number"})
+        existing_params = {**server_shaped(params), "store": {"indexType": "scorch", "segmentVersion": 16}}
+        existing_plan = {**server_shaped(plan_params), "maxPartitionsPerPIndex": 1024}
+        assert "store" not in fields(existing_params, "embedding")
+        assert "numReplicas" not in existing_plan
+
+        merged_params, merged_plan = _merge_index_definition(existing_params, existing_plan, params, plan_params)
+        assert (
+            _definition_changes(
+                {"params": existing_params, "planParams": existing_plan},
+                {"params": merged_params, "planParams": merged_plan},
+            )
+            == []
+        )
+
+        desired_params, desired_plan = definition(meta_fields={"year": "number"}, docvalues_fields=["meta.year"])
+        merged_params, merged_plan = _merge_index_definition(existing_params, existing_plan, desired_params, desired_plan)
+        assert _definition_changes(
+            {"params": existing_params, "planParams": existing_plan},
+            {"params": merged_params, "planParams": merged_plan},
+        ) == ["params.mapping.types.haystack_test_scope.haystack_collection.properties.meta.properties.year.fields"]
+
+    def test_diff_explicit_false_values(self):
+        current = {"meta": {"enabled": True}, "fields": [{"name": "year", "docvalues": True}], "numReplicas": 1}
+        desired = {"meta": {"enabled": True, "dynamic": False}, "fields": [{"name": "year", "docvalues": False}]}
+        # an omitted `dynamic` is true, the explicit false values differ from the existing definition
+        assert _definition_changes(current, {**desired, "numReplicas": 0}) == ["fields", "meta.dynamic", "numReplicas"]
+
+        # the search service omits the other false and zero values
+        current = {"meta": {"enabled": True, "dynamic": False}, "fields": [{"name": "year"}]}
+        assert _definition_changes(current, {**desired, "numReplicas": 0, "analyzer": None, "properties": {}}) == []
+
+    def test_stored_paths(self):
+        type_name = "haystack_test_scope.haystack_collection"
+        params, _ = definition()
+        stored = _stored_paths(params, type_name)
+        assert {path for path, whole in stored.items() if whole} == {"content", "dataframe", "meta"}
+        assert stored["embedding"] is False
+        assert "blob" not in stored
+
+        params, _ = definition(meta_fields={"year": "number", "author.name": "keyword"}, stored_fields=["meta.year"])
+        stored = _stored_paths(params, type_name)
+        assert (stored["meta.year"], stored["meta.author.name"], stored["meta"], stored["content"]) == (
+            True,
+            False,
+            False,
+            False,
+        )
+
+        index = common.load_json_file("./tests/vector_index.json")
+        assert all(_stored_paths(index["params"], type_name).values())
+        assert _stored_paths(index["params"], "other.collection") == {}
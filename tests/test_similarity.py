@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from haystack.dataclasses import Document
+
+from couchbase_haystack.document_stores.similarity import (
+    _mmr_documents,
+    _pairwise_similarities,
+    _rerank_documents,
+    _similarity_scores,
+    _validate_mmr_lambda,
+    _validate_similarity,
+)
+
+
+@pytest.mark.unit
+class TestSimilarity:
+    def test_similarity_scores(self):
+        embeddings = np.array([[1.0, 0.0], [3.0, 4.0], [0.0, 0.0]])
+        query = [3.0, 4.0]
+
+        assert _similarity_scores(query, embeddings, "dot_product").tolist() == [3.0, 25.0, 0.0]
+        assert _similarity_scores(query, embeddings, "cosine") == pytest.approx([0.6, 1.0, 0.0])
+        assert _similarity_scores(query, embeddings, "l2_norm") == pytest.approx([-np.sqrt(20), 0.0, -5.0])
+
+    def test_rerank_documents(self):
+        documents = [
+            Document(id="a", embedding=[1.0, 0.0], score=0.9),
+            Document(id="b", embedding=[0.6, 0.8], score=0.8),
+            Document(id="c", score=0.7),
+            Document(id="d", embedding=[0.0, 2.0], score=0.6),
+        ]
+
+        reranked = _rerank_documents([0.0, 1.0], documents, 2, "cosine")
+
+        assert [doc.id for doc in reranked] == ["d", "b"]
+        assert [doc.score for doc in reranked] == pytest.approx([1.0, 0.8])
+        # candidates without an embedding are kept after the rescored ones
+        assert [doc.id for doc in _rerank_documents([0.0, 1.0], documents, 4, "cosine")] == ["d", "b", "a", "c"]
+
+    def test_pairwise_similarities(self):
+        embeddings = np.array([[1.0, 0.0], [3.0, 4.0], [0.0, 0.0]])
+
+        for similarity in ("cosine", "dot_product", "l2_norm"):
+            pairwise = _pairwise_similarities(embeddings, similarity)
+            for i, row in enumerate(embeddings):
+                assert pairwise[i] == pytest.approx(_similarity_scores(row, embeddings, similarity))
+
+    def test_mmr_documents(self):
+        documents = [
+            Document(id="a", embedding=[1.0, 0.0], score=0.9),
+            Document(id="a-copy", embedding=[1.0, 0.01], score=0.9),
+            Document(id="b", embedding=[0.6, 0.8], score=0.8),
+        ]
+
+        relevant = _mmr_documents([1.0, 0.0], documents, 2, 1.0, "cosine")
+        diverse = _mmr_documents([1.0, 0.0], documents, 2, 0.3, "cosine")
+
+        assert [doc.id for doc in relevant] == ["a", "a-copy"]
+        assert [doc.id for doc in diverse] == ["a", "b"]
+        assert [doc.score for doc in diverse] == pytest.approx([1.0, 0.6])
+        assert len(_mmr_documents([1.0, 0.0], documents, 5, 0.5, "cosine")) == 3
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            _validate_similarity("manhattan")
+        with pytest.raises(ValueError):
+            _validate_mmr_lambda(-0.1)
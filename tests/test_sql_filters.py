@@ -0,0 +1,97 @@
+import pytest
+from haystack.errors import FilterError
+from pandas import DataFrame
+
+from couchbase_haystack.document_stores.sql_filters import _is_sargable, _normalize_filters_sql
+
+
+class TestSqlFilters:
+    def test_comparison_operators(self):
+        assert _normalize_filters_sql({"field": "meta.name", "operator": "==", "value": "x"}) == (
+            "`d`.`meta`.`name` = $f0",
+            {"f0": "x"},
+        )
+        assert _normalize_filters_sql({"field": "meta.name", "operator": "!=", "value": "x"})[0] == (
+            "(`d`.`meta`.`name` IS NOT VALUED OR `d`.`meta`.`name` != $f0)"
+        )
+        assert _normalize_filters_sql({"field": "meta.name", "operator": "==", "value": None})[0] == (
+            "`d`.`meta`.`name` IS NOT VALUED"
+        )
+        assert _normalize_filters_sql({"field": "meta.number", "operator": ">=", "value": 5})[0] == (
+            "`d`.`meta`.`number` >= $f0"
+        )
+        assert _normalize_filters_sql({"field": "meta.number", "operator": "<", "value": None})[0] == "FALSE"
+        assert _normalize_filters_sql({"field": "meta.number", "operator": "in", "value": [1, 2]}) == (
+            "`d`.`meta`.`number` IN $f0",
+            {"f0": [1, 2]},
+        )
+        assert _normalize_filters_sql({"field": "meta.number", "operator": "not in", "value": [1]})[0] == (
+            "(`d`.`meta`.`number` IS NOT VALUED OR `d`.`meta`.`number` NOT IN $f0)"
+        )
+
+    def test_list_equality(self):
+        # like the search service, the field must hold all the values
+        assert _normalize_filters_sql({"field": "meta.tags", "operator": "==", "value": ["a", "b"]}) == (
+            "(EVERY v IN $f0 SATISFIES v IN TOARRAY(`d`.`meta`.`tags`) END)",
+            {"f0": ["a", "b"]},
+        )
+        assert _normalize_filters_sql({"field": "meta.tags", "operator": "!=", "value": ["a"]})[0] == (
+            "(`d`.`meta`.`tags` IS NOT VALUED OR NOT (EVERY v IN $f0 SATISFIES v IN TOARRAY(`d`.`meta`.`tags`) END))"
+        )
+
+    def test_dates_and_dataframes(self):
+        where, parameters = _normalize_filters_sql({"field": "meta.date", "operator": ">", "value": "2020-01-01T00:00:00Z"})
+        assert where == "`d`.`meta`.`date` > $f0"
+        assert parameters == {"f0": "2020-01-01T00:00:00Z"}
+        df = DataFrame({"a": [1]})
+        assert _normalize_filters_sql({"field": "dataframe", "operator": "==", "value": df})[1] == {"f0": df.to_json()}
+
+    def test_logical_operators(self):
+        filters = {
+            "operator": "NOT",
+            "conditions": [
+                {"field": "meta.a", "operator": "==", "value": 1},
+                {
+                    "operator": "OR",
+                    "conditions": [
+                        {"field": "meta.b", "operator": "==", "value": 2},
+                        {"field": "meta.c", "operator": "==", "value": 3},
+                    ],
+                },
+            ],
+        }
+        assert _normalize_filters_sql(filters) == (
+            "NOT IFMISSINGORNULL((`d`.`meta`.`a` = $f0 AND (`d`.`meta`.`b` = $f1 OR `d`.`meta`.`c` = $f2)), FALSE)",
+            {"f0": 1, "f1": 2, "f2": 3},
+        )
+
+    def test_sargable(self):
+        date = {"field": "meta.date", "operator": ">=", "value": "2020-01-01T00:00:00Z"}
+        tenants = {"field": "meta.tenant", "operator": "in", "value": ["a", "b"]}
+        assert _is_sargable(date)
+        assert _is_sargable({"operator": "OR", "conditions": [date, {"operator": "AND", "conditions": [tenants]}]})
+        for filters in (
+            {"field": "meta.tenant", "operator": "!=", "value": "a"},
+            {"field": "meta.tenant", "operator": "not in", "value": ["a"]},
+            {"field": "meta.tenant", "operator": "==", "value": None},
+            {"field": "meta.tags", "operator": "==", "value": ["a", "b"]},
+            {"operator": "NOT", "conditions": [tenants]},
+            {"operator": "AND", "conditions": [date, {"field": "meta.tenant", "operator": "!=", "value": "a"}]},
+            {"operator": "AND", "conditions": []},
+        ):
+            assert not _is_sargable(filters)
+
+    @pytest.mark.parametrize(
+        "filters",
+        [
+            {"field": "meta.a", "operator": ">", "value": "not a date"},
+            {"field": "meta.a", "operator": "in", "value": 1},
+            {"field": "meta.a", "operator": "~", "value": 1},
+            {"field": "meta.`a`", "operator": "==", "value": 1},
+            {"operator": "XOR", "conditions": []},
+            {"conditions": []},
+        ],
+    )
+    def test_invalid_filters(self, filters):
+        with pytest.raises(FilterError):
+            _normalize_filters_sql(filters)
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from couchbase.durability import DurabilityLevel
+from haystack.document_stores.types import DuplicatePolicy
+
+from couchbase_haystack import CouchbaseWriteOptions
+from couchbase_haystack.document_stores.write_options import _expiry_from_meta
+
+
+class TestCouchbaseWriteOptions:
+    def test_to_dict_from_dict(self):
+        options = CouchbaseWriteOptions(
+            durability="majority", expiry=timedelta(hours=2), timeout=timedelta(seconds=5), preserve_expiry=True
+        )
+
+        data = options.to_dict()
+
+        assert data == {
+            "type": "couchbase_haystack.document_stores.write_options.CouchbaseWriteOptions",
+            "init_parameters": {"durability": "majority", "expiry": 7200.0, "timeout": 5.0, "preserve_expiry": True},
+        }
+        assert CouchbaseWriteOptions.from_dict(data) == options
+
+    def test_get_multi_options(self):
+        options = CouchbaseWriteOptions(durability=DurabilityLevel.PERSIST_TO_MAJORITY, preserve_expiry=True)
+        options = options.merge(CouchbaseWriteOptions(timeout=timedelta(seconds=1)))
+
+        insert_options = options.get_multi_options(DuplicatePolicy.FAIL)
+        upsert_options = options.get_multi_options(DuplicatePolicy.OVERWRITE)
+
+        assert insert_options["durability"].level == DurabilityLevel.PERSIST_TO_MAJORITY
+        assert insert_options["timeout"] == timedelta(seconds=1)
+        assert insert_options["return_exceptions"] is True
+        assert "preserve_expiry" not in insert_options
+        assert upsert_options["preserve_expiry"] is True
+        assert CouchbaseWriteOptions(durability="none").get_multi_options(DuplicatePolicy.FAIL) == {"return_exceptions": True}
+
+    def test_invalid_durability(self):
+        with pytest.raises(ValueError):
+            CouchbaseWriteOptions(durability="all")
+
+    def test_expiry_from_meta(self):
+        assert _expiry_from_meta(3600) == timedelta(hours=1)
+        assert _expiry_from_meta(1.5) == timedelta(seconds=1.5)
+        in_an_hour = datetime.now(timezone.utc) + timedelta(hours=1, seconds=30)
+        assert timedelta(minutes=59) < _expiry_from_meta(in_an_hour) <= timedelta(hours=1, seconds=30)
+        assert timedelta(minutes=59) < _expiry_from_meta(in_an_hour.isoformat()) <= timedelta(hours=1, seconds=30)
+        assert _expiry_from_meta("2000-01-01T00:00:00+00:00") == timedelta(seconds=1)
+
+    @pytest.mark.parametrize("value", [0, -5, True, "tomorrow", [1]])
+    def test_invalid_expiry_from_meta(self, value):
+        with pytest.raises(ValueError):
+            _expiry_from_meta(value)